@@ -3,7 +3,7 @@ from sqlalchemy.orm import Session
 from datetime import date, timedelta
 from typing import List
 
-from ...database import get_db
+from ...database import get_read_db
 from ...schemas import (
     AnalyticsSummary,
     VolumeDataPoint,
@@ -33,7 +33,7 @@ def get_summary(
     request: Request,
     start_date: date = Query(default=None),
     end_date: date = Query(default=None),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     tenant_id = _get_tenant_id(request)
     start = start_date or _default_start()
@@ -47,7 +47,7 @@ def get_volume(
     start_date: date = Query(default=None),
     end_date: date = Query(default=None),
     granularity: str = Query(default="daily"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     tenant_id = _get_tenant_id(request)
     start = start_date or _default_start()
@@ -60,7 +60,7 @@ def get_status_distribution(
     request: Request,
     start_date: date = Query(default=None),
     end_date: date = Query(default=None),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     tenant_id = _get_tenant_id(request)
     start = start_date or _default_start()
@@ -73,7 +73,7 @@ def get_route_performance(
     request: Request,
     start_date: date = Query(default=None),
     end_date: date = Query(default=None),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     tenant_id = _get_tenant_id(request)
     start = start_date or _default_start()
@@ -86,7 +86,7 @@ def get_escrow_summary(
     request: Request,
     start_date: date = Query(default=None),
     end_date: date = Query(default=None),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     tenant_id = _get_tenant_id(request)
     start = start_date or _default_start()
@@ -39,6 +39,7 @@ def create_escrow(request: Request, escrow: schemas.EscrowCreate, db: Session =
         BillingService.increment_usage(db, shipment.tenant_id, "escrows")
 
     log = models.AuditLog(
+        tenant_id=shipment.tenant_id,
         entity_type="ESCROW",
         entity_id=db_escrow.id,
         action="CREATE",
@@ -3,7 +3,7 @@ from sqlalchemy.orm import Session
 from datetime import datetime
 from typing import Optional, List
 
-from ...database import get_db
+from ...database import get_read_db
 from ...schemas import (
     IndicesResponse,
     IndexHistoryResponse,
@@ -18,7 +18,7 @@ router = APIRouter()
 
 
 @router.get("/indices", response_model=IndicesResponse)
-def get_indices(db: Session = Depends(get_db)):
+def get_indices(db: Session = Depends(get_read_db)):
     """Get latest freight index values with sparkline data."""
     indices = market_crud.get_indices(db)
     return {"indices": indices}
@@ -28,7 +28,7 @@ def get_indices(db: Session = Depends(get_db)):
 def get_index_history(
     index_code: str,
     period: str = Query(default="30d", regex="^(7d|30d|90d|180d)$"),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     """Get historical data for a specific freight index."""
     result = market_crud.get_index_history(db, index_code.upper(), period)
@@ -42,7 +42,7 @@ def search_rates(
     origin: Optional[str] = Query(default=None),
     destination: Optional[str] = Query(default=None),
     mode: Optional[str] = Query(default=None),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     """Search route rates with optional filters."""
     return market_crud.search_rates(db, origin, destination, mode)
@@ -52,7 +52,7 @@ def search_rates(
 def compare_rates(
     routes: str = Query(..., description="Comma-separated routes, e.g. KRPUS-USLAX,KRPUS-DEHAM"),
     mode: Optional[str] = Query(default=None),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     """Compare rates across multiple routes."""
     route_list = [r.strip() for r in routes.split(",") if r.strip()]
@@ -67,14 +67,14 @@ def get_trends(
     period: str = Query(default="30d", regex="^(7d|30d|90d)$"),
     mode: Optional[str] = Query(default=None),
     origin: Optional[str] = Query(default=None),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     """Get rate trends over time."""
     return market_crud.get_trends(db, period, mode, origin)
 
 
 @router.get("/insight", response_model=InsightsResponse)
-def get_insights(db: Session = Depends(get_db)):
+def get_insights(db: Session = Depends(get_read_db)):
     """Get AI-generated market insights (rule-based)."""
     insights = market_crud.get_insights(db)
     return {"insights": insights, "generated_at": datetime.utcnow()}
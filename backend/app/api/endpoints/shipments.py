@@ -1,46 +1,38 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, UploadFile, File, Form, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, BackgroundTasks
+from fastapi.encoders import jsonable_encoder
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from ...database import get_db
+from ...database import get_db, get_read_db
 from ...crud import shipment as crud_shipment
 from ... import schemas, models
+from ...core.config import settings
 from ...core.rate_limit import limiter
+from ...core.multipart import stream_form
 from ...core.pagination import PaginationParams, PaginatedResponse
+import asyncio
+import json
 import uuid
 import base64
-from datetime import datetime
-from ...services.oracle_service import OracleService
+from datetime import datetime, timezone
+from ...services.oracle_service import oracle
+from ...services import live_updates, shipment_events
+from ...services.eta_service import eta_model
+from ...carbon.engine import calculate_carbon_footprint, is_green_certified, port_coordinates
 
 router = APIRouter()
 
-# Emission Factors (kg CO2 per ton-km) - LogiNexus Constants
-EMISSION_FACTORS = {
-    "SEA": 0.010,   # Very Efficient
-    "RAIL": 0.025,  # Efficient
-    "TRUCK": 0.060, # Moderate
-    "AIR": 0.600    # High Impact
-}
+# Viewports below this zoom level are returned as geohash clusters instead of points
+MAP_CLUSTER_BELOW_ZOOM = 10
+# Comment lines sent on idle SSE streams so proxies keep the connection open
+SSE_HEARTBEAT_SECONDS = 15
 
-def calculate_carbon_footprint(weight_kg: float, mode: str, distance_km: float = 8000.0) -> float:
-    """
-    Calculate CO2 emissions in kg.
-    Default distance is 8000km (Asia-US avg) if not provided (Simplification for MVP).
-    """
-    mode = mode.upper() if mode else "SEA"
-    factor = EMISSION_FACTORS.get(mode, 0.010)
-    weight_tons = weight_kg / 1000.0
-    
-    # Emission = Tons * Km * Factor
-    return round(weight_tons * distance_km * factor, 2)
-
-@router.get("/", response_model=PaginatedResponse[schemas.ShipmentResponse])
-def read_shipments(pagination: PaginationParams = Depends(), db: Session = Depends(get_db)):
-    # Demo mode: Fetch all shipments without tenant filtering
-    total = db.query(models.Shipment).count()
-    shipments = db.query(models.Shipment).offset(pagination.skip).limit(pagination.limit).all()
-
-    # Enrichment: Populate blockchain_status from PaymentEscrow
+def _attach_blockchain_status(db: Session, shipments: list) -> None:
+    """Populate escrow_id / blockchain_status from PaymentEscrow in one query."""
     shipment_ids = [s.id for s in shipments]
+    if not shipment_ids:
+        return
     escrows = db.query(models.PaymentEscrow).filter(models.PaymentEscrow.shipment_id.in_(shipment_ids)).all()
     escrow_map = {e.shipment_id: e for e in escrows}
 
@@ -57,57 +49,209 @@ def read_shipments(pagination: PaginationParams = Depends(), db: Session = Depen
         else:
             s.blockchain_status = "NONE"
 
-    return PaginatedResponse(
-        items=shipments, total=total, skip=pagination.skip, limit=pagination.limit
+def _fields_param(
+    fields: Optional[str] = Query(
+        default=None,
+        description="Comma-separated fields to return, e.g. tracking_number,current_status,eta",
+    ),
+) -> Optional[list]:
+    try:
+        return crud_shipment.parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _respond(payload: dict, fields: Optional[list]):
+    # A sparse payload does not satisfy the full response_model, so it is returned as-is
+    if fields:
+        return JSONResponse(content=jsonable_encoder(payload))
+    return payload
+
+@router.get("/", response_model=PaginatedResponse[schemas.ShipmentResponse])
+def read_shipments(
+    pagination: PaginationParams = Depends(),
+    fields: Optional[list] = Depends(_fields_param),
+    db: Session = Depends(get_read_db),
+):
+    # Demo mode: Fetch all shipments without tenant filtering
+    total = db.query(models.Shipment).count()
+    shipments = (
+        db.query(models.Shipment)
+        .options(*crud_shipment.load_options(fields))
+        .offset(pagination.skip).limit(pagination.limit).all()
     )
 
+    # Enrichment: Populate blockchain_status from PaymentEscrow
+    _attach_blockchain_status(db, shipments)
+
+    return _respond({
+        "items": [crud_shipment.to_dict(s, fields) for s in shipments],
+        "total": total,
+        "skip": pagination.skip,
+        "limit": pagination.limit,
+    }, fields)
+
+@router.get("/search", response_model=schemas.ShipmentSearchResponse)
+def search_shipments(
+    request: Request,
+    q: str = Query(..., min_length=3, max_length=100, description="Tracking, container, vessel or port text"),
+    limit: int = Query(20, ge=1, le=50),
+    fields: Optional[list] = Depends(_fields_param),
+    db: Session = Depends(get_db),
+):
+    """Ranked fuzzy search backed by pg_trgm GIN indexes, scoped to the request tenant."""
+    tenant_id = getattr(request.state, "tenant_id", "default")
+    rows = crud_shipment.search_shipments(db, q=q, tenant_id=tenant_id, limit=limit, fields=fields)
+
+    shipments = []
+    for shipment, score in rows:
+        shipment.score = round(float(score or 0.0), 4)
+        shipments.append(shipment)
+    _attach_blockchain_status(db, shipments)
+
+    items = [crud_shipment.to_dict(s, fields + ["score"] if fields else None) for s in shipments]
+    return _respond({"items": items, "query": q, "limit": limit}, fields)
+
+@router.get("/stream")
+async def stream_shipment_updates(
+    request: Request,
+    tracking_number: List[str] = Query(default=[], description="Only push events for these tracking numbers"),
+):
+    """Server-Sent Events feed of shipment changes for the request tenant."""
+    tenant_id = getattr(request.state, "tenant_id", "default")
+    sub = live_updates.broker.subscribe(
+        tenant_id=None if tenant_id == "default" else tenant_id,
+        tracking_numbers=tracking_number,
+    )
+
+    async def event_source():
+        try:
+            yield "retry: 5000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    evt = await asyncio.wait_for(sub.queue.get(), timeout=SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: {evt['event_type']}\ndata: {json.dumps(evt)}\n\n"
+        finally:
+            live_updates.broker.unsubscribe(sub)
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get("/map/viewport", response_model=schemas.MapViewportResponse)
+def read_map_viewport(
+    request: Request,
+    min_lat: float = Query(..., ge=-90, le=90),
+    min_lng: float = Query(..., ge=-180, le=180),
+    max_lat: float = Query(..., ge=-90, le=90),
+    max_lng: float = Query(..., ge=-180, le=180),
+    zoom: int = Query(10, ge=0, le=22, description="Map zoom level; low zooms are clustered server-side"),
+    db: Session = Depends(get_db),
+):
+    """Shipments inside a map viewport. min_lng > max_lng means the box crosses the antimeridian."""
+    if min_lat > max_lat:
+        raise HTTPException(status_code=400, detail="min_lat must not exceed max_lat")
+    tenant_id = getattr(request.state, "tenant_id", "default")
+    bbox = (min_lat, min_lng, max_lat, max_lng)
+
+    if zoom < MAP_CLUSTER_BELOW_ZOOM:
+        precision, rows = crud_shipment.get_viewport_clusters(db, bbox, tenant_id)
+        clusters = [
+            {"geohash": r.cell, "count": r.count, "latitude": float(r.latitude), "longitude": float(r.longitude)}
+            for r in rows
+        ]
+        return {"mode": "clusters", "precision": precision, "clusters": clusters}
+
+    limit = crud_shipment.MAX_VIEWPORT_POINTS
+    points = crud_shipment.get_viewport_points(db, bbox, tenant_id, limit=limit + 1)
+    return {"mode": "points", "points": points[:limit], "truncated": len(points) > limit}
+
+@router.get("/map/nearby", response_model=schemas.NearbyResponse)
+def read_nearby_shipments(
+    request: Request,
+    lat: Optional[float] = Query(default=None, ge=-90, le=90),
+    lng: Optional[float] = Query(default=None, ge=-180, le=180),
+    port: Optional[str] = Query(default=None, description="UN/LOCODE or port name instead of lat/lng"),
+    radius_km: float = Query(50.0, gt=0, le=2000),
+    limit: int = Query(100, ge=1, le=500),
+    db: Session = Depends(get_db),
+):
+    """Shipments within radius_km of a point or port, nearest first."""
+    if port:
+        coords = port_coordinates(port)
+        if coords is None:
+            raise HTTPException(status_code=404, detail=f"Unknown port '{port}'")
+        lat, lng = coords
+    elif lat is None or lng is None:
+        raise HTTPException(status_code=400, detail="Provide either port or lat and lng")
+    tenant_id = getattr(request.state, "tenant_id", "default")
+    rows = crud_shipment.get_nearby_shipments(db, lat, lng, radius_km, tenant_id, limit=limit)
+    return {"latitude": lat, "longitude": lng, "radius_km": radius_km, "items": rows}
+
 @router.get("/{shipment_id}", response_model=schemas.Shipment)
-def read_shipment(shipment_id: str, db: Session = Depends(get_db), request: Request = None):
+def read_shipment(
+    shipment_id: str,
+    fields: Optional[list] = Depends(_fields_param),
+    db: Session = Depends(get_read_db),
+    request: Request = None,
+):
     tenant_id = getattr(request.state, "tenant_id", "default")
-    db_shipment = crud_shipment.get_shipment(db, shipment_id=shipment_id, tenant_id=tenant_id)
+    db_shipment = crud_shipment.get_shipment(db, shipment_id=shipment_id, tenant_id=tenant_id, fields=fields)
     if db_shipment is None:
         raise HTTPException(status_code=404, detail="Shipment not found")
 
     # Enrich with blockchain status
-    escrow = db.query(models.PaymentEscrow).filter(models.PaymentEscrow.shipment_id == db_shipment.id).first()
-    if escrow:
-        db_shipment.escrow_id = escrow.id
-        if escrow.status == 'created':
-            db_shipment.blockchain_status = "UNSECURED"
-        elif escrow.status == 'funded' and escrow.is_locked:
-             db_shipment.blockchain_status = "LOCKED"
-        else:
-             db_shipment.blockchain_status = "UNSECURED"
-    else:
-        db_shipment.blockchain_status = "NONE"
+    _attach_blockchain_status(db, [db_shipment])
+
+    return _respond(crud_shipment.to_dict(db_shipment, fields), fields)
+
+@router.get("/{shipment_id}/timeline")
+def read_shipment_timeline(
+    shipment_id: str,
+    since: Optional[datetime] = Query(default=None, description="Only events after this timestamp"),
+    db: Session = Depends(get_db),
+    request: Request = None,
+):
+    """Stream the shipment's event history as NDJSON, oldest first."""
+    tenant_id = getattr(request.state, "tenant_id", "default")
+    db_shipment = crud_shipment.get_shipment(db, shipment_id=shipment_id, tenant_id=tenant_id, fields=["id"])
+    if db_shipment is None:
+        raise HTTPException(status_code=404, detail="Shipment not found")
 
-    return db_shipment
+    def ndjson():
+        for ev in shipment_events.iter_timeline(db_shipment.id, since=since):
+            yield schemas.ShipmentEventResponse.model_validate(ev).model_dump_json() + "\n"
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
 
 @router.get("/tracking/{tracking_number}", response_model=schemas.Shipment)
-def read_shipment_by_tracking(tracking_number: str, db: Session = Depends(get_db)):
+def read_shipment_by_tracking(
+    tracking_number: str,
+    fields: Optional[list] = Depends(_fields_param),
+    db: Session = Depends(get_db),
+):
     # Public endpoint: No tenant check enforced for public tracking (or restrict as needed)
     # Using 'default' tenant or searching globally depending on requirements.
     # For now, we search globally or use default if multi-tenancy involves same DB
     
     # Try finding by tracking number directly
-    shipment = db.query(models.Shipment).filter(models.Shipment.tracking_number == tracking_number).first()
+    shipment = (
+        db.query(models.Shipment)
+        .options(*crud_shipment.load_options(fields))
+        .filter(models.Shipment.tracking_number == tracking_number)
+        .first()
+    )
     if not shipment:
          raise HTTPException(status_code=404, detail="Shipment not found")
     
     # Enrich with blockchain status
-    escrow = db.query(models.PaymentEscrow).filter(models.PaymentEscrow.shipment_id == shipment.id).first()
-    if escrow:
-        shipment.escrow_id = escrow.id
-        if escrow.status == 'created':
-            shipment.blockchain_status = "UNSECURED"
-        elif escrow.status == 'funded' and escrow.is_locked:
-             shipment.blockchain_status = "LOCKED"
-        else:
-             shipment.blockchain_status = "UNSECURED"
-    else:
-        shipment.blockchain_status = "NONE"
+    _attach_blockchain_status(db, [shipment])
 
-    return shipment
+    return _respond(crud_shipment.to_dict(shipment, fields), fields)
 
 @router.post("/", response_model=schemas.ShipmentResponse)
 @limiter.limit("100/minute")
@@ -122,17 +266,30 @@ def create_shipment(request: Request, shipment: schemas.ShipmentCreate, db: Sess
     BillingService.check_plan_limit(db, shipment.tenant_id, "shipments")
 
     # 2. Create Shipment
-    shipment_data = shipment.model_dump()
+    # blockchain_status / escrow_id are response-only enrichment fields, not columns
+    shipment_data = shipment.model_dump(exclude={"blockchain_status", "escrow_id"})
     
-    # Auto-calculate Carbon Emission
+    # Auto-calculate Carbon Emission from the origin/destination lane
     if shipment_data.get('weight_kg'):
         shipment_data['carbon_emission'] = calculate_carbon_footprint(
-            shipment_data['weight_kg'], 
-            shipment_data.get('transport_mode', 'SEA')
+            shipment_data['weight_kg'],
+            shipment_data.get('transport_mode', 'SEA'),
+            origin=shipment_data['origin'],
+            destination=shipment_data['destination'],
         )
         # Simple Certification Logic: If emission is efficient (Sea/Rail), mark as Green Candidate
-        if shipment_data.get('transport_mode') in ['SEA', 'RAIL']:
-            shipment_data['is_green_certified'] = True
+        shipment_data['is_green_certified'] = is_green_certified(
+            shipment_data['weight_kg'], shipment_data.get('transport_mode')
+        )
+
+    # Fill in a missing ETA, or correct an implausible one, from lane history
+    shipment_data['eta'] = eta_model.resolve_eta(
+        shipment_data['origin'],
+        shipment_data['destination'],
+        shipment_data.get('transport_mode'),
+        datetime.now(timezone.utc),
+        shipment_data.get('eta'),
+    )
 
     new_shipment = models.Shipment(**shipment_data)
     db.add(new_shipment)
@@ -145,6 +302,7 @@ def create_shipment(request: Request, shipment: schemas.ShipmentCreate, db: Sess
     # 3. Create Audit Log
     try:
         log = models.AuditLog(
+            tenant_id=new_shipment.tenant_id,
             entity_type="SHIPMENT",
             entity_id=new_shipment.id,
             action="CREATE",
@@ -159,45 +317,191 @@ def create_shipment(request: Request, shipment: schemas.ShipmentCreate, db: Sess
 
     return new_shipment
 
-@router.post("/{tracking_number}/pod", response_model=schemas.PODUploadResponse)
+@router.post("/eta/repredict", response_model=schemas.EtaRepredictResponse)
+@limiter.limit("10/minute")
+def repredict_etas(
+    request: Request,
+    only_missing: bool = Query(False, description="Only fill shipments without an ETA"),
+):
+    """Fill in or correct ETAs of the tenant's undelivered shipments from the lane model."""
+    tenant_id = getattr(request.state, "tenant_id", "default")
+    scanned, updated = eta_model.repredict(
+        tenant_id=None if tenant_id == 'default' else tenant_id,
+        only_missing=only_missing,
+    )
+    return {
+        "scanned": scanned,
+        "updated": updated,
+        "lanes": len(eta_model.lanes),
+        "fitted_at": eta_model.fitted_at,
+    }
+
+@router.post("/{tracking_number}/pod/upload-urls", response_model=schemas.PODUploadUrlResponse)
+@limiter.limit("100/minute")
+def create_pod_upload_urls(
+    request: Request,
+    tracking_number: str,
+    body: schemas.PODUploadUrlRequest,
+    db: Session = Depends(get_db),
+):
+    """Presigned URLs for uploading POD photos directly to object storage."""
+    from ...services.pod_service import PODService
+    return PODService.create_upload_urls(db, tracking_number, body.photos)
+
+
+@router.post("/pods/sync", response_model=schemas.PODSyncResponse)
+@limiter.limit("30/minute")
+async def sync_pods(request: Request, background_tasks: BackgroundTasks):
+    """Submit a driver app's queued PODs in one multipart request.
+
+    Form fields: `manifest`, a JSON list of PODSyncItem, then the file parts
+    its items name in `photos`. Each item gets its own result; replayed
+    idempotency keys return the stored result without re-processing, and
+    their file parts are skipped without being stored.
+    """
+    from pydantic import TypeAdapter, ValidationError
+    from ...services.pod_service import PODService
+    from ...services.pod_sync import PODSyncService, SyncBatch
+
+    max_size = settings.POD_MAX_FILE_SIZE_MB * 1024 * 1024
+    # The manifest carries every item's signature data URL
+    max_fields = settings.POD_SYNC_MAX_ITEMS * settings.POD_MAX_FIELDS_SIZE_MB * 1024 * 1024
+    batch: Optional[SyncBatch] = None
+    received: set[str] = set()
+
+    async def read_manifest(form):
+        nonlocal batch
+        manifest = form.get("manifest")
+        if manifest is None:
+            raise HTTPException(status_code=400, detail="Missing 'manifest' form field before the file parts")
+        try:
+            items = TypeAdapter(List[schemas.PODSyncItem]).validate_json(manifest)
+        except ValidationError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid manifest: {e.errors(include_url=False)}")
+        if len(items) > settings.POD_SYNC_MAX_ITEMS:
+            raise HTTPException(status_code=400, detail=f"Maximum {settings.POD_SYNC_MAX_ITEMS} PODs per sync")
+        batch = await PODSyncService.prepare(items)
+
+    def check_part(index: int, name: str, content_type: str):
+        # Only parts of newly claimed items are staged, each name once
+        if name not in batch.parts or name in received:
+            return False
+        received.add(name)
+
+    try:
+        form = await stream_form(
+            request,
+            max_body=settings.POD_SYNC_MAX_ITEMS * settings.POD_MAX_PHOTOS * max_size + max_fields,
+            max_file_size=max_size,
+            max_fields_size=max_fields,
+            check_file=check_part,
+            before_files=read_manifest,
+            file_label="Photo part",
+        )
+    except BaseException:
+        if batch is not None:
+            await PODSyncService.abandon(batch)
+        raise
+    try:
+        if batch is None:
+            await read_manifest(form)
+        results = await PODSyncService.run(batch, {name: staged for name, staged in form.files})
+    finally:
+        form.discard()
+
+    for result in results:
+        if result["status_code"] != 200 or result["replayed"]:
+            continue
+        if result["body"].get("photo_count"):
+            background_tasks.add_task(PODService.process_photos, result["tracking_number"])
+        if oracle.enabled:
+            background_tasks.add_task(oracle.confirm_delivery, result["tracking_number"])
+
+    succeeded = sum(1 for r in results if r["status_code"] == 200)
+    return {"results": results, "succeeded": succeeded, "failed": len(results) - succeeded}
+
+
+@router.post(
+    "/{tracking_number}/pod",
+    response_model=schemas.PODUploadResponse,
+    openapi_extra={"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": {
+        "type": "object",
+        "required": ["signature", "latitude", "longitude", "receiver_name"],
+        "properties": {
+            "signature": {"type": "string"},
+            "latitude": {"type": "string"},
+            "longitude": {"type": "string"},
+            "accuracy": {"type": "string"},
+            "receiver_name": {"type": "string"},
+            "receiver_contact": {"type": "string"},
+            "photos": {"type": "array", "items": {"type": "string", "format": "binary"}},
+            "photo_keys": {"type": "array", "items": {"type": "string"}},
+        },
+    }}}}},
+)
 @limiter.limit("100/minute")
 async def upload_pod(
     request: Request,
     tracking_number: str,
     background_tasks: BackgroundTasks,
-    signature: str = Form(...),
-    latitude: str = Form(...),
-    longitude: str = Form(...),
-    accuracy: Optional[str] = Form(default=None),
-    receiver_name: str = Form(...),
-    receiver_contact: Optional[str] = Form(default=None),
-    photos: List[UploadFile] = File(default=[]),
     db: Session = Depends(get_db),
 ):
     from ...services.pod_service import PODService
 
-    # Read photo contents
-    photo_contents = []
-    for photo in photos:
-        content = await photo.read()
-        photo_contents.append((content, photo.content_type or "image/jpeg"))
+    # Reject bad submissions before reading the body
+    await run_in_threadpool(PODService.check_submission, db, tracking_number, [])
 
-    result = PODService.upload_pod(
-        db=db,
-        tracking_number=tracking_number,
-        signature=signature,
-        latitude=float(latitude),
-        longitude=float(longitude),
-        accuracy=float(accuracy) if accuracy else None,
-        receiver_name=receiver_name,
-        receiver_contact=receiver_contact,
-        photo_contents=photo_contents,
+    # The body is parsed as it streams in: each photo goes straight to a
+    # staging file and the request is cut off at the first limit it crosses
+    max_size = settings.POD_MAX_FILE_SIZE_MB * 1024 * 1024
+    max_fields = settings.POD_MAX_FIELDS_SIZE_MB * 1024 * 1024
+    photo_types: list[str] = []
+
+    def check_photo(index: int, name: str, content_type: str):
+        PODService.check_photos(photo_types + [content_type])
+        photo_types.append(content_type)
+
+    form = await stream_form(
+        request,
+        max_body=settings.POD_MAX_PHOTOS * max_size + max_fields,
+        max_file_size=max_size,
+        max_fields_size=max_fields,
+        check_file=check_photo,
+        file_label="Photo",
     )
+    try:
+        if any(name != "photos" for name, _ in form.files):
+            raise HTTPException(status_code=400, detail="Files are only accepted in the 'photos' field")
+        try:
+            latitude = float(form.required("latitude"))
+            longitude = float(form.required("longitude"))
+            accuracy = float(form.get("accuracy")) if form.get("accuracy") else None
+        except ValueError:
+            raise HTTPException(status_code=422, detail="latitude, longitude and accuracy must be numbers")
+
+        result = await run_in_threadpool(
+            PODService.upload_pod,
+            db=db,
+            tracking_number=tracking_number,
+            signature=form.required("signature"),
+            latitude=latitude,
+            longitude=longitude,
+            accuracy=accuracy,
+            receiver_name=form.required("receiver_name"),
+            receiver_contact=form.get("receiver_contact"),
+            photos=[staged for _, staged in form.files],
+            photo_keys=form.get_list("photo_keys"),
+        )
+    finally:
+        form.discard()
+
+    # Thumbnails and web renditions are produced after the response is sent
+    if result["photo_count"]:
+        background_tasks.add_task(PODService.process_photos, tracking_number)
 
     # Trigger Oracle for Automated Settlement
-    oracle_service = OracleService()
-    if oracle_service.w3:
-        background_tasks.add_task(oracle_service.confirm_delivery, tracking_number)
+    if oracle.enabled:
+        background_tasks.add_task(oracle.confirm_delivery, tracking_number)
 
     return result
 
@@ -223,18 +527,40 @@ def verify_pod(
     )
 
 
+@router.post("/pods/verify", response_model=schemas.PODBulkVerifyResponse)
+@limiter.limit("30/minute")
+def bulk_verify_pods(
+    request: Request,
+    body: schemas.PODBulkVerifyRequest,
+    db: Session = Depends(get_db),
+):
+    """Verify or dispute a batch of PODs; per-item failures are reported, not raised."""
+    from ...services.pod_service import PODService
+    return PODService.bulk_verify(db, body.items)
+
+
 @router.get("/{tracking_number}/pod/receipt", response_model=schemas.PODReceiptResponse)
 def get_pod_receipt(tracking_number: str, db: Session = Depends(get_db)):
     from ...services.pod_service import PODService
     return PODService.get_pod_receipt(db, tracking_number)
 
 
+@router.get("/{tracking_number}/pod/receipt.pdf")
+async def get_pod_receipt_pdf(request: Request, tracking_number: str, db: Session = Depends(get_db)):
+    """PDF receipt; rendered once per verification state, then served from the receipt cache."""
+    from ...core import receipts
+    from ...services.pod_service import PODService
+    source = await run_in_threadpool(PODService.get_receipt_source, db, tracking_number)
+    path = await PODService.render_receipt_pdf(source)
+    return receipts.file_response(path, request.headers)
+
+
 @router.get("/pods/list", response_model=schemas.PODListResponse)
 def list_pods(
     status: Optional[str] = None,
     page: int = 1,
     limit: int = 20,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     from ...services.pod_service import PODService
     return PODService.list_pods(db, status_filter=status, page=page, limit=limit)
@@ -0,0 +1,164 @@
+"""Distance-aware carbon engine.
+
+Emissions are weight x lane distance x mode emission factor. Lane distance
+comes from a curated sea-lane table when known, otherwise the great-circle
+distance between the two ports scaled by a per-mode routing factor. Origins
+and destinations may be UN/LOCODEs ("KRPUS") or free text ("Busan, KR").
+"""
+import re
+from functools import lru_cache
+from typing import Optional, Sequence
+
+import numpy as np
+
+from app.carbon.ports import ALIASES, PORTS
+from app.core.geo import haversine_km
+
+# Emission Factors (kg CO2 per ton-km) - LogiNexus Constants
+EMISSION_FACTORS = {
+    "SEA": 0.010,   # Very Efficient
+    "RAIL": 0.025,  # Efficient
+    "TRUCK": 0.060, # Moderate
+    "AIR": 0.600    # High Impact
+}
+DEFAULT_MODE = "SEA"
+
+# Modes eligible for the green certification badge
+GREEN_MODES = {"SEA", "RAIL"}
+
+# Used when either port cannot be resolved (Asia-US average)
+DEFAULT_DISTANCE_KM = 8000.0
+
+# Actual routes are longer than the great circle between two ports
+ROUTING_FACTORS = {
+    "SEA": 1.35,
+    "RAIL": 1.25,
+    "TRUCK": 1.20,
+    "AIR": 1.05,
+}
+
+# Known sea-lane distances (km) that differ a lot from the scaled great circle
+SEA_LANE_DISTANCES_KM = {
+    ("CNSHA", "NLRTM"): 19550.0,  # via Suez
+    ("KRPUS", "DEHAM"): 20700.0,  # via Suez
+    ("THBKK", "DEHAM"): 17400.0,  # via Suez
+    ("SGSIN", "GBFXT"): 15100.0,  # via Suez
+    ("KRPUS", "USLAX"): 9650.0,
+    ("CNSHA", "USLAX"): 10500.0,
+    ("HKHKG", "USLAX"): 11650.0,
+    ("JPTYO", "USSEA"): 7800.0,
+    ("CNSHA", "USNYC"): 19500.0,  # via Panama
+}
+
+_NAME_INDEX = {name.lower(): code for code, (name, _, _) in PORTS.items()}
+_NOISE_WORDS = {"port", "of", "terminal", "harbor", "harbour"}
+
+
+def known_mode(mode: Optional[str]) -> Optional[str]:
+    """The canonical mode name, or None if the mode is missing or unknown."""
+    mode = mode.strip().upper() if mode else None
+    return mode if mode in EMISSION_FACTORS else None
+
+
+def normalize_mode(mode: Optional[str]) -> str:
+    return known_mode(mode) or DEFAULT_MODE
+
+
+@lru_cache(maxsize=4096)
+def resolve_port(value: Optional[str]) -> Optional[str]:
+    """Map a LOCODE or free-text port name to a LOCODE, or None if unknown."""
+    if not value:
+        return None
+    code = value.strip().upper().replace(" ", "")
+    if code in PORTS:
+        return code
+
+    # "Busan, KR" / "Shanghai Port" / "Port of Los Angeles"
+    head = value.split(",")[0].lower()
+    words = [w for w in re.split(r"[^a-z]+", head) if w and w not in _NOISE_WORDS]
+    name = " ".join(words)
+    return _NAME_INDEX.get(name) or ALIASES.get(name)
+
+
+def port_coordinates(value: Optional[str]) -> Optional[tuple]:
+    code = resolve_port(value)
+    if code is None:
+        return None
+    _, lat, lng = PORTS[code]
+    return lat, lng
+
+
+@lru_cache(maxsize=16384)
+def lane_distance_km(origin: Optional[str], destination: Optional[str], mode: Optional[str] = DEFAULT_MODE) -> float:
+    """Distance in km for an origin/destination pair, cached per pair and mode."""
+    mode = normalize_mode(mode)
+    o, d = resolve_port(origin), resolve_port(destination)
+    if o is None or d is None:
+        return DEFAULT_DISTANCE_KM
+    if mode == "SEA":
+        lane = SEA_LANE_DISTANCES_KM.get((o, d)) or SEA_LANE_DISTANCES_KM.get((d, o))
+        if lane:
+            return lane
+    _, lat1, lng1 = PORTS[o]
+    _, lat2, lng2 = PORTS[d]
+    return round(haversine_km(lat1, lng1, lat2, lng2) * ROUTING_FACTORS[mode], 1)
+
+
+def calculate_carbon_footprint(
+    weight_kg: float,
+    mode: Optional[str],
+    origin: Optional[str] = None,
+    destination: Optional[str] = None,
+    distance_km: Optional[float] = None,
+) -> float:
+    """
+    Calculate CO2 emissions in kg.
+    Distance is derived from the origin/destination lane unless given explicitly.
+    """
+    mode = normalize_mode(mode)
+    if distance_km is None:
+        distance_km = lane_distance_km(origin, destination, mode)
+    weight_tons = float(weight_kg) / 1000.0
+
+    # Emission = Tons * Km * Factor
+    return round(weight_tons * distance_km * EMISSION_FACTORS[mode], 2)
+
+
+def is_green_certified(weight_kg: Optional[float], mode: Optional[str]) -> bool:
+    # Emissions fall back to SEA for a missing or unknown mode; certification does not
+    return bool(weight_kg) and known_mode(mode) in GREEN_MODES
+
+
+# ──── Vectorized batch API ────
+
+def compute_batch(
+    weights_kg: Sequence,
+    modes: Sequence,
+    origins: Sequence,
+    destinations: Sequence,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Return (carbon_emission, is_green_certified) arrays for many shipments.
+
+    Per-row Python work is limited to factorizing the categorical columns;
+    factor and distance lookups run once per distinct mode / lane and the
+    arithmetic runs as NumPy array operations. Rows without a weight get a
+    NaN emission (stored as NULL) and are not certified.
+    """
+    weights = np.asarray(weights_kg, dtype=np.float64)
+    mode_keys = np.array([normalize_mode(m) for m in modes], dtype=object)
+    green_modes = np.array([known_mode(m) in GREEN_MODES for m in modes], dtype=bool)
+
+    uniq_modes, mode_idx = np.unique(mode_keys, return_inverse=True)
+    factors = np.array([EMISSION_FACTORS[m] for m in uniq_modes])[mode_idx]
+
+    lane_keys = np.array(
+        [f"{o or ''}\x1f{d or ''}\x1f{m}" for o, d, m in zip(origins, destinations, mode_keys)],
+        dtype=object,
+    )
+    uniq_lanes, lane_idx = np.unique(lane_keys, return_inverse=True)
+    distances = np.array([lane_distance_km(*key.split("\x1f")) for key in uniq_lanes])[lane_idx]
+
+    # Mirrors shipment creation: only shipments with a weight get a figure
+    has_weight = np.isfinite(weights) & (weights != 0)
+    emissions = np.where(has_weight, np.round(weights / 1000.0 * distances * factors, 2), np.nan)
+    return emissions, green_modes & has_weight
@@ -0,0 +1,86 @@
+"""UN/LOCODE port coordinates and name aliases used for lane distances."""
+
+# LOCODE -> (name, latitude, longitude)
+PORTS = {
+    # East Asia
+    "KRPUS": ("Busan", 35.1028, 129.0403),
+    "KRICN": ("Incheon", 37.4563, 126.5982),
+    "KRKAN": ("Gwangyang", 34.9034, 127.6958),
+    "CNSHA": ("Shanghai", 31.2304, 121.4737),
+    "CNNGB": ("Ningbo", 29.8683, 121.5440),
+    "CNSZX": ("Shenzhen", 22.5431, 114.0579),
+    "CNTAO": ("Qingdao", 36.0671, 120.3826),
+    "CNTSN": ("Tianjin", 38.9860, 117.7330),
+    "CNXMN": ("Xiamen", 24.4798, 118.0894),
+    "CNCAN": ("Guangzhou", 23.1291, 113.2644),
+    "HKHKG": ("Hong Kong", 22.2855, 114.1577),
+    "TWKHH": ("Kaohsiung", 22.6163, 120.3133),
+    "JPTYO": ("Tokyo", 35.6170, 139.7780),
+    "JPYOK": ("Yokohama", 35.4437, 139.6380),
+    "JPUKB": ("Kobe", 34.6901, 135.1955),
+    # Southeast & South Asia
+    "SGSIN": ("Singapore", 1.2644, 103.8400),
+    "MYPKG": ("Port Klang", 3.0000, 101.3900),
+    "MYTPP": ("Tanjung Pelepas", 1.3626, 103.5517),
+    "VNSGN": ("Ho Chi Minh City", 10.7626, 106.6602),
+    "VNHPH": ("Haiphong", 20.8449, 106.6881),
+    "THLCH": ("Laem Chabang", 13.0827, 100.8833),
+    "THBKK": ("Bangkok", 13.7563, 100.5018),
+    "IDTPP": ("Tanjung Priok", -6.1045, 106.8806),
+    "PHMNL": ("Manila", 14.5995, 120.9842),
+    "INNSA": ("Nhava Sheva", 18.9490, 72.9512),
+    "INMAA": ("Chennai", 13.0827, 80.2707),
+    "LKCMB": ("Colombo", 6.9497, 79.8428),
+    # Middle East & Africa
+    "AEJEA": ("Jebel Ali", 25.0112, 55.0612),
+    "SAJED": ("Jeddah", 21.4858, 39.1925),
+    "EGPSD": ("Port Said", 31.2653, 32.3019),
+    "ZADUR": ("Durban", -29.8587, 31.0218),
+    "MAPTM": ("Tanger Med", 35.8847, -5.5011),
+    # Europe
+    "NLRTM": ("Rotterdam", 51.9490, 4.1420),
+    "DEHAM": ("Hamburg", 53.5461, 9.9661),
+    "DEBRV": ("Bremerhaven", 53.5396, 8.5809),
+    "BEANR": ("Antwerp", 51.2637, 4.3996),
+    "GBFXT": ("Felixstowe", 51.9617, 1.3513),
+    "GBSOU": ("Southampton", 50.8998, -1.4044),
+    "FRLEH": ("Le Havre", 49.4824, 0.1075),
+    "ESVLC": ("Valencia", 39.4432, -0.3163),
+    "ESALG": ("Algeciras", 36.1408, -5.4562),
+    "ITGOA": ("Genoa", 44.4056, 8.9463),
+    "GRPIR": ("Piraeus", 37.9420, 23.6465),
+    "PLGDN": ("Gdansk", 54.3520, 18.6466),
+    # Americas
+    "USLAX": ("Los Angeles", 33.7361, -118.2628),
+    "USLGB": ("Long Beach", 33.7542, -118.2165),
+    "USOAK": ("Oakland", 37.7956, -122.2790),
+    "USSEA": ("Seattle", 47.6025, -122.3385),
+    "USTIW": ("Tacoma", 47.2690, -122.4130),
+    "USNYC": ("New York", 40.6840, -74.0421),
+    "USSAV": ("Savannah", 32.0809, -81.0912),
+    "USHOU": ("Houston", 29.7305, -95.2655),
+    "USCHI": ("Chicago", 41.8781, -87.6298),
+    "CAVAN": ("Vancouver", 49.2888, -123.1111),
+    "MXZLO": ("Manzanillo", 19.0522, -104.3158),
+    "PAONX": ("Colon", 9.3547, -79.9000),
+    "BRSSZ": ("Santos", -23.9608, -46.3336),
+    "CLVAP": ("Valparaiso", -33.0472, -71.6127),
+    # Oceania
+    "AUSYD": ("Sydney", -33.8688, 151.2093),
+    "AUMEL": ("Melbourne", -37.8400, 144.9100),
+    "NZAKL": ("Auckland", -36.8485, 174.7633),
+}
+
+# Free-text names seen in shipment origin/destination fields -> LOCODE
+ALIASES = {
+    "pusan": "KRPUS",
+    "la": "USLAX",
+    "new york new jersey": "USNYC",
+    "newark": "USNYC",
+    "saigon": "VNSGN",
+    "hcmc": "VNSGN",
+    "jakarta": "IDTPP",
+    "mumbai": "INNSA",
+    "dubai": "AEJEA",
+    "antwerpen": "BEANR",
+}
@@ -0,0 +1,106 @@
+"""Shared async web3 clients for the chain-facing background services.
+
+One AsyncWeb3 per RPC URL, backed by a single aiohttp session with keep-alive
+connections (web3's default session closes the connection after every call).
+RPC fan-out goes through `gather_rpc`, which caps the number of calls in
+flight at RPC_MAX_CONCURRENCY so a large sweep cannot flood the provider.
+`NonceManager` and `GasPriceCache` let a sender sign many transactions
+without asking the node for its nonce and gas price each time.
+"""
+import asyncio
+import time
+from typing import Awaitable, Optional
+
+import aiohttp
+from web3 import AsyncHTTPProvider, AsyncWeb3
+
+from .config import settings
+
+_clients: dict[str, AsyncWeb3] = {}
+_sessions: list[aiohttp.ClientSession] = []
+_lock = asyncio.Lock()
+_slots = asyncio.Semaphore(settings.RPC_MAX_CONCURRENCY)
+
+
+async def get_web3(rpc_url: str) -> AsyncWeb3:
+    """The shared client for `rpc_url`, created on first use."""
+    async with _lock:
+        w3 = _clients.get(rpc_url)
+        if w3 is None:
+            provider = AsyncHTTPProvider(rpc_url)
+            session = aiohttp.ClientSession(
+                raise_for_status=True,
+                connector=aiohttp.TCPConnector(limit=settings.RPC_MAX_CONCURRENCY, keepalive_timeout=60),
+                timeout=aiohttp.ClientTimeout(total=settings.RPC_TIMEOUT_SECONDS),
+            )
+            await provider.cache_async_session(session)
+            _sessions.append(session)
+            w3 = _clients[rpc_url] = AsyncWeb3(provider)
+        return w3
+
+
+async def bounded(call: Awaitable):
+    """Await one RPC call within the RPC_MAX_CONCURRENCY limit."""
+    async with _slots:
+        return await call
+
+
+async def gather_rpc(*calls: Awaitable, return_exceptions: bool = False) -> list:
+    """asyncio.gather for RPC calls, with at most RPC_MAX_CONCURRENCY in flight.
+
+    Pass leaf RPC calls only: a call that itself waits on gather_rpc could hold
+    a slot its children need.
+    """
+    return await asyncio.gather(*(bounded(call) for call in calls), return_exceptions=return_exceptions)
+
+
+async def close():
+    for session in _sessions:
+        await session.close()
+    _sessions.clear()
+    _clients.clear()
+
+
+class NonceManager:
+    """Hands out nonces for one sending account without an RPC round trip per tx.
+
+    Seeded from the node's pending transaction count on first use and after
+    `resync()`, which callers invoke when a broadcast fails so a skipped
+    nonce is handed out again instead of leaving a gap.
+    """
+
+    def __init__(self, w3: AsyncWeb3, address: str):
+        self.w3 = w3
+        self.address = address
+        self._next: Optional[int] = None
+        self._lock = asyncio.Lock()
+
+    async def allocate(self, count: int = 1) -> list[int]:
+        async with self._lock:
+            if self._next is None:
+                self._next = await bounded(self.w3.eth.get_transaction_count(self.address, "pending"))
+            nonces = list(range(self._next, self._next + count))
+            self._next += count
+            return nonces
+
+    async def resync(self):
+        async with self._lock:
+            self._next = None
+
+
+class GasPriceCache:
+    """eth_gasPrice, refreshed at most once per `ttl` seconds."""
+
+    def __init__(self, w3: AsyncWeb3, ttl: float):
+        self.w3 = w3
+        self.ttl = ttl
+        self._value: Optional[int] = None
+        self._fetched_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def get(self) -> int:
+        async with self._lock:
+            if self._value is None or time.monotonic() - self._fetched_at > self.ttl:
+                self._value = await bounded(self.w3.eth.gas_price)
+                self._fetched_at = time.monotonic()
+            return self._value
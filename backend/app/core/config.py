@@ -1,6 +1,6 @@
 from pydantic_settings import BaseSettings
 from pydantic import Field
-from typing import List
+from typing import List, Optional
 
 
 class Settings(BaseSettings):
@@ -12,6 +12,14 @@ class Settings(BaseSettings):
 
     # --- Database ---
     DATABASE_URL: str = "postgresql://jaehong@localhost/loginexus"
+    # Optional streaming replica for read-only endpoints (empty = use the primary)
+    DATABASE_REPLICA_URL: str = ""
+    REPLICA_MAX_LAG_SECONDS: float = 5.0
+    REPLICA_LAG_CHECK_SECONDS: float = 2.0
+    # An unreachable replica must not stall requests; reads fall back to the primary
+    REPLICA_CONNECT_TIMEOUT_SECONDS: int = 2
+    # After a write, the same client reads from the primary for this long
+    READ_YOUR_WRITES_SECONDS: int = 10
 
     # --- Auth ---
     SECRET_KEY: str = Field(default="change-me-in-production", min_length=16)
@@ -34,12 +42,24 @@ class Settings(BaseSettings):
         alias="SEPOLIA_RPC_URL",
     )
     CHAIN_ID: int = 11155111
+    RPC_MAX_CONCURRENCY: int = 8
+    RPC_TIMEOUT_SECONDS: int = 30
     ORACLE_PRIVATE_KEY: str = ""
     ORACLE_ADDRESS: str = ""
+    ORACLE_GAS_PRICE_TTL_SECONDS: int = 15
     ESCROW_CONTRACT_ADDRESS: str = Field(
         default="",
         alias="NEXT_PUBLIC_LOGISTICS_ESCROW_ADDRESS",
     )
+    # Escrow event sync only applies blocks this deep, and rewinds this far on a reorg
+    ESCROW_SYNC_CONFIRMATIONS: int = 12
+    ESCROW_SYNC_REORG_DEPTH: int = 64
+    # First block to backfill for a newly tracked escrow (e.g. the EscrowFactory
+    # deployment block); unset = only the last 1000 blocks
+    ESCROW_SYNC_START_BLOCK: Optional[int] = None
+    ESCROW_BACKFILL_CONCURRENCY: int = 4
+    # Also stream escrow logs over eth_subscribe (e.g. wss://..., ws://127.0.0.1:8545)
+    ESCROW_SYNC_WS_URL: str = ""
 
     # --- Billing (Stripe) ---
     STRIPE_SECRET_KEY: str = ""
@@ -51,8 +71,40 @@ class Settings(BaseSettings):
     # --- POD Storage ---
     POD_STORAGE_PATH: str = "./uploads/pod"
     POD_STORAGE_BACKEND: str = "local"  # local | s3
+    # Uploads being received and local copies of remote objects. Never under a
+    # served directory; on POD_STORAGE_PATH's filesystem, storing is a rename
+    POD_STAGING_PATH: str = "./var/staging"
     POD_MAX_PHOTOS: int = 5
     POD_MAX_FILE_SIZE_MB: int = 5
+    # Budget for the text fields of a POD upload (the signature is a data URL)
+    POD_MAX_FIELDS_SIZE_MB: int = 2
+    POD_SYNC_MAX_ITEMS: int = 20
+    POD_SYNC_CONCURRENCY: int = 4
+    # How long a completed sync item's result is kept for replays
+    POD_SYNC_KEY_TTL_HOURS: int = 168
+    # S3-compatible object storage (POD_STORAGE_BACKEND=s3); set the endpoint for MinIO
+    S3_BUCKET: str = ""
+    S3_ENDPOINT_URL: str = ""
+    S3_REGION: str = "us-east-1"
+    S3_ACCESS_KEY_ID: str = ""
+    S3_SECRET_ACCESS_KEY: str = ""
+    S3_PRESIGN_EXPIRES_SECONDS: int = 900
+    S3_MULTIPART_THRESHOLD_MB: int = 8
+    # nginx `internal` location mapped to the uploads directory; when set,
+    # /uploads responses carry X-Accel-Redirect and nginx sends the file
+    UPLOADS_X_ACCEL_PREFIX: str = ""
+    # Rendered PDF receipts (a cache; safe to delete). Kept out of /uploads:
+    # only GET /shipments/{tn}/pod/receipt.pdf serves them
+    POD_RECEIPT_CACHE_PATH: str = "./var/receipts"
+    # nginx `internal` location mapped to POD_RECEIPT_CACHE_PATH (optional)
+    POD_RECEIPT_X_ACCEL_PREFIX: str = ""
+
+    # --- Background processing ---
+    WORKER_PROCESSES: int = 2
+
+    # --- ETA model ---
+    ETA_REFIT_INTERVAL_SECONDS: int = 3600
+    ETA_LOOKBACK_DAYS: int = 365
 
     # --- Logging ---
     LOG_LEVEL: str = "INFO"
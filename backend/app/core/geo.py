@@ -0,0 +1,131 @@
+"""Pure-Python geohash helpers for map queries (PostGIS is not available).
+
+Shipments store a geohash of their position in a B-tree indexed column.
+Every geohash prefix is a rectangular cell, and all hashes inside a cell
+share that prefix, so a viewport becomes a handful of index range scans
+(`geohash >= prefix AND geohash < prefix || '~'`).
+"""
+import math
+from typing import List, Tuple
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+DEFAULT_PRECISION = 9  # ~4.8m x 4.8m cells
+MAX_COVER_CELLS = 32
+EARTH_RADIUS_KM = 6371.0088
+
+BBox = Tuple[float, float, float, float]  # (min_lat, min_lng, max_lat, max_lng)
+
+
+def encode(lat: float, lng: float, precision: int = DEFAULT_PRECISION) -> str:
+    """Encode a coordinate into a geohash string."""
+    lat_lo, lat_hi = -90.0, 90.0
+    lng_lo, lng_hi = -180.0, 180.0
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        if even:
+            mid = (lng_lo + lng_hi) / 2
+            if lng >= mid:
+                bits = (bits << 1) | 1
+                lng_lo = mid
+            else:
+                bits <<= 1
+                lng_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                bits = (bits << 1) | 1
+                lat_lo = mid
+            else:
+                bits <<= 1
+                lat_hi = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(chars)
+
+
+def cell_size(precision: int) -> Tuple[float, float]:
+    """Return (height_deg, width_deg) of a geohash cell at the given precision."""
+    total_bits = precision * 5
+    lng_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / (2 ** lat_bits), 360.0 / (2 ** lng_bits)
+
+
+def _split_antimeridian(bbox: BBox) -> List[BBox]:
+    min_lat, min_lng, max_lat, max_lng = bbox
+    if min_lng <= max_lng:
+        return [bbox]
+    return [(min_lat, min_lng, max_lat, 180.0), (min_lat, -180.0, max_lat, max_lng)]
+
+
+def _estimate_cells(bbox: BBox, precision: int) -> int:
+    height, width = cell_size(precision)
+    total = 0
+    for min_lat, min_lng, max_lat, max_lng in _split_antimeridian(bbox):
+        rows = math.floor(max_lat / height) - math.floor(min_lat / height) + 1
+        cols = math.floor(max_lng / width) - math.floor(min_lng / width) + 1
+        total += rows * cols
+    return total
+
+
+def cover_precision(bbox: BBox, max_cells: int = MAX_COVER_CELLS) -> int:
+    """Finest precision whose cells cover the bbox in at most max_cells cells."""
+    precision = 1
+    while precision < DEFAULT_PRECISION and _estimate_cells(bbox, precision + 1) <= max_cells:
+        precision += 1
+    return precision
+
+
+def cover(bbox: BBox, max_cells: int = MAX_COVER_CELLS) -> Tuple[int, List[str]]:
+    """Return (precision, prefixes) of geohash cells that cover the bbox."""
+    precision = cover_precision(bbox, max_cells)
+    height, width = cell_size(precision)
+    prefixes = set()
+    for min_lat, min_lng, max_lat, max_lng in _split_antimeridian(bbox):
+        lat = min_lat
+        while True:
+            lng = min_lng
+            while True:
+                prefixes.add(encode(min(lat, 90.0), min(lng, 180.0), precision))
+                if lng >= max_lng:
+                    break
+                lng = min(lng + width, max_lng)
+            if lat >= max_lat:
+                break
+            lat = min(lat + height, max_lat)
+    return precision, sorted(prefixes)
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle distance between two coordinates in kilometres."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def bbox_around(lat: float, lng: float, radius_km: float) -> BBox:
+    """Bounding box that fully contains a circle of radius_km around a point."""
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    min_lat = max(-90.0, lat - dlat)
+    max_lat = min(90.0, lat + dlat)
+    if min_lat <= -90.0 or max_lat >= 90.0:
+        return min_lat, -180.0, max_lat, 180.0
+    dlng = math.degrees(radius_km / (EARTH_RADIUS_KM * math.cos(math.radians(lat))))
+    if dlng >= 180.0:
+        return min_lat, -180.0, max_lat, 180.0
+    min_lng = lng - dlng
+    max_lng = lng + dlng
+    if min_lng < -180.0:
+        min_lng += 360.0
+    if max_lng > 180.0:
+        max_lng -= 360.0
+    return min_lat, min_lng, max_lat, max_lng
@@ -0,0 +1,36 @@
+"""Image renditions for POD photos.
+
+Runs inside process-pool workers (see core/workers.py), so this module only
+depends on Pillow and must stay importable without the app's DB setup.
+"""
+import io
+
+from PIL import Image, ImageOps
+
+# name -> (bounding box, WebP quality)
+RENDITIONS = {
+    "thumbnail": ((320, 320), 70),
+    "web": ((1600, 1600), 80),
+}
+
+
+def render_photo(path: str) -> dict:
+    """Return the original's dimensions and WebP rendition bytes for one photo.
+
+    Renditions are re-encoded from pixels only, so EXIF (GPS, device, time)
+    and other metadata are not carried over; orientation is applied first.
+    """
+    with Image.open(path) as source:
+        img = ImageOps.exif_transpose(source)
+        width, height = img.size
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGB")
+
+        result = {"width": width, "height": height}
+        for name, (box, quality) in RENDITIONS.items():
+            rendition = img.copy()
+            rendition.thumbnail(box, Image.Resampling.LANCZOS)
+            buf = io.BytesIO()
+            rendition.save(buf, "WEBP", quality=quality, method=4)
+            result[name] = buf.getvalue()
+        return result
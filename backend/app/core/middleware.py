@@ -5,6 +5,9 @@ import structlog
 from fastapi import Request
 from starlette.middleware.base import BaseHTTPMiddleware
 
+from .config import settings
+from ..database import READ_YOUR_WRITES_COOKIE
+
 
 class TenantMiddleware(BaseHTTPMiddleware):
     async def dispatch(self, request: Request, call_next):
@@ -68,3 +71,27 @@ class RequestLoggingMiddleware(BaseHTTPMiddleware):
 
         response.headers["X-Request-ID"] = request_id
         return response
+
+
+class ReadYourWritesMiddleware(BaseHTTPMiddleware):
+    """Pin a client to the primary for a short window after it writes.
+
+    Read-only endpoints may be served by a lagging replica (see
+    database.get_read_db); the cookie lets a client see its own writes.
+    """
+
+    SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+    async def dispatch(self, request: Request, call_next):
+        response = await call_next(request)
+
+        if request.method not in self.SAFE_METHODS and response.status_code < 400:
+            window = settings.READ_YOUR_WRITES_SECONDS
+            response.set_cookie(
+                READ_YOUR_WRITES_COOKIE,
+                str(time.time() + window),
+                max_age=window,
+                httponly=True,
+                samesite="lax",
+            )
+        return response
@@ -0,0 +1,170 @@
+"""Streaming multipart/form-data parsing for uploads that are limited while they arrive.
+
+`request.form()` (and `File(...)` parameters) spool the whole body to disk
+before the handler runs, so a size limit can only be applied after an
+oversized upload has been received. `stream_form` parses `request.stream()`
+directly instead: text fields are kept in memory, file parts are written
+chunk by chunk to staging files (see StorageBackend.open_staging), and the
+first part, field or body over its limit ends the request with 413 while
+the rest of the body is still unread. A declared Content-Length over the
+body limit is rejected before anything is read.
+
+Fields sent ahead of the files (a batch manifest, say) can be acted on
+before any file is staged through the `before_files` hook, and `check_file`
+can have a part skipped rather than staged.
+"""
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Optional
+
+from fastapi import HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+
+try:
+    from python_multipart.exceptions import MultipartParseError
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.exceptions import MultipartParseError
+    from multipart.multipart import MultipartParser, parse_options_header
+
+from .storage import StagedFile, StagingWriter, UploadTooLarge, storage
+
+
+@dataclass
+class StreamedForm:
+    fields: dict[str, list[str]] = field(default_factory=dict)
+    files: list[tuple[str, StagedFile]] = field(default_factory=list)  # (field name, staged file)
+
+    def get(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        values = self.fields.get(name)
+        return values[-1] if values else default
+
+    def get_list(self, name: str) -> list[str]:
+        return self.fields.get(name, [])
+
+    def required(self, name: str) -> str:
+        value = self.get(name)
+        if value is None:
+            raise HTTPException(status_code=422, detail=f"Missing form field '{name}'")
+        return value
+
+    def discard(self) -> None:
+        for _, staged in self.files:
+            storage.discard(staged)
+
+
+class _Part:
+    def __init__(self):
+        self.headers: dict[bytes, bytes] = {}
+        self.name = ""
+        self.writer: Optional[StagingWriter] = None
+        self.skip = False
+        self.value = bytearray()
+
+
+async def stream_form(
+    request: Request,
+    *,
+    max_body: int,
+    max_file_size: int,
+    max_fields_size: int,
+    check_file: Callable[[int, str, str], Optional[bool]] = lambda index, name, content_type: None,
+    before_files: Optional[Callable[[StreamedForm], Awaitable[None]]] = None,
+    file_label: str = "File",
+) -> StreamedForm:
+    """Parse a multipart body, staging file parts under `max_file_size` each.
+
+    `before_files(form)` is awaited once, when the first file part begins,
+    with the fields read so far. `check_file(index, name, content_type)` runs
+    when a file part's headers arrive, before any of its bytes are read; it
+    may raise HTTPException, or return False to have the part's bytes
+    discarded instead of staged. Text fields share a `max_fields_size`
+    budget. On any error the files staged so far are removed.
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise HTTPException(status_code=415, detail="Expected multipart/form-data")
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > max_body:
+        raise HTTPException(status_code=413, detail=f"Request body exceeds {max_body} bytes")
+
+    # The parser's callbacks are synchronous; they queue events that are
+    # handled (with file writes in the threadpool) after each chunk
+    events: list[tuple] = []
+    header: dict[str, bytearray] = {}
+    callbacks = {
+        "on_part_begin": lambda: events.append(("begin",)),
+        "on_part_data": lambda data, start, end: events.append(("data", bytes(data[start:end]))),
+        "on_part_end": lambda: events.append(("end",)),
+        "on_header_begin": lambda: header.update(field=bytearray(), value=bytearray()),
+        "on_header_field": lambda data, start, end: header["field"].extend(data[start:end]),
+        "on_header_value": lambda data, start, end: header["value"].extend(data[start:end]),
+        "on_header_end": lambda: events.append(("header", bytes(header["field"]).lower(), bytes(header["value"]))),
+        "on_headers_finished": lambda: events.append(("headers_done",)),
+    }
+    parser = MultipartParser(params[b"boundary"], callbacks)
+
+    form = StreamedForm()
+    part: Optional[_Part] = None
+    files_started = False
+    received = fields_size = 0
+    try:
+        async for chunk in request.stream():
+            received += len(chunk)
+            if received > max_body:
+                raise HTTPException(status_code=413, detail=f"Request body exceeds {max_body} bytes")
+            try:
+                parser.write(chunk)
+            except MultipartParseError:
+                raise HTTPException(status_code=400, detail="Malformed multipart body")
+            for event in events:
+                kind = event[0]
+                if kind == "begin":
+                    part = _Part()
+                elif kind == "header":
+                    part.headers[event[1]] = event[2]
+                elif kind == "headers_done":
+                    _, disposition = parse_options_header(part.headers.get(b"content-disposition", b""))
+                    part.name = disposition.get(b"name", b"").decode("latin-1")
+                    if b"filename" in disposition:
+                        if not files_started and before_files is not None:
+                            await before_files(form)
+                        files_started = True
+                        file_type = part.headers.get(b"content-type", b"").decode("latin-1") or "image/jpeg"
+                        if check_file(len(form.files), part.name, file_type) is False:
+                            part.skip = True
+                        else:
+                            part.writer = await run_in_threadpool(storage.open_staging, file_type, max_file_size)
+                elif kind == "data":
+                    if part.skip:
+                        pass
+                    elif part.writer is not None:
+                        try:
+                            await run_in_threadpool(part.writer.write, event[1])
+                        except UploadTooLarge:
+                            raise HTTPException(
+                                status_code=413,
+                                detail=f"{file_label} {len(form.files) + 1} exceeds {max_file_size // (1024 * 1024)}MB limit",
+                            )
+                    else:
+                        fields_size += len(event[1])
+                        if fields_size > max_fields_size:
+                            raise HTTPException(status_code=413, detail="Form fields are too large")
+                        part.value.extend(event[1])
+                elif kind == "end":
+                    if part.skip:
+                        pass
+                    elif part.writer is not None:
+                        form.files.append((part.name, await run_in_threadpool(part.writer.close)))
+                    else:
+                        form.fields.setdefault(part.name, []).append(part.value.decode("utf-8", errors="replace"))
+                    part = None
+            events.clear()
+        parser.finalize()
+        if part is not None:
+            raise HTTPException(status_code=400, detail="Incomplete multipart body")
+    except BaseException:
+        if part is not None and part.writer is not None:
+            part.writer.abort()
+        form.discard()
+        raise
+    return form
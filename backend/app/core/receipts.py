@@ -0,0 +1,189 @@
+"""PDF rendering and on-disk cache for POD receipts.
+
+`render_receipt` runs inside process-pool workers (see core/workers.py), so it
+only depends on reportlab and Pillow and must stay importable without the
+app's DB setup. Rendered files are cached under POD_RECEIPT_CACHE_PATH, one
+directory per tracking number and one file per `pod_verified_at`. The cache
+is outside the public /uploads mount; only the receipt endpoint serves it
+(`file_response`).
+"""
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+from datetime import datetime
+from typing import Optional
+
+from PIL import Image
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse
+
+from .config import settings
+
+# Receipts show personal data: never kept by shared caches, revalidated on use
+CACHE_CONTROL = "private, no-cache"
+
+MARGIN = 18 * mm
+THUMB_SIZE = 40 * mm
+THUMB_GAP = 4 * mm
+SIGNATURE_BOX = (70 * mm, 30 * mm)
+
+
+# ──── Cache ────
+
+def _directory(tracking_number: str) -> str:
+    # Tracking numbers are user-supplied; never use them as a path directly
+    return hashlib.sha256(tracking_number.encode()).hexdigest()[:32]
+
+
+def _filename(verified_at: Optional[datetime]) -> str:
+    stamp = verified_at.strftime("%Y%m%dT%H%M%S%f") if verified_at else "unverified"
+    return f"receipt-{stamp}.pdf"
+
+
+def cache_path(tracking_number: str, verified_at: Optional[datetime]) -> str:
+    return os.path.join(settings.POD_RECEIPT_CACHE_PATH, _directory(tracking_number), _filename(verified_at))
+
+
+def file_response(path: str, request_headers: Headers) -> Response:
+    """Serve a cached receipt, with ETag/304 and ranges; via nginx when POD_RECEIPT_X_ACCEL_PREFIX is set."""
+    response = FileResponse(
+        path, media_type="application/pdf", headers={"cache-control": CACHE_CONTROL}, stat_result=os.stat(path)
+    )
+    if request_headers.get("if-none-match") == response.headers["etag"]:
+        return NotModifiedResponse(response.headers)
+    if settings.POD_RECEIPT_X_ACCEL_PREFIX:
+        relative = os.path.relpath(path, settings.POD_RECEIPT_CACHE_PATH).replace(os.sep, "/")
+        accel_headers = {
+            key: value for key, value in response.headers.items()
+            if key in ("cache-control", "etag", "last-modified", "content-type")
+        }
+        accel_headers["x-accel-redirect"] = f"{settings.POD_RECEIPT_X_ACCEL_PREFIX.rstrip('/')}/{relative}"
+        return Response(headers=accel_headers)
+    return response
+
+
+def store(tracking_number: str, verified_at: Optional[datetime], content: bytes) -> None:
+    path = cache_path(tracking_number, verified_at)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def invalidate(tracking_number: str) -> None:
+    """Drop every cached receipt of a shipment (after verify / dispute)."""
+    shutil.rmtree(os.path.join(settings.POD_RECEIPT_CACHE_PATH, _directory(tracking_number)), ignore_errors=True)
+
+
+# ──── Rendering ────
+
+def _image(source) -> ImageReader:
+    """An image from a file path or from its bytes."""
+    with Image.open(io.BytesIO(source) if isinstance(source, bytes) else source) as img:
+        img.load()
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGB")
+        return ImageReader(img.copy())
+
+
+def _fit(reader: ImageReader, box_w: float, box_h: float) -> tuple[float, float]:
+    w, h = reader.getSize()
+    scale = min(box_w / w, box_h / h)
+    return w * scale, h * scale
+
+
+def render_receipt(data: dict, signature, photo_paths: list) -> bytes:
+    """Return a one-page A4 PDF receipt for a POD.
+
+    `data` holds the receipt fields (see PODService.get_receipt_source);
+    `signature` is a file path or the image bytes (legacy inline signatures).
+    Images that cannot be read are skipped rather than failing the receipt.
+    """
+    buf = io.BytesIO()
+    pdf = canvas.Canvas(buf, pagesize=A4, pageCompression=1)
+    pdf.setTitle(f"Delivery receipt {data['tracking_number']}")
+    width, height = A4
+    y = height - MARGIN
+
+    pdf.setFont("Helvetica-Bold", 18)
+    pdf.drawString(MARGIN, y - 18, "Proof of Delivery")
+    pdf.setFont("Courier", 10)
+    pdf.drawRightString(width - MARGIN, y - 16, data["tracking_number"])
+    y -= 34
+    pdf.setStrokeColor(colors.lightgrey)
+    pdf.line(MARGIN, y, width - MARGIN, y)
+    y -= 22
+
+    location = data.get("pod_location") or {}
+    fields = [
+        ("Route", f"{data.get('origin') or '-'} -> {data.get('destination') or '-'}"),
+        ("Receiver", data.get("pod_receiver_name") or "-"),
+        ("Delivered at", data["pod_timestamp"].strftime("%Y-%m-%d %H:%M UTC") if data.get("pod_timestamp") else "-"),
+        ("Location", f"{location['lat']:.6f}, {location['lng']:.6f}" if "lat" in location else "-"),
+        ("Status", (data.get("pod_status") or "-").capitalize()),
+        ("Verified at", data["verified_at"].strftime("%Y-%m-%d %H:%M UTC") if data.get("verified_at") else "-"),
+    ]
+    for label, value in fields:
+        pdf.setFont("Helvetica", 9)
+        pdf.setFillColor(colors.grey)
+        pdf.drawString(MARGIN, y, label)
+        pdf.setFont("Helvetica", 11)
+        pdf.setFillColor(colors.black)
+        pdf.drawString(MARGIN + 35 * mm, y, str(value))
+        y -= 18
+
+    if signature:
+        try:
+            signature = _image(signature)
+        except Exception:
+            signature = None
+        if signature is not None:
+            y -= 10
+            pdf.setFont("Helvetica", 9)
+            pdf.setFillColor(colors.grey)
+            pdf.drawString(MARGIN, y, "Signature")
+            w, h = _fit(signature, *SIGNATURE_BOX)
+            y -= h + 6
+            pdf.drawImage(signature, MARGIN, y, w, h, mask="auto")
+            y -= 10
+
+    readers = []
+    for path in photo_paths:
+        try:
+            readers.append(_image(path))
+        except Exception:
+            continue
+    if readers:
+        y -= 10
+        pdf.setFont("Helvetica", 9)
+        pdf.setFillColor(colors.grey)
+        pdf.drawString(MARGIN, y, f"Photos ({len(readers)})")
+        y -= 6
+        x = MARGIN
+        for reader in readers:
+            if x + THUMB_SIZE > width - MARGIN:
+                x = MARGIN
+                y -= THUMB_SIZE + THUMB_GAP
+            w, h = _fit(reader, THUMB_SIZE, THUMB_SIZE)
+            pdf.drawImage(reader, x, y - h, w, h)
+            x += THUMB_SIZE + THUMB_GAP
+
+    pdf.setFont("Helvetica", 8)
+    pdf.setFillColor(colors.grey)
+    pdf.drawString(MARGIN, MARGIN / 2, f"Generated {datetime.utcnow().strftime('%Y-%m-%d %H:%M UTC')}")
+    pdf.showPage()
+    pdf.save()
+    return buf.getvalue()
@@ -0,0 +1,67 @@
+"""Static serving for /uploads with HTTP caching tuned to content addressing.
+
+Files under pod/objects/ are named by their SHA-256 (see core/storage.py) and
+never change, so they are served as immutable with the hash as a strong ETag;
+browsers keep them for a year and revalidation is a cheap 304. Anything else
+(files predating content addressing) must be revalidated on every use.
+
+Range requests and If-Range are handled by Starlette's FileResponse, which also
+hands the file to the server (ASGI pathsend) when the server supports it. With
+UPLOADS_X_ACCEL_PREFIX set, nginx serves the bytes instead (sendfile) and the
+app only answers with headers.
+"""
+import os
+import re
+from typing import Optional
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+from .config import settings
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+_OBJECT_PATH_RE = re.compile(r"(^|/)objects/[0-9a-f]{2}/[0-9a-f]{2}/(?P<sha256>[0-9a-f]{64})\.\w+$")
+
+
+class UploadFiles(StaticFiles):
+    def lookup_path(self, path: str) -> tuple[str, Optional[os.stat_result]]:
+        # Dot files and directories (in-progress writes, tooling) are never served
+        if any(part.startswith(".") for part in path.split(os.sep)):
+            return "", None
+        return super().lookup_path(path)
+
+    def file_response(
+        self,
+        full_path,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        request_headers = Headers(scope=scope)
+        relative = os.path.relpath(full_path, self.directory).replace(os.sep, "/")
+
+        headers = {}
+        match = _OBJECT_PATH_RE.search(relative)
+        if match and status_code == 200:
+            headers["cache-control"] = IMMUTABLE_CACHE_CONTROL
+            headers["etag"] = f'"{match.group("sha256")}"'
+        else:
+            headers["cache-control"] = REVALIDATE_CACHE_CONTROL
+
+        response = FileResponse(full_path, status_code=status_code, headers=headers, stat_result=stat_result)
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+
+        if settings.UPLOADS_X_ACCEL_PREFIX and status_code == 200:
+            # nginx serves the file itself (sendfile, ranges); we only send headers
+            accel_headers = {
+                key: value for key, value in response.headers.items()
+                if key in ("cache-control", "etag", "last-modified", "content-type")
+            }
+            accel_headers["x-accel-redirect"] = f"{settings.UPLOADS_X_ACCEL_PREFIX.rstrip('/')}/{relative}"
+            return Response(headers=accel_headers)
+        return response
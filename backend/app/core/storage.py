@@ -1,34 +1,460 @@
+import base64
+import binascii
+import errno
+import hashlib
+import mimetypes
 import os
-from datetime import datetime
+import re
+import shutil
+import tempfile
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import BinaryIO, Optional, Union
+
+from sqlalchemy import select, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
 from ..core.config import settings
+from ..core.static import IMMUTABLE_CACHE_CONTROL
+from ..database import engine
+from ..models import StorageObject
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+_DATA_URL_RE = re.compile(r"^data:(?P<mime>[\w.+-]+/[\w.+-]+);base64,(?P<data>.*)$", re.DOTALL)
+
+
+def parse_data_url(data_url: str) -> tuple[bytes, str]:
+    """Decode a base64 data URL into (content, content_type). Raises ValueError."""
+    match = _DATA_URL_RE.match(data_url.strip()) if data_url else None
+    if not match:
+        raise ValueError("Expected a base64 data URL")
+    try:
+        content = base64.b64decode(match.group("data"), validate=True)
+    except (binascii.Error, ValueError):
+        raise ValueError("Invalid base64 payload")
+    return content, match.group("mime").lower()
+
+
+def _extension(content_type: str) -> str:
+    return "jpg" if "jpeg" in content_type else content_type.split("/")[-1]
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+@dataclass
+class StagedFile:
+    """An upload copied to a temp file in the staging directory, not yet published."""
+    path: str
+    size: int
+    sha256: str
+    content_type: str
+
+
+class StagingWriter:
+    """Incremental writer for one staged upload (blocking; run writes in a thread).
+
+    write() raises UploadTooLarge as soon as more than max_bytes have been
+    written; close() returns the StagedFile, abort() removes the partial file.
+    """
+
+    def __init__(self, staging_path: str, content_type: str, max_bytes: int):
+        fd, self.path = tempfile.mkstemp(dir=staging_path, suffix=".part")
+        self._file = os.fdopen(fd, 'wb')
+        self._digest = hashlib.sha256()
+        self.size = 0
+        self.content_type = content_type
+        self.max_bytes = max_bytes
+
+    def write(self, chunk: bytes) -> None:
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise UploadTooLarge(f"Upload exceeds {self.max_bytes} bytes")
+        self._digest.update(chunk)
+        self._file.write(chunk)
+
+    def close(self) -> StagedFile:
+        self._file.close()
+        return StagedFile(path=self.path, size=self.size, sha256=self._digest.hexdigest(), content_type=self.content_type)
+
+    def abort(self) -> None:
+        self._file.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+_ADD_REF = text("""
+    INSERT INTO storage_objects (sha256, url, content_type, size, refcount)
+    VALUES (:sha256, :url, :content_type, :size, 1)
+    ON CONFLICT (sha256) DO UPDATE SET refcount = storage_objects.refcount + 1
+    RETURNING url, (xmax = 0) AS created
+""")
 
+_RELEASE = text("""
+    UPDATE storage_objects SET refcount = refcount - 1
+    WHERE sha256 = :sha256 AND refcount > 0
+    RETURNING refcount
+""")
 
-class StorageBackend:
-    """File storage abstraction for POD photos. Local filesystem for v1."""
+_DELETE_UNREFERENCED = text("""
+    DELETE FROM storage_objects WHERE sha256 = :sha256 AND refcount <= 0
+    RETURNING url
+""")
+
+
+_OBJECT_KEY_RE = re.compile(r"^objects/[0-9a-f]{2}/[0-9a-f]{2}/(?P<sha256>[0-9a-f]{64})\.\w+$")
+
+
+@dataclass
+class StoredObject:
+    """An object already in storage, e.g. uploaded directly by a client."""
+    key: str
+    sha256: str
+    size: int
+    content_type: str
+
+
+class StorageBackend(ABC):
+    """File storage for POD photos and signatures.
+
+    Files are content-addressed: stored once under objects/<ab>/<cd>/<sha256>.<ext>
+    and reference-counted in the storage_objects table, so retried or reused
+    uploads cost no extra disk or write I/O. Subclasses only implement the
+    object primitives (exists/stat/write/move/remove and local copies).
+    """
+
+    URL_PREFIX = "/uploads/pod/"
+    # Whether clients can upload straight to storage via presigned URLs
+    direct_uploads = False
 
     def __init__(self):
-        self.storage_path = settings.POD_STORAGE_PATH
-        os.makedirs(self.storage_path, exist_ok=True)
+        # Uploads are staged on local disk whatever the backend, outside /uploads
+        self.staging_path = settings.POD_STAGING_PATH
+        os.makedirs(self.staging_path, exist_ok=True)
+
+    # ──── Keys ────
+
+    def object_key(self, sha256: str, content_type: str) -> str:
+        return f"objects/{sha256[:2]}/{sha256[2:4]}/{sha256}.{_extension(content_type)}"
+
+    def url_for(self, key: str) -> str:
+        return f"{self.URL_PREFIX}{key}"
+
+    def key_for(self, url: str) -> str:
+        return url[len(self.URL_PREFIX):] if url.startswith(self.URL_PREFIX) else url.lstrip('/')
+
+    # ──── Primitives ────
+
+    @abstractmethod
+    def exists(self, key: str) -> bool: ...
+
+    @abstractmethod
+    def stat(self, key: str) -> Optional[StoredObject]:
+        """Size and content type of a content-addressed object, or None if absent."""
+
+    @abstractmethod
+    def _write(self, key: str, content: bytes, content_type: str) -> None: ...
+
+    @abstractmethod
+    def _write_staged(self, key: str, staged: StagedFile) -> None: ...
+
+    @abstractmethod
+    def _remove(self, key: str) -> None: ...
+
+    @abstractmethod
+    def local_copy(self, url: str) -> str:
+        """Path of a local file with the object's bytes (blocking); see release_local_copy()."""
+
+    def release_local_copy(self, path: str) -> None:
+        pass
 
-    def save_file(self, content: bytes, tracking_number: str, index: int,
-                  content_type: str = "image/jpeg") -> str:
-        """Save file to disk and return relative URL path."""
-        timestamp = int(datetime.utcnow().timestamp())
-        ext = "jpg" if "jpeg" in content_type else content_type.split("/")[-1]
-        filename = f"{tracking_number}_{timestamp}_{index}.{ext}"
-        filepath = os.path.join(self.storage_path, filename)
+    # ──── Reference-counted operations ────
 
-        with open(filepath, 'wb') as f:
-            f.write(content)
+    def _add_ref(self, db: Union[Session, Connection], sha256: str, content_type: str, size: int) -> tuple[str, bool]:
+        """Count one more reference in the caller's transaction; returns (key, created).
 
-        return f"/uploads/pod/{filename}"
+        The existing object's key wins when the same bytes arrive with another
+        content type. The row stays locked until the caller commits, which
+        keeps a concurrent delete_files from removing the object underneath it.
+        """
+        row = db.execute(_ADD_REF, {
+            "sha256": sha256,
+            "url": self.url_for(self.object_key(sha256, content_type)),
+            "content_type": content_type,
+            "size": size,
+        }).one()
+        return self.key_for(row.url), row.created
+
+    def save_file(self, db: Union[Session, Connection], content: bytes, content_type: str) -> str:
+        """Store content under its sha256 and return the relative URL path."""
+        digest = hashlib.sha256(content).hexdigest()
+        key, created = self._add_ref(db, digest, content_type, len(content))
+        if created or not self.exists(key):
+            self._write(key, content, content_type)
+        return self.url_for(key)
+
+    def stage(self, source: BinaryIO, content_type: str, max_bytes: int) -> StagedFile:
+        """Copy an upload to a staging file chunk by chunk (blocking; run in a thread).
+
+        Raises UploadTooLarge as soon as more than max_bytes have been read, so
+        an oversized upload is never fully copied.
+        """
+        writer = self.open_staging(content_type, max_bytes)
+        try:
+            while chunk := source.read(UPLOAD_CHUNK_SIZE):
+                writer.write(chunk)
+        except BaseException:
+            writer.abort()
+            raise
+        return writer.close()
+
+    def open_staging(self, content_type: str, max_bytes: int) -> StagingWriter:
+        """Start a staged upload that is written piece by piece (see core/multipart.py)."""
+        return StagingWriter(self.staging_path, content_type, max_bytes)
+
+    def publish(self, db: Union[Session, Connection], staged: StagedFile) -> str:
+        """Store a staged upload and return its URL path.
+
+        Content that is already stored is not written again; the staged copy
+        is left for discard().
+        """
+        key, created = self._add_ref(db, staged.sha256, staged.content_type, staged.size)
+        if created or not self.exists(key):
+            self._write_staged(key, staged)
+        return self.url_for(key)
+
+    def attach(self, db: Union[Session, Connection], obj: StoredObject) -> str:
+        """Reference an object that is already in storage and return its URL path."""
+        key, _ = self._add_ref(db, obj.sha256, obj.content_type, obj.size)
+        return self.url_for(key)
+
+    def discard(self, staged: StagedFile):
+        """Remove a staged upload that was not published (no-op if it was)."""
+        try:
+            os.remove(staged.path)
+        except FileNotFoundError:
+            pass
 
     def delete_files(self, urls: list):
-        """Delete files by URL paths."""
-        for url in urls:
-            filepath = os.path.join('.', url.lstrip('/'))
-            if os.path.exists(filepath):
-                os.remove(filepath)
+        """Drop one reference per URL; objects are removed only when unreferenced.
+
+        Files predating content addressing (not in storage_objects) are
+        deleted directly.
+        """
+        with engine.begin() as conn:
+            tracked = dict(conn.execute(
+                select(StorageObject.url, StorageObject.sha256).where(StorageObject.url.in_(urls))
+            ).all())
+            for url in urls:
+                sha256 = tracked.get(url)
+                if sha256 is None:
+                    self._remove(self.key_for(url))
+                    continue
+                if conn.execute(_RELEASE, {"sha256": sha256}).scalar() == 0:
+                    removed = conn.execute(_DELETE_UNREFERENCED, {"sha256": sha256}).scalar()
+                    # Removed while the row lock is held, so no upload can
+                    # re-reference this object until the delete commits
+                    if removed:
+                        self._remove(self.key_for(removed))
+
+
+class LocalStorageBackend(StorageBackend):
+    """Objects as files under POD_STORAGE_PATH, served by the /uploads static mount."""
+
+    def __init__(self):
+        super().__init__()
+        self.storage_path = settings.POD_STORAGE_PATH
+
+    def local_path(self, url: str) -> str:
+        """Filesystem path of a stored file from its URL path."""
+        return os.path.join('.', url.lstrip('/'))
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.storage_path, *key.split('/'))
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def stat(self, key: str) -> Optional[StoredObject]:
+        match = _OBJECT_KEY_RE.match(key)
+        if not match or not self.exists(key):
+            return None
+        content_type = mimetypes.guess_type(key)[0] or "application/octet-stream"
+        return StoredObject(key, match.group("sha256"), os.path.getsize(self._path(key)), content_type)
+
+    def _write(self, key: str, content: bytes, content_type: str) -> None:
+        filepath = self._path(key)
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(filepath), suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(content)
+            os.replace(tmp_path, filepath)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def _write_staged(self, key: str, staged: StagedFile) -> None:
+        filepath = self._path(key)
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        try:
+            # An atomic rename when staging shares the filesystem
+            os.replace(staged.path, filepath)
+            return
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(filepath), suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f, open(staged.path, 'rb') as source:
+                shutil.copyfileobj(source, f, UPLOAD_CHUNK_SIZE)
+            os.replace(tmp_path, filepath)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        os.remove(staged.path)
+
+    def _remove(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def local_copy(self, url: str) -> str:
+        return self.local_path(url)
+
+
+class S3StorageBackend(StorageBackend):
+    """Objects in an S3-compatible bucket (AWS S3, MinIO, moto).
+
+    Clients can PUT photos straight to the bucket with presigned URLs
+    (presign_upload); stored URL paths stay /uploads/pod/<key> and are
+    redirected to short-lived presigned GET URLs when read.
+    """
+
+    direct_uploads = True
+
+    def __init__(self):
+        super().__init__()
+        import boto3
+        from boto3.s3.transfer import TransferConfig
+        from botocore.config import Config
+
+        if not settings.S3_BUCKET:
+            raise RuntimeError("S3_BUCKET must be set when POD_STORAGE_BACKEND is 's3'")
+        self.bucket = settings.S3_BUCKET
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=settings.S3_ENDPOINT_URL or None,
+            region_name=settings.S3_REGION,
+            aws_access_key_id=settings.S3_ACCESS_KEY_ID or None,
+            aws_secret_access_key=settings.S3_SECRET_ACCESS_KEY or None,
+            # MinIO and moto serve buckets by path, not by subdomain
+            config=Config(signature_version="s3v4", s3={"addressing_style": "path" if settings.S3_ENDPOINT_URL else "auto"}),
+        )
+        threshold = settings.S3_MULTIPART_THRESHOLD_MB * 1024 * 1024
+        self.transfer = TransferConfig(multipart_threshold=threshold, multipart_chunksize=threshold)
+
+    def _head(self, key: str) -> Optional[dict]:
+        from botocore.exceptions import ClientError
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+
+    def exists(self, key: str) -> bool:
+        return self._head(key) is not None
+
+    def stat(self, key: str) -> Optional[StoredObject]:
+        match = _OBJECT_KEY_RE.match(key)
+        head = self._head(key) if match else None
+        if head is None:
+            return None
+        return StoredObject(key, match.group("sha256"), head["ContentLength"], head.get("ContentType", ""))
+
+    def _write(self, key: str, content: bytes, content_type: str) -> None:
+        self.client.put_object(Bucket=self.bucket, Key=key, Body=content, ContentType=content_type)
+
+    def _write_staged(self, key: str, staged: StagedFile) -> None:
+        # Multipart above S3_MULTIPART_THRESHOLD_MB, parts sent concurrently
+        self.client.upload_file(
+            staged.path, self.bucket, key,
+            ExtraArgs={"ContentType": staged.content_type},
+            Config=self.transfer,
+        )
+
+    def _remove(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+    def local_copy(self, url: str) -> str:
+        fd, tmp_path = tempfile.mkstemp(dir=self.staging_path, suffix=".download")
+        os.close(fd)
+        try:
+            self.client.download_file(self.bucket, self.key_for(url), tmp_path, Config=self.transfer)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return tmp_path
+
+    def release_local_copy(self, path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def presign_upload(self, sha256: str, content_type: str, size: int) -> dict:
+        """Presigned PUT for one object; returns {key, url, headers}.
+
+        Size, content type and SHA-256 are part of the signature, so the bucket
+        rejects any other bytes under the content-addressed key. The client must
+        send `headers` with the PUT.
+        """
+        key = self.object_key(sha256, content_type)
+        checksum = base64.b64encode(bytes.fromhex(sha256)).decode()
+        url = self.client.generate_presigned_url(
+            "put_object",
+            Params={
+                "Bucket": self.bucket,
+                "Key": key,
+                "ContentType": content_type,
+                "ContentLength": size,
+                "ChecksumSHA256": checksum,
+            },
+            ExpiresIn=settings.S3_PRESIGN_EXPIRES_SECONDS,
+        )
+        return {
+            "key": key,
+            "url": url,
+            "headers": {"Content-Type": content_type, "x-amz-checksum-sha256": checksum},
+        }
+
+    def presign_download(self, key: str) -> str:
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={
+                "Bucket": self.bucket,
+                "Key": key,
+                # Content-addressed keys never change
+                "ResponseCacheControl": IMMUTABLE_CACHE_CONTROL,
+            },
+            ExpiresIn=settings.S3_PRESIGN_EXPIRES_SECONDS,
+        )
+
+
+def get_storage_backend() -> StorageBackend:
+    backend = settings.POD_STORAGE_BACKEND.lower()
+    if backend == "local":
+        return LocalStorageBackend()
+    if backend == "s3":
+        return S3StorageBackend()
+    raise ValueError(f"Unknown POD_STORAGE_BACKEND '{settings.POD_STORAGE_BACKEND}' (expected local or s3)")
 
 
-storage = StorageBackend()
+storage = get_storage_backend()
@@ -0,0 +1,31 @@
+"""Shared process pool for CPU-bound work that must not run on the event loop."""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from .config import settings
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Create the pool on first use. Workers are spawned, not forked, so they
+    never inherit the server's threads, sockets or DB connections."""
+    global _pool
+    # A worker killed mid-task (e.g. OOM on a huge image) breaks the whole pool
+    if _pool is not None and getattr(_pool, "_broken", False):
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.WORKER_PROCESSES,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+def shutdown_process_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
@@ -1,15 +1,50 @@
-from sqlalchemy.orm import Session
+from sqlalchemy import Float, and_, cast, func, inspect, or_
+from sqlalchemy.orm import Session, load_only
+from ..core import geo
 from ..models import Shipment
+from typing import Optional
+import math
 import uuid
 
-def get_shipment(db: Session, shipment_id: str, tenant_id: str):
+# Computed enrichment fields that may be requested with ?fields= alongside columns
+ENRICHMENT_FIELDS = {"blockchain_status", "escrow_id"}
+SHIPMENT_COLUMNS = tuple(c.key for c in Shipment.__mapper__.column_attrs)
+
+def parse_fields(fields: Optional[str]) -> Optional[list]:
+    """Parse a ?fields=a,b,c parameter; `id` is always included. Raises ValueError on unknown names."""
+    if not fields:
+        return None
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in SHIPMENT_COLUMNS and f not in ENRICHMENT_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return ["id"] + [f for f in dict.fromkeys(requested) if f != "id"]
+
+def load_options(fields: Optional[list]) -> list:
+    """Loader options selecting only the requested columns (default: all non-deferred)."""
+    if not fields:
+        return []
+    columns = [getattr(Shipment, f) for f in fields if f in SHIPMENT_COLUMNS]
+    return [load_only(*columns, raiseload=True)]
+
+def to_dict(shipment, fields: Optional[list] = None) -> dict:
+    """Serialize only loaded attributes so deferred columns are never lazy-loaded."""
+    unloaded = inspect(shipment).unloaded
+    if fields is None:
+        keys = [k for k in SHIPMENT_COLUMNS if k not in unloaded] + sorted(ENRICHMENT_FIELDS) + ["score"]
+    else:
+        keys = fields
+    return {k: getattr(shipment, k, None) for k in keys if k not in unloaded}
+
+def get_shipment(db: Session, shipment_id: str, tenant_id: str, fields: Optional[list] = None):
     # If using RLS, we can just query directly.
     # explicit filtering for application-level safety as well:
+    query = db.query(Shipment).options(*load_options(fields))
     try:
          uuid_obj = uuid.UUID(shipment_id)
-         query = db.query(Shipment).filter(Shipment.id == uuid_obj)
+         query = query.filter(Shipment.id == uuid_obj)
     except ValueError:
-         query = db.query(Shipment).filter(Shipment.tracking_number == shipment_id)
+         query = query.filter(Shipment.tracking_number == shipment_id)
     
     if tenant_id != 'default': # 'default' implies maybe admin or specific dev handling
          query = query.filter(Shipment.tenant_id == uuid.UUID(tenant_id))
@@ -32,3 +67,112 @@ def create_shipment(db: Session, shipment: dict, tenant_id: str):
     db.commit()
     db.refresh(db_shipment)
     return db_shipment
+
+# Columns covered by the trigram (pg_trgm) GIN indexes declared on Shipment
+SEARCH_COLUMNS = (
+    Shipment.tracking_number,
+    Shipment.container_number,
+    Shipment.vessel_name,
+    Shipment.origin,
+    Shipment.destination,
+)
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def search_shipments(db: Session, q: str, tenant_id: str, limit: int = 20, fields: Optional[list] = None):
+    """Fuzzy search across tracking, container, vessel and port fields.
+
+    Each predicate (substring ILIKE and trigram similarity `%`) is served by
+    the per-column GIN trigram indexes, so Postgres combines them with a
+    BitmapOr instead of scanning the table. Results are ranked by the best
+    similarity score across the searched columns.
+    """
+    q = q.strip()
+    pattern = f"%{_escape_like(q)}%"
+
+    predicates = []
+    for col in SEARCH_COLUMNS:
+        predicates.append(col.ilike(pattern, escape="\\"))
+        predicates.append(col.op("%")(q))
+
+    score = func.greatest(*[func.similarity(col, q) for col in SEARCH_COLUMNS]).label("score")
+
+    query = db.query(Shipment, score).options(*load_options(fields)).filter(or_(*predicates))
+    if tenant_id != 'default':
+        query = query.filter(Shipment.tenant_id == uuid.UUID(tenant_id))
+
+    return query.order_by(score.desc(), Shipment.created_at.desc()).limit(limit).all()
+
+# Above this many points a viewport is returned truncated; clients should zoom in
+MAX_VIEWPORT_POINTS = 2000
+
+def _tenant_filter(query, tenant_id: str):
+    if tenant_id != 'default':
+        query = query.filter(Shipment.tenant_id == uuid.UUID(tenant_id))
+    return query
+
+def _geohash_cover_filter(prefixes):
+    # Each prefix is one B-tree range scan on ix_shipments_geohash
+    return or_(*[
+        and_(Shipment.geohash >= prefix, Shipment.geohash < prefix + "~")
+        for prefix in prefixes
+    ])
+
+def _bbox_filter(bbox: geo.BBox):
+    min_lat, min_lng, max_lat, max_lng = bbox
+    lat_filter = Shipment.latitude.between(min_lat, max_lat)
+    if min_lng <= max_lng:
+        return and_(lat_filter, Shipment.longitude.between(min_lng, max_lng))
+    # Viewport crosses the antimeridian
+    return and_(lat_filter, or_(Shipment.longitude >= min_lng, Shipment.longitude <= max_lng))
+
+def get_viewport_points(db: Session, bbox: geo.BBox, tenant_id: str, limit: int = MAX_VIEWPORT_POINTS):
+    _, prefixes = geo.cover(bbox)
+    query = db.query(
+        Shipment.id,
+        Shipment.tracking_number,
+        Shipment.latitude,
+        Shipment.longitude,
+        Shipment.current_status,
+        Shipment.transport_mode,
+    ).filter(_geohash_cover_filter(prefixes), _bbox_filter(bbox))
+    return _tenant_filter(query, tenant_id).limit(limit).all()
+
+def get_viewport_clusters(db: Session, bbox: geo.BBox, tenant_id: str):
+    """Group shipments in the viewport by geohash cell one level finer than the cover."""
+    precision, prefixes = geo.cover(bbox)
+    cell = func.substr(Shipment.geohash, 1, precision + 1).label("cell")
+    query = db.query(
+        cell,
+        func.count().label("count"),
+        func.avg(Shipment.latitude).label("latitude"),
+        func.avg(Shipment.longitude).label("longitude"),
+    ).filter(_geohash_cover_filter(prefixes), _bbox_filter(bbox))
+    return precision + 1, _tenant_filter(query, tenant_id).group_by(cell).all()
+
+def get_nearby_shipments(db: Session, lat: float, lng: float, radius_km: float, tenant_id: str, limit: int = 100):
+    """Shipments within radius_km of a point, nearest first."""
+    bbox = geo.bbox_around(lat, lng, radius_km)
+    _, prefixes = geo.cover(bbox)
+
+    lat1, lng1 = math.radians(lat), math.radians(lng)
+    lat2 = func.radians(cast(Shipment.latitude, Float))
+    lng2 = func.radians(cast(Shipment.longitude, Float))
+    distance = (
+        2 * geo.EARTH_RADIUS_KM * func.asin(func.sqrt(
+            func.power(func.sin((lat2 - lat1) / 2), 2)
+            + math.cos(lat1) * func.cos(lat2) * func.power(func.sin((lng2 - lng1) / 2), 2)
+        ))
+    ).label("distance_km")
+
+    query = db.query(
+        Shipment.id,
+        Shipment.tracking_number,
+        Shipment.latitude,
+        Shipment.longitude,
+        Shipment.current_status,
+        Shipment.transport_mode,
+        distance,
+    ).filter(_geohash_cover_filter(prefixes), _bbox_filter(bbox), distance <= radius_km)
+    return _tenant_filter(query, tenant_id).order_by(distance).limit(limit).all()
@@ -1,13 +1,36 @@
-from sqlalchemy import create_engine
+import logging
+import threading
+import time
+from typing import Optional
+
+from fastapi import Request
+from sqlalchemy import create_engine, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from .core.config import settings
 
+logger = logging.getLogger(__name__)
+
 # 1. DB Engine Creation
-engine = create_engine(settings.DATABASE_URL)
+SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
+engine = create_engine(SQLALCHEMY_DATABASE_URL)
+
+# Optional read replica (hot standby)
+replica_engine = (
+    create_engine(
+        settings.DATABASE_REPLICA_URL,
+        pool_pre_ping=True,
+        connect_args={"connect_timeout": settings.REPLICA_CONNECT_TIMEOUT_SECONDS},
+    )
+    if settings.DATABASE_REPLICA_URL else None
+)
 
 # 2. Session Factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReplicaSessionLocal = (
+    sessionmaker(autocommit=False, autoflush=False, bind=replica_engine)
+    if replica_engine is not None else None
+)
 
 # 3. Base Model
 Base = declarative_base()
@@ -19,3 +42,81 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# 5. Read routing
+READ_YOUR_WRITES_COOKIE = "lx_primary_until"
+
+# Zero when the standby is streaming and has replayed everything it received;
+# otherwise the age of the last replayed transaction (infinite if there is
+# none), so a standby whose WAL receiver is gone is not reported as current.
+# NULL means the server is not a standby (e.g. the replica URL points at the
+# primary) and is treated as no lag.
+_REPLICA_LAG_SQL = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN NULL
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn()
+             AND EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE status = 'streaming') THEN 0
+        ELSE COALESCE(
+            EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())::float8,
+            'Infinity'::float8
+        )
+    END
+""")
+
+# The lock only guards the cached value; the probe itself runs outside it
+_lag_lock = threading.Lock()
+_lag_checked_at = 0.0
+_lag_seconds: Optional[float] = None
+_lag_probing = False
+
+
+def replica_lag_seconds() -> Optional[float]:
+    """Replica lag in seconds, cached for REPLICA_LAG_CHECK_SECONDS; None if unusable.
+
+    One caller at a time probes the replica; the others get the last value
+    (None before the first probe completes) instead of waiting on it.
+    """
+    global _lag_checked_at, _lag_seconds, _lag_probing
+    if replica_engine is None:
+        return None
+    with _lag_lock:
+        if _lag_probing or time.monotonic() - _lag_checked_at < settings.REPLICA_LAG_CHECK_SECONDS:
+            return _lag_seconds
+        _lag_probing = True
+    lag_seconds = None
+    try:
+        with replica_engine.connect() as conn:
+            lag = conn.execute(_REPLICA_LAG_SQL).scalar()
+        lag_seconds = float(lag) if lag is not None else 0.0
+    except Exception as e:
+        logger.warning(f"Replica lag check failed: {e}")
+    finally:
+        with _lag_lock:
+            _lag_seconds = lag_seconds
+            _lag_checked_at = time.monotonic()
+            _lag_probing = False
+    return lag_seconds
+
+
+def _recently_wrote(request: Request) -> bool:
+    try:
+        return float(request.cookies.get(READ_YOUR_WRITES_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def use_replica(request: Request) -> bool:
+    if ReplicaSessionLocal is None or _recently_wrote(request):
+        return False
+    lag = replica_lag_seconds()
+    return lag is not None and lag <= settings.REPLICA_MAX_LAG_SECONDS
+
+
+def get_read_db(request: Request):
+    """Session for read-only endpoints: the replica when fresh enough, else the primary."""
+    db = ReplicaSessionLocal() if use_replica(request) else SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
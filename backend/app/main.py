@@ -5,19 +5,28 @@ from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import RedirectResponse
 from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 
+from app.core import chain
 from app.core.config import settings
 from app.core.errors import global_exception_handler, http_exception_handler
 from app.core.logging import setup_logging
-from app.core.middleware import RequestLoggingMiddleware, TenantMiddleware
+from app.core.middleware import ReadYourWritesMiddleware, RequestLoggingMiddleware, TenantMiddleware
 from app.core.rate_limit import limiter
+from app.core.static import UploadFiles
+from app.core.storage import storage
+from app.core.workers import shutdown_process_pool
 from app.api.api import api_router
 from app.database import engine, Base
 from app.services.escrow_sync import EscrowEventSync
-from app.services.oracle_service import OracleService
+from app.services.oracle_service import oracle
+from app.services import shipment_events  # Registers the shipment history flush hook
+from app.services import pod_facets  # Registers the POD status count flush hook
+from app.services.live_updates import broker
+from app.services.eta_service import eta_model
+from app.services.pod_sync import PODSyncService
 from app import models  # Ensure models are imported so metadata is registered
 
 # Initialize structured logging
@@ -28,23 +37,37 @@ logger = logging.getLogger(__name__)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup: launch background tasks
+    # Launch background tasks
     sync = EscrowEventSync()
-    oracle = OracleService()
 
     sync_task = asyncio.create_task(sync.start())
     oracle_task = asyncio.create_task(oracle.start())
+    broker_task = asyncio.create_task(broker.start())
+    eta_task = asyncio.create_task(eta_model.start())
+    pod_sync_task = asyncio.create_task(PODSyncService.start())
+    # Creates this month's shipment_events partition right away, then keeps ahead
+    partitions_task = asyncio.create_task(shipment_events.maintain_partitions())
 
-    logger.info("Background tasks (Sync, Oracle) scheduled")
+    logger.info("Background tasks (Sync, Oracle, Live updates, ETA model, POD sync key purge, partitions) scheduled")
     yield
     # Shutdown: cancel background tasks
     sync_task.cancel()
     oracle_task.cancel()
+    broker_task.cancel()
+    eta_task.cancel()
+    pod_sync_task.cancel()
+    partitions_task.cancel()
     try:
         await sync_task
         await oracle_task
+        await broker_task
+        await eta_task
+        await pod_sync_task
+        await partitions_task
     except asyncio.CancelledError:
         pass
+    await chain.close()
+    shutdown_process_pool()
 
 
 app = FastAPI(title=settings.PROJECT_NAME, lifespan=lifespan)
@@ -58,7 +81,9 @@ app.add_exception_handler(Exception, global_exception_handler)
 app.add_exception_handler(HTTPException, http_exception_handler)
 
 # --- Middleware (order matters: last added = outermost = runs first) ---
-# 4. Tenant extraction (innermost)
+# 5. Read-your-writes pinning for replica reads (innermost)
+app.add_middleware(ReadYourWritesMiddleware)
+# 4. Tenant extraction
 app.add_middleware(TenantMiddleware)
 # 3. Request logging
 app.add_middleware(RequestLoggingMiddleware)
@@ -75,9 +100,20 @@ app.add_middleware(
 app.include_router(api_router, prefix="/api")
 
 # --- Static Files (POD photo uploads) ---
+if storage.direct_uploads:
+    # Stored URLs stay /uploads/pod/<key>; hand out short-lived bucket URLs
+    @app.get("/uploads/pod/{key:path}", include_in_schema=False)
+    def pod_object(key: str):
+        # The redirect may be reused until shortly before the URL expires
+        max_age = settings.S3_PRESIGN_EXPIRES_SECONDS // 2
+        return RedirectResponse(
+            storage.presign_download(key),
+            headers={"Cache-Control": f"private, max-age={max_age}"},
+        )
+
 uploads_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), "uploads")
 os.makedirs(os.path.join(uploads_dir, "pod"), exist_ok=True)
-app.mount("/uploads", StaticFiles(directory=uploads_dir), name="uploads")
+app.mount("/uploads", UploadFiles(directory=uploads_dir), name="uploads")
 
 
 @app.get("/")
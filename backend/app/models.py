@@ -1,7 +1,9 @@
-from sqlalchemy import Column, String, Boolean, Numeric, DateTime, Text, ForeignKey, Integer, Float, Date
+from sqlalchemy import Column, String, Boolean, Numeric, DateTime, Text, ForeignKey, Integer, BigInteger, Float, Date, Index, Identity, DDL, event
 from sqlalchemy.dialects.postgresql import UUID, JSONB
+from sqlalchemy.orm import column_property, deferred
 from sqlalchemy.sql import func, text
 from .database import Base
+from .core import geo
 
 class Tenant(Base):
     __tablename__ = "tenants"
@@ -34,7 +36,8 @@ class Shipment(Base):
     vessel_name = Column(String)
     origin = Column(String, nullable=False)
     destination = Column(String, nullable=False)
-    current_status = Column(String, default="BOOKED")
+    # active_history: old values are loaded on change so shipment_events can record transitions
+    current_status = column_property(Column(String, default="BOOKED"), active_history=True)
     transport_mode = Column(String, default="SEA") # SEA, AIR, RAIL, TRUCK
     weight_kg = Column(Numeric(10, 2), default=0.0)
     eta = Column(DateTime(timezone=True))
@@ -42,13 +45,17 @@ class Shipment(Base):
     # Fallback to simple float coordinates since PostGIS is not available in environment
     latitude = Column(Numeric(10, 6))
     longitude = Column(Numeric(10, 6))
+    # Geohash of (latitude, longitude); "C" collation keeps prefix range scans on the B-tree exact
+    geohash = Column(String(12, collation="C"), index=True)
     
     # e-POD Fields
-    pod_signature = Column(Text) # Base64 Data URL
-    pod_photos = Column(JSONB)   # List of strings (file URLs)
-    pod_location = Column(JSONB) # {"lat": ..., "lng": ..., "accuracy": ...}
+    # Heavy POD payloads are deferred: loaded only by POD endpoints (undefer_group("pod_media"))
+    pod_signature = deferred(Column(Text), group="pod_media") # Blob URL (legacy rows: base64 data URL)
+    pod_photos = deferred(Column(JSONB), group="pod_media")   # List of strings (file URLs)
+    pod_photo_meta = deferred(Column(JSONB), group="pod_media") # Renditions + dimensions per photo
+    pod_location = deferred(Column(JSONB), group="pod_media") # {"lat": ..., "lng": ..., "accuracy": ...}
     pod_timestamp = Column(DateTime(timezone=True))
-    pod_status = Column(String, nullable=True)           # submitted | verified | disputed
+    pod_status = column_property(Column(String, nullable=True), active_history=True)  # submitted | verified | disputed
     pod_receiver_name = Column(String, nullable=True)
     pod_receiver_contact = Column(String, nullable=True)
     pod_notes = Column(Text, nullable=True)
@@ -61,6 +68,74 @@ class Shipment(Base):
 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    # Trigram indexes backing fuzzy search (requires the pg_trgm extension)
+    __table_args__ = tuple(
+        Index(
+            f"ix_shipments_{col}_trgm",
+            col,
+            postgresql_using="gin",
+            postgresql_ops={col: "gin_trgm_ops"},
+        )
+        for col in ("tracking_number", "container_number", "vessel_name", "origin", "destination")
+    ) + (
+        # POD review queue (see PODService.list_pods); only rows with a POD are indexed
+        Index(
+            "ix_shipments_pod_queue",
+            text("pod_status"),
+            text("pod_timestamp DESC"),
+            postgresql_where=text("pod_status IS NOT NULL"),
+        ),
+        Index(
+            "ix_shipments_pod_timestamp",
+            text("pod_timestamp DESC"),
+            postgresql_where=text("pod_status IS NOT NULL"),
+        ),
+    )
+
+event.listen(
+    Shipment.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+
+@event.listens_for(Shipment, "before_insert")
+@event.listens_for(Shipment, "before_update")
+def _sync_shipment_geohash(mapper, connection, target):
+    if target.latitude is None or target.longitude is None:
+        target.geohash = None
+    else:
+        target.geohash = geo.encode(float(target.latitude), float(target.longitude))
+
+class ShipmentEvent(Base):
+    """Append-only shipment history, range-partitioned by month on occurred_at."""
+    __tablename__ = "shipment_events"
+
+    # The partition key must be part of the primary key
+    id = Column(BigInteger, Identity(), primary_key=True)
+    occurred_at = Column(DateTime(timezone=True), primary_key=True, server_default=func.now())
+    shipment_id = Column(UUID(as_uuid=True), ForeignKey("shipments.id", ondelete="CASCADE"), nullable=False)
+    tenant_id = Column(UUID(as_uuid=True))
+    event_type = Column(String, nullable=False)  # CREATED, STATUS_CHANGED, POSITION_UPDATED, POD_*
+    status = Column(String)
+    latitude = Column(Numeric(10, 6))
+    longitude = Column(Numeric(10, 6))
+    payload = Column(JSONB)
+
+    __table_args__ = (
+        Index("ix_shipment_events_shipment_occurred", "shipment_id", "occurred_at"),
+        {"postgresql_partition_by": "RANGE (occurred_at)"},
+    )
+
+# Catch-all partition so inserts never fail before monthly partitions exist
+event.listen(
+    ShipmentEvent.__table__,
+    "after_create",
+    DDL(
+        "CREATE TABLE IF NOT EXISTS shipment_events_default "
+        "PARTITION OF shipment_events DEFAULT"
+    ).execute_if(dialect="postgresql"),
+)
+
 class PaymentEscrow(Base):
     __tablename__ = "payment_escrows"
 
@@ -70,7 +145,7 @@ class PaymentEscrow(Base):
     buyer_wallet_address = Column(String, nullable=False)
     seller_wallet_address = Column(String, nullable=False)
     amount_usdc = Column(Numeric(20, 6), nullable=False)
-    status = Column(String, default="created")  # created|funded|released|disputed|refunded
+    status = column_property(Column(String, default="created"), active_history=True)  # created|funded|released|disputed|refunded
     chain_id = Column(Integer, default=11155111)  # Sepolia
     is_locked = Column(Boolean, default=True)
     tx_hash_deposit = Column(String)
@@ -87,6 +162,7 @@ class AuditLog(Base):
     __tablename__ = "audit_logs"
 
     id = Column(Integer, primary_key=True, index=True)
+    tenant_id = Column(UUID(as_uuid=True), index=True)
     entity_type = Column(String, nullable=False)
     entity_id = Column(UUID(as_uuid=True), nullable=False)
     action = Column(String, nullable=False)
@@ -133,6 +209,73 @@ class WebhookEvent(Base):
     payload = Column(JSONB)
 
 
+class StorageObject(Base):
+    """Reference count of a content-addressed POD file (see core/storage.py)."""
+    __tablename__ = "storage_objects"
+
+    sha256 = Column(String(64), primary_key=True)
+    url = Column(String, nullable=False, index=True)
+    content_type = Column(String)
+    size = Column(BigInteger)
+    refcount = Column(Integer, nullable=False, server_default=text("0"))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class PODStatusCount(Base):
+    """Cached number of PODs per tenant and status (see services/pod_facets.py)."""
+    __tablename__ = "pod_status_counts"
+
+    tenant_id = Column(UUID(as_uuid=True), primary_key=True)
+    pod_status = Column(String, primary_key=True)
+    count = Column(BigInteger, nullable=False, server_default=text("0"))
+
+
+class PODSyncKey(Base):
+    """Outcome of a driver-app POD sync item, by client idempotency key (see services/pod_sync.py)."""
+    __tablename__ = "pod_sync_keys"
+
+    # Keys are client-generated, so they are only unique within a tenant
+    tenant_id = Column(UUID(as_uuid=True), primary_key=True)  # the shipment's tenant, NO_TENANT if none
+    idempotency_key = Column(String(128), primary_key=True)
+    tracking_number = Column(String, nullable=False)
+    status = Column(String, nullable=False)  # processing | done
+    status_code = Column(Integer)
+    response = Column(JSONB)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    completed_at = Column(DateTime(timezone=True), index=True)
+
+
+class ChainSyncCursor(Base):
+    """Last block whose escrow events were applied, per contract (see services/escrow_sync.py)."""
+    __tablename__ = "chain_sync_cursors"
+
+    chain_id = Column(Integer, primary_key=True)
+    contract_address = Column(String, primary_key=True)  # lowercase hex
+    block_number = Column(BigInteger, nullable=False)
+    block_hash = Column(String, nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+class ChainSyncEvent(Base):
+    """Journal of escrow transitions applied from chain logs, kept for reorg rollback."""
+    __tablename__ = "chain_sync_events"
+
+    id = Column(BigInteger, primary_key=True)
+    chain_id = Column(Integer, nullable=False)
+    block_number = Column(BigInteger, nullable=False)
+    block_hash = Column(String, nullable=False)
+    log_index = Column(Integer, nullable=False)
+    event = Column(String, nullable=False)
+    escrow_id = Column(UUID(as_uuid=True), ForeignKey("payment_escrows.id", ondelete="CASCADE"), nullable=False)
+    previous = Column(JSONB, nullable=False)  # escrow fields before the transition
+    applied = Column(JSONB)  # fields the transition wrote, with the values it wrote
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_chain_sync_events_chain_block", "chain_id", "block_number"),
+    )
+
+
 class FreightIndex(Base):
     __tablename__ = "freight_indices"
 
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 from typing import Optional, List, Any
 from datetime import datetime, date
 from uuid import UUID
@@ -21,6 +21,8 @@ class ShipmentBase(BaseModel):
     latitude: Optional[float] = None
     longitude: Optional[float] = None
     container_number: Optional[str] = None
+    transport_mode: Optional[str] = "SEA"
+    weight_kg: Optional[float] = 0.0
     
     # e-POD
     pod_signature: Optional[str] = None
@@ -61,6 +63,66 @@ class ShipmentResponse(ShipmentCreate):
 
     model_config = ConfigDict(from_attributes=True)
 
+class ShipmentSearchResult(ShipmentResponse):
+    score: float = 0.0
+
+class ShipmentSearchResponse(BaseModel):
+    items: List[ShipmentSearchResult]
+    query: str
+    limit: int
+
+class ShipmentEventResponse(BaseModel):
+    id: int
+    shipment_id: UUID
+    event_type: str
+    status: Optional[str] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    payload: Optional[dict] = None
+    occurred_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+# --- Map Schemas ---
+
+class MapPoint(BaseModel):
+    id: UUID
+    tracking_number: str
+    latitude: float
+    longitude: float
+    current_status: Optional[str] = None
+    transport_mode: Optional[str] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+class MapCluster(BaseModel):
+    geohash: str
+    count: int
+    latitude: float
+    longitude: float
+
+class MapViewportResponse(BaseModel):
+    mode: str  # points | clusters
+    precision: Optional[int] = None
+    points: List[MapPoint] = []
+    clusters: List[MapCluster] = []
+    truncated: bool = False
+
+class NearbyShipment(MapPoint):
+    distance_km: float
+
+class NearbyResponse(BaseModel):
+    latitude: float
+    longitude: float
+    radius_km: float
+    items: List[NearbyShipment]
+
+class EtaRepredictResponse(BaseModel):
+    scanned: int
+    updated: int
+    lanes: int
+    fitted_at: Optional[datetime] = None
+
 # --- Tenant Schemas ---
 
 class TenantBase(BaseModel):
@@ -394,11 +456,60 @@ class PODUploadResponse(BaseModel):
     pod_timestamp: datetime
     photo_count: int
 
+class PODUploadUrlPhoto(BaseModel):
+    content_type: str
+    size: int
+    sha256: str
+
+class PODUploadUrlRequest(BaseModel):
+    photos: List[PODUploadUrlPhoto]
+
+class PODUploadUrl(BaseModel):
+    key: str
+    url: Optional[str] = None  # None: already stored, no upload needed
+    headers: dict = {}
+
+class PODUploadUrlResponse(BaseModel):
+    uploads: List[PODUploadUrl]
+    expires_in: int
+
+class PODSyncItem(BaseModel):
+    idempotency_key: str = Field(min_length=8, max_length=128)
+    tracking_number: str
+    signature: str
+    latitude: float
+    longitude: float
+    accuracy: Optional[float] = None
+    receiver_name: str
+    receiver_contact: Optional[str] = None
+    photos: List[str] = []  # names of the request's file parts holding this POD's photos
+    photo_keys: List[str] = []  # photos already uploaded via /pod/upload-urls
+
+class PODSyncResult(BaseModel):
+    idempotency_key: str
+    tracking_number: str
+    status_code: int
+    replayed: bool = False
+    body: dict
+
+class PODSyncResponse(BaseModel):
+    results: List[PODSyncResult]
+    succeeded: int
+    failed: int
+
+class PODPhotoRendition(BaseModel):
+    original: str
+    thumbnail: Optional[str] = None
+    web: Optional[str] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+
 class PODDetailResponse(BaseModel):
     tracking_number: str
     pod_status: Optional[str] = None
     pod_signature: Optional[str] = None
     pod_photos: Optional[List[str]] = None
+    pod_photo_renditions: List[PODPhotoRendition] = []
     pod_location: Optional[dict] = None
     pod_timestamp: Optional[datetime] = None
     pod_receiver_name: Optional[str] = None
@@ -423,6 +534,28 @@ class PODVerifyResponse(BaseModel):
     pod_verified_by: Optional[str] = None
     pod_notes: Optional[str] = None
 
+class PODBulkVerifyItem(BaseModel):
+    tracking_number: str
+    action: str
+    notes: Optional[str] = None
+
+class PODBulkVerifyRequest(BaseModel):
+    items: List[PODBulkVerifyItem]
+
+class PODBulkVerifyResult(BaseModel):
+    tracking_number: str
+    ok: bool
+    pod_status: Optional[str] = None
+    error: Optional[str] = None  # invalid_action | duplicate | not_found | no_pod | conflict
+    detail: Optional[str] = None
+
+class PODBulkVerifyResponse(BaseModel):
+    results: List[PODBulkVerifyResult]
+    verified: int
+    disputed: int
+    failed: int
+    pod_verified_at: datetime
+
 class PODListItem(BaseModel):
     tracking_number: str
     origin: str
@@ -431,6 +564,7 @@ class PODListItem(BaseModel):
     pod_timestamp: Optional[datetime] = None
     pod_receiver_name: Optional[str] = None
     photo_count: int = 0
+    photo_thumbnails: List[str] = []
     current_status: str
 
     model_config = ConfigDict(from_attributes=True)
@@ -438,6 +572,7 @@ class PODListItem(BaseModel):
 class PODListResponse(BaseModel):
     items: List[PODListItem]
     total: int
+    status_counts: dict[str, int] = {}
     page: int
     limit: int
 
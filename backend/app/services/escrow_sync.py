@@ -1,17 +1,55 @@
 """
 Background service that polls on-chain escrow events and updates the DB.
-Uses web3.py to read ShipmentEscrow contract events (Funded, Released, Disputed, Refunded).
+Uses web3.py (AsyncWeb3, shared client from core/chain.py) to read ShipmentEscrow
+contract events (Funded, Released, Disputed, Refunded).
+
+Each poll is one sweep: a single eth_getLogs over every tracked escrow address,
+filtered on the four event topics, with logs routed back to their escrow by
+address and all resulting transitions committed in one transaction. Long
+ranges (a new address with ESCROW_SYNC_START_BLOCK set, or catching up after
+downtime) go through the adaptive backfill in log_backfill.py and are
+committed chunk by chunk as the cursor advances.
+
+Progress is kept in `chain_sync_cursors` (block number and hash per contract),
+so a restart resumes where the last sweep stopped. Sweeps stop
+ESCROW_SYNC_CONFIRMATIONS blocks behind head. Every applied transition is
+journaled in `chain_sync_events` with the fields it overwrote and the values
+it wrote; if the block under the newest cursor no longer has the stored hash,
+transitions from the last ESCROW_SYNC_REORG_DEPTH blocks are reverted, the
+cursors rewound, and the next sweep replays the canonical chain. A revert only
+restores fields that still hold what the transition wrote, so later writes
+(the oracle marking an escrow arrived, say) survive it.
+
+With ESCROW_SYNC_WS_URL set, logs of the tracked escrows are also streamed
+over eth_subscribe("logs") and applied as soon as they arrive. Streamed
+transitions are journaled like swept ones, and the poll keeps running as the
+gap filler: when a later sweep covers their blocks, any streamed transition
+missing from the confirmed logs (dropped by a reorg while disconnected, say)
+is reverted, and anything the stream missed is applied. A `removed` log from
+the node reverts its transition immediately. To try it locally, run
+`npm run node` in contracts/ (Hardhat, ws and http on 127.0.0.1:8545) with
+SEPOLIA_RPC_URL=http://127.0.0.1:8545, ESCROW_SYNC_WS_URL=ws://127.0.0.1:8545,
+CHAIN_ID=31337 and ESCROW_SYNC_CONFIRMATIONS=0; Anvil works the same way.
 """
 import asyncio
 import logging
 import os
+import threading
 from datetime import datetime, timezone
+from typing import Optional
 
+from fastapi.concurrency import run_in_threadpool
+from hexbytes import HexBytes
+from sqlalchemy import func, or_, text
 from sqlalchemy.orm import Session
-from web3 import Web3
+from web3 import AsyncWeb3, Web3, WebSocketProvider
+from web3.exceptions import BlockNotFound
 
+from ..core import chain
+from ..core.config import settings
 from ..database import SessionLocal
-from ..models import PaymentEscrow
+from ..models import ChainSyncCursor, ChainSyncEvent, PaymentEscrow
+from .log_backfill import LogBackfill
 
 logger = logging.getLogger(__name__)
 
@@ -54,108 +92,419 @@ ESCROW_EVENTS_ABI = [
     },
 ]
 
+# Blocks scanned for an address without a cursor when ESCROW_SYNC_START_BLOCK is unset
+INITIAL_LOOKBACK = 1000
+# Providers reject very long address lists (block ranges adapt, see log_backfill.py)
+MAX_ADDRESSES_PER_QUERY = 500
+WS_RECONNECT_DELAY_SECONDS = 5
+
+OPEN_STATUSES = ("created", "funded", "disputed")
+
+
+def _event_topic(abi: dict) -> bytes:
+    signature = f"{abi['name']}({','.join(i['type'] for i in abi['inputs'])})"
+    return bytes(Web3.keccak(text=signature))
+
+
+# topic0 -> event name
+EVENT_TOPICS = {_event_topic(abi): abi["name"] for abi in ESCROW_EVENTS_ABI}
+
+# Escrow fields a transition may overwrite; journaled so a reorg can restore them
+JOURNALED_FIELDS = (
+    "status", "is_locked", "tx_hash_deposit", "tx_hash_release", "tx_hash_dispute",
+    "tx_hash_refund", "funded_at", "resolved_at",
+)
+_DATETIME_FIELDS = {"funded_at", "resolved_at"}
+
+_ADVANCE_CURSORS = text("""
+    INSERT INTO chain_sync_cursors (chain_id, contract_address, block_number, block_hash)
+    SELECT :chain_id, address, :block_number, :block_hash FROM unnest(CAST(:addresses AS varchar[])) AS address
+    ON CONFLICT (chain_id, contract_address) DO UPDATE
+        SET block_number = EXCLUDED.block_number, block_hash = EXCLUDED.block_hash, updated_at = NOW()
+""")
+
 
 class EscrowEventSync:
     def __init__(self):
-        rpc_url = os.getenv("SEPOLIA_RPC_URL", "")
-        if not rpc_url:
+        self.rpc_url = os.getenv("SEPOLIA_RPC_URL", "")
+        self.w3: Optional[AsyncWeb3] = None
+        if not self.rpc_url:
             logger.warning("SEPOLIA_RPC_URL not set; escrow sync disabled")
-            self.w3 = None
             return
-        self.w3 = Web3(Web3.HTTPProvider(rpc_url))
         self.poll_interval = int(os.getenv("ESCROW_SYNC_INTERVAL", "30"))
-        self._last_block: dict[str, int] = {}
+        self.chain_id = settings.CHAIN_ID
+        # Open escrow addresses as of the last sweep; the WS subscription follows them
+        self._tracked: frozenset = frozenset()
+        self._ws: Optional[AsyncWeb3] = None
+        self._subscription: Optional[tuple[str, frozenset]] = None
+        self._backfill = LogBackfill(concurrency=settings.ESCROW_BACKFILL_CONCURRENCY)
+        self._subscribe_lock = asyncio.Lock()
+        # Sweeps and streamed logs apply transitions from different threads
+        self._apply_lock = threading.Lock()
+        self._handlers = {
+            "Funded": self._handle_funded,
+            "Released": self._handle_released,
+            "Disputed": self._handle_disputed,
+            "Refunded": self._handle_refunded,
+        }
 
     async def start(self):
-        """Main polling loop."""
-        if not self.w3:
+        """Main polling loop (the gap filler when logs are also streamed)."""
+        if not self.rpc_url:
             logger.info("Escrow sync skipped (no RPC URL)")
             return
-        logger.info("Escrow event sync started (interval=%ds)", self.poll_interval)
+        self.w3 = await chain.get_web3(self.rpc_url)
+        listener = asyncio.create_task(self._listen()) if settings.ESCROW_SYNC_WS_URL else None
+        logger.info(
+            "Escrow event sync started (interval=%ds, subscription=%s)",
+            self.poll_interval, "on" if listener else "off",
+        )
+        try:
+            while True:
+                try:
+                    await self._sync_all()
+                    subscribed = self._subscription[1] if self._subscription else frozenset()
+                    if self._ws is not None and subscribed != self._tracked:
+                        await self._subscribe()
+                except Exception:
+                    logger.exception("Escrow sync error")
+                await asyncio.sleep(self.poll_interval)
+        finally:
+            if listener:
+                listener.cancel()
+
+    async def _listen(self):
+        """Stream escrow logs over eth_subscribe, reconnecting after failures."""
         while True:
             try:
-                self._sync_all()
+                async with AsyncWeb3(WebSocketProvider(settings.ESCROW_SYNC_WS_URL)) as ws:
+                    self._ws = ws
+                    await self._subscribe()
+                    logger.info("Escrow log subscription connected")
+                    async for message in ws.socket.process_subscriptions():
+                        await run_in_threadpool(self._apply_streamed, message["result"])
+            except asyncio.CancelledError:
+                raise
             except Exception:
-                logger.exception("Escrow sync error")
-            await asyncio.sleep(self.poll_interval)
+                logger.exception("Escrow log subscription lost; reconnecting in %ds", WS_RECONNECT_DELAY_SECONDS)
+            finally:
+                self._ws = None
+                self._subscription = None
+            await asyncio.sleep(WS_RECONNECT_DELAY_SECONDS)
 
-    def _sync_all(self):
+    async def _subscribe(self):
+        """(Re)subscribe to the logs of the currently tracked escrows."""
+        async with self._subscribe_lock:
+            ws, tracked = self._ws, self._tracked
+            if ws is None:
+                return
+            if self._subscription:
+                try:
+                    await ws.eth.unsubscribe(self._subscription[0])
+                except Exception:
+                    logger.warning("Failed to drop escrow log subscription %s", self._subscription[0])
+                self._subscription = None
+            # An empty address list would subscribe to every contract on the chain
+            if tracked:
+                subscription_id = await ws.eth.subscribe("logs", self._log_filter(sorted(tracked)))
+                self._subscription = (subscription_id, tracked)
+
+    async def _sync_all(self):
+        # RPC calls are awaited on the event loop; DB work runs in the thread pool
         db: Session = SessionLocal()
         try:
-            escrows = (
-                db.query(PaymentEscrow)
-                .filter(
-                    PaymentEscrow.escrow_contract_address.isnot(None),
-                    PaymentEscrow.status.in_(["created", "funded", "disputed"]),
-                )
-                .all()
+            await self._handle_reorg(db)
+
+            safe_block = await self.w3.eth.block_number - settings.ESCROW_SYNC_CONFIRMATIONS
+            ranges = await run_in_threadpool(self._plan, db, safe_block)
+            if not ranges:
+                await run_in_threadpool(db.commit)
+                return
+
+            for from_block, addresses in ranges.items():
+                for i in range(0, len(addresses), MAX_ADDRESSES_PER_QUERY):
+                    batch = addresses[i:i + MAX_ADDRESSES_PER_QUERY]
+                    # A normal poll is one chunk; a backfill after downtime or for a new
+                    # address is checkpointed as it goes, so a failure resumes from there
+                    start = from_block
+                    async for covered, logs in self._backfill.scan(
+                        self.w3, self._log_filter(batch), from_block, safe_block
+                    ):
+                        block = await chain.bounded(self.w3.eth.get_block(covered))
+                        await run_in_threadpool(
+                            self._apply, db, {start: batch}, logs, covered, Web3.to_hex(block["hash"])
+                        )
+                        start = covered + 1
+        except Exception:
+            await run_in_threadpool(db.rollback)
+            raise
+        finally:
+            await run_in_threadpool(db.close)
+
+    def _plan(self, db: Session, safe_block: int) -> dict[int, list[str]]:
+        """{from_block: addresses} still to sweep up to safe_block."""
+        # Open escrows, plus recently resolved ones whose journaled (possibly
+        # streamed) transitions the sweep still has to confirm
+        escrows = (
+            db.query(PaymentEscrow)
+            .filter(
+                PaymentEscrow.escrow_contract_address.isnot(None),
+                or_(
+                    PaymentEscrow.status.in_(OPEN_STATUSES),
+                    PaymentEscrow.id.in_(
+                        db.query(ChainSyncEvent.escrow_id).filter(ChainSyncEvent.chain_id == self.chain_id)
+                    ),
+                ),
             )
-            for escrow in escrows:
-                try:
-                    self._sync_single(db, escrow)
-                except Exception:
-                    logger.exception("Error syncing escrow %s", escrow.id)
+            .all()
+        )
+        by_address = {escrow.escrow_contract_address.lower(): escrow for escrow in escrows}
+        self._tracked = frozenset(a for a, escrow in by_address.items() if escrow.status in OPEN_STATUSES)
+        if not by_address or safe_block < 0:
+            return {}
+
+        cursors = {
+            cursor.contract_address: cursor.block_number
+            for cursor in db.query(ChainSyncCursor).filter(
+                ChainSyncCursor.chain_id == self.chain_id,
+                ChainSyncCursor.contract_address.in_(list(by_address)),
+            )
+        }
+        # Contracts sharing a cursor (normally all of them) share one query
+        ranges: dict[int, list[str]] = {}
+        for address in by_address:
+            if address in cursors:
+                from_block = cursors[address] + 1
+            elif settings.ESCROW_SYNC_START_BLOCK is not None:
+                from_block = settings.ESCROW_SYNC_START_BLOCK
+            else:
+                from_block = max(0, safe_block - INITIAL_LOOKBACK)
+            if from_block <= safe_block:
+                ranges.setdefault(from_block, []).append(address)
+        return ranges
+
+    def _apply(self, db: Session, ranges: dict[int, list[str]], logs: list,
+               to_block: int, block_hash: str) -> None:
+        """Apply the swept logs, reconcile streamed transitions, advance the cursors to `to_block` and commit."""
+        addresses = [a for batch in ranges.values() for a in batch]
+        swept = {(Web3.to_hex(log["blockHash"]), log["logIndex"]) for log in logs}
+        with self._apply_lock:
+            # Reload: the stream may have changed these escrows since _plan
+            by_address = {
+                escrow.escrow_contract_address.lower(): escrow
+                for escrow in db.query(PaymentEscrow).populate_existing().filter(
+                    func.lower(PaymentEscrow.escrow_contract_address).in_(addresses)
+                )
+            }
+
+            # Streamed transitions in the swept range that the confirmed logs don't contain
+            orphaned = []
+            for from_block, batch in ranges.items():
+                orphaned += (
+                    db.query(ChainSyncEvent)
+                    .join(PaymentEscrow, PaymentEscrow.id == ChainSyncEvent.escrow_id)
+                    .filter(
+                        ChainSyncEvent.chain_id == self.chain_id,
+                        ChainSyncEvent.block_number.between(from_block, to_block),
+                        func.lower(PaymentEscrow.escrow_contract_address).in_(batch),
+                    )
+                    .all()
+                )
+            orphaned = [event for event in orphaned if (event.block_hash, event.log_index) not in swept]
+            self._revert(db, orphaned)
+
+            # Transitions depend on order (Funded before Released / Disputed ...)
+            logs.sort(key=lambda log: (log["blockNumber"], log["logIndex"]))
+            applied = sum(self._apply_log(db, by_address.get(log["address"].lower()), log) for log in logs)
+
+            db.execute(_ADVANCE_CURSORS, {
+                "chain_id": self.chain_id,
+                "addresses": addresses,
+                "block_number": to_block,
+                "block_hash": block_hash,
+            })
+            # Journal entries below the rewind window can never be rolled back
+            db.query(ChainSyncEvent).filter(
+                ChainSyncEvent.chain_id == self.chain_id,
+                ChainSyncEvent.block_number < to_block - settings.ESCROW_SYNC_REORG_DEPTH,
+            ).delete(synchronize_session=False)
+            db.commit()
+        if applied:
+            logger.info("Escrow sync applied %d event(s) up to block %d", applied, to_block)
+
+    def _apply_streamed(self, log) -> None:
+        """Apply one log from the subscription, ahead of the confirmed sweep."""
+        db: Session = SessionLocal()
+        try:
+            with self._apply_lock:
+                if log.get("removed"):
+                    # Dropped by a reorg: undo whatever it changed
+                    self._revert(db, db.query(ChainSyncEvent).filter(
+                        ChainSyncEvent.chain_id == self.chain_id,
+                        ChainSyncEvent.block_hash == Web3.to_hex(log["blockHash"]),
+                        ChainSyncEvent.log_index == log["logIndex"],
+                    ).all())
+                else:
+                    escrow = db.query(PaymentEscrow).filter(
+                        func.lower(PaymentEscrow.escrow_contract_address) == log["address"].lower()
+                    ).first()
+                    self._apply_log(db, escrow, log)
+                db.commit()
+        except Exception:
+            db.rollback()
+            logger.exception("Failed to apply streamed escrow log %s", log.get("transactionHash"))
         finally:
             db.close()
 
-    def _sync_single(self, db: Session, escrow: PaymentEscrow):
-        addr = escrow.escrow_contract_address
-        contract = self.w3.eth.contract(
-            address=Web3.to_checksum_address(addr),
-            abi=ESCROW_EVENTS_ABI,
+    def _apply_log(self, db: Session, escrow: Optional[PaymentEscrow], log) -> bool:
+        """Run the event's transition on `escrow` and journal it; False if nothing changed."""
+        topics = log["topics"]
+        event_name = EVENT_TOPICS.get(bytes(HexBytes(topics[0]))) if topics else None
+        if escrow is None or event_name is None:
+            return False
+        previous = self._snapshot(escrow)
+        if not self._handlers[event_name](escrow, log):
+            return False
+        current = self._snapshot(escrow)
+        applied = {field: value for field, value in current.items() if value != previous[field]}
+        db.add(ChainSyncEvent(
+            chain_id=self.chain_id,
+            block_number=log["blockNumber"],
+            block_hash=Web3.to_hex(log["blockHash"]),
+            log_index=log["logIndex"],
+            event=event_name,
+            escrow_id=escrow.id,
+            previous=previous,
+            applied=applied,
+        ))
+        return True
+
+    def _revert(self, db: Session, events: list) -> None:
+        """Restore the escrow fields journaled by `events`, newest first, and drop the entries."""
+        events = sorted(events, key=lambda event: (event.block_number, event.log_index), reverse=True)
+        for event in events:
+            escrow = db.get(PaymentEscrow, event.escrow_id)
+            if escrow is not None:
+                conflicts = self._restore(escrow, event.previous, event.applied)
+                if conflicts:
+                    logger.warning(
+                        "Escrow %s: %s from block %d reverted except %s, changed since",
+                        escrow.id, event.event, event.block_number, ", ".join(conflicts),
+                    )
+                else:
+                    logger.info("Escrow %s: reverted %s from block %d", escrow.id, event.event, event.block_number)
+            db.delete(event)
+        db.flush()
+
+    async def _handle_reorg(self, db: Session) -> None:
+        """Roll back and rewind if the newest cursor's block was reorganised away."""
+        cursor = await run_in_threadpool(self._newest_cursor, db)
+        if cursor is None:
+            return
+        block_number, block_hash = cursor
+        try:
+            canonical = Web3.to_hex((await self.w3.eth.get_block(block_number))["hash"])
+        except BlockNotFound:
+            canonical = None
+        if canonical == block_hash:
+            return
+
+        target = max(0, block_number - settings.ESCROW_SYNC_REORG_DEPTH)
+        logger.warning(
+            "Chain reorg detected at block %d (stored %s, now %s); rewinding escrow sync to %d",
+            block_number, block_hash, canonical, target,
         )
-        from_block = self._last_block.get(addr, max(0, self.w3.eth.block_number - 1000))
-
-        for event_name, handler in [
-            ("Funded", self._handle_funded),
-            ("Released", self._handle_released),
-            ("Disputed", self._handle_disputed),
-            ("Refunded", self._handle_refunded),
-        ]:
-            try:
-                event_filter = getattr(contract.events, event_name)
-                logs = event_filter.get_logs(fromBlock=from_block)
-                for log in logs:
-                    handler(db, escrow, log)
-            except Exception:
-                logger.exception("Error processing %s for %s", event_name, addr)
+        target_hash = Web3.to_hex((await self.w3.eth.get_block(target))["hash"])
+        await run_in_threadpool(self._rewind, db, target, target_hash)
+
+    def _newest_cursor(self, db: Session) -> Optional[tuple[int, str]]:
+        cursor = (
+            db.query(ChainSyncCursor)
+            .filter(ChainSyncCursor.chain_id == self.chain_id)
+            .order_by(ChainSyncCursor.block_number.desc())
+            .first()
+        )
+        return (cursor.block_number, cursor.block_hash) if cursor else None
+
+    def _rewind(self, db: Session, target: int, target_hash: str) -> None:
+        """Revert journaled transitions above `target` and move the cursors back to it."""
+        with self._apply_lock:
+            self._revert(db, db.query(ChainSyncEvent).filter(
+                ChainSyncEvent.chain_id == self.chain_id, ChainSyncEvent.block_number > target
+            ).all())
+            db.query(ChainSyncCursor).filter(
+                ChainSyncCursor.chain_id == self.chain_id,
+                ChainSyncCursor.block_number > target,
+            ).update({"block_number": target, "block_hash": target_hash}, synchronize_session=False)
+            # Committed under the lock, so the stream never waits on these row locks
+            db.commit()
+
+    @staticmethod
+    def _snapshot(escrow: PaymentEscrow) -> dict:
+        snapshot = {}
+        for field in JOURNALED_FIELDS:
+            value = getattr(escrow, field)
+            snapshot[field] = value.isoformat() if field in _DATETIME_FIELDS and value else value
+        return snapshot
 
-        self._last_block[addr] = self.w3.eth.block_number
+    @staticmethod
+    def _restore(escrow: PaymentEscrow, previous: dict, applied: Optional[dict]) -> list[str]:
+        """Put back the fields `applied` wrote; returns those changed since, left as they are.
 
-    def _handle_funded(self, db: Session, escrow: PaymentEscrow, log):
+        Entries journaled before `applied` existed restore every field.
+        """
+        def load(field, value):
+            return datetime.fromisoformat(value) if field in _DATETIME_FIELDS and value else value
+
+        conflicts = []
+        for field in previous if applied is None else applied:
+            if applied is not None and getattr(escrow, field) != load(field, applied[field]):
+                conflicts.append(field)
+                continue
+            setattr(escrow, field, load(field, previous[field]))
+        return conflicts
+
+    @staticmethod
+    def _log_filter(addresses: list[str]) -> dict:
+        return {
+            "address": [Web3.to_checksum_address(a) for a in addresses],
+            "topics": [[Web3.to_hex(topic) for topic in EVENT_TOPICS]],
+        }
+
+    def _handle_funded(self, escrow: PaymentEscrow, log) -> bool:
         if escrow.status != "created":
-            return
+            return False
         escrow.status = "funded"
         escrow.is_locked = True
-        escrow.tx_hash_deposit = log.transactionHash.hex()
+        escrow.tx_hash_deposit = log["transactionHash"].hex()
         escrow.funded_at = datetime.now(timezone.utc)
-        db.commit()
         logger.info("Escrow %s funded (tx=%s)", escrow.id, escrow.tx_hash_deposit)
+        return True
 
-    def _handle_released(self, db: Session, escrow: PaymentEscrow, log):
+    def _handle_released(self, escrow: PaymentEscrow, log) -> bool:
         if escrow.status not in ("funded", "disputed"):
-            return
+            return False
         escrow.status = "released"
         escrow.is_locked = False
-        escrow.tx_hash_release = log.transactionHash.hex()
+        escrow.tx_hash_release = log["transactionHash"].hex()
         escrow.resolved_at = datetime.now(timezone.utc)
-        db.commit()
         logger.info("Escrow %s released (tx=%s)", escrow.id, escrow.tx_hash_release)
+        return True
 
-    def _handle_disputed(self, db: Session, escrow: PaymentEscrow, log):
+    def _handle_disputed(self, escrow: PaymentEscrow, log) -> bool:
         if escrow.status != "funded":
-            return
+            return False
         escrow.status = "disputed"
-        escrow.tx_hash_dispute = log.transactionHash.hex()
-        db.commit()
+        escrow.tx_hash_dispute = log["transactionHash"].hex()
         logger.info("Escrow %s disputed (tx=%s)", escrow.id, escrow.tx_hash_dispute)
+        return True
 
-    def _handle_refunded(self, db: Session, escrow: PaymentEscrow, log):
+    def _handle_refunded(self, escrow: PaymentEscrow, log) -> bool:
         if escrow.status != "disputed":
-            return
+            return False
         escrow.status = "refunded"
         escrow.is_locked = False
-        escrow.tx_hash_refund = log.transactionHash.hex()
+        escrow.tx_hash_refund = log["transactionHash"].hex()
         escrow.resolved_at = datetime.now(timezone.utc)
-        db.commit()
         logger.info("Escrow %s refunded (tx=%s)", escrow.id, escrow.tx_hash_refund)
+        return True
@@ -0,0 +1,260 @@
+"""
+Historical ETA model.
+
+Transit times (ata - created_at) of delivered shipments are grouped per
+(origin, destination, transport_mode) lane and summarised as quantiles in a
+periodic NumPy batch job. The fitted table lives in memory, so a prediction is
+a dict lookup plus a datetime addition.
+
+Lanes with too little history fall back to a per-mode "hours per km"
+distribution applied to the carbon engine's lane distance.
+"""
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Optional, Sequence
+
+import numpy as np
+from sqlalchemy import select, text
+
+from .. import models
+from ..carbon.engine import normalize_mode, lane_distance_km, resolve_port
+from ..core.config import settings
+from ..database import SessionLocal, engine
+
+logger = logging.getLogger(__name__)
+
+REPREDICT_BATCH_SIZE = 5000
+QUANTILES = (0.1, 0.5, 0.9)
+MIN_LANE_SAMPLES = 5
+MAX_TRANSIT_HOURS = 365 * 24
+
+
+@dataclass(frozen=True)
+class TransitStats:
+    samples: int
+    p10: float
+    p50: float
+    p90: float
+
+
+@lru_cache(maxsize=16384)
+def lane_key(origin: Optional[str], destination: Optional[str], mode: Optional[str]) -> tuple:
+    """Normalise a lane so 'Busan, KR' and 'KRPUS' share history."""
+    def place(value):
+        return resolve_port(value) or (value or "").strip().lower()
+    return place(origin), place(destination), normalize_mode(mode)
+
+
+def grouped_quantiles(keys: Sequence, values: np.ndarray, quantiles=QUANTILES) -> dict:
+    """Return {key: (count, q...)} for each distinct key, fully vectorized.
+
+    Values are sorted within groups once (lexsort); each quantile is then a
+    linear interpolation between two gathered positions per group.
+    """
+    key_array = np.empty(len(keys), dtype=object)
+    key_array[:] = keys
+    uniq, group = np.unique(key_array, return_inverse=True)
+    order = np.lexsort((values, group))
+    sorted_values = values[order]
+    counts = np.bincount(group, minlength=len(uniq))
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+    columns = []
+    for q in quantiles:
+        k = q * (counts - 1)
+        lo = np.floor(k).astype(int)
+        hi = np.minimum(lo + 1, counts - 1)
+        a = sorted_values[starts + lo]
+        b = sorted_values[starts + hi]
+        columns.append(a + (b - a) * (k - lo))
+
+    return {
+        key: (int(counts[i]), *(float(col[i]) for col in columns))
+        for i, key in enumerate(uniq)
+    }
+
+
+class EtaModel:
+    def __init__(self):
+        self.lanes: dict[tuple, TransitStats] = {}
+        # mode -> TransitStats of hours per km, for lanes without enough history
+        self.modes: dict[str, TransitStats] = {}
+        self.fitted_at: Optional[datetime] = None
+        self.samples = 0
+
+    # ──── Fitting ────
+
+    def fit(self, origins, destinations, modes, created_at, ata) -> None:
+        """Fit lane and per-mode transit distributions from delivered shipments."""
+        created = np.array([d.timestamp() for d in created_at], dtype=np.float64)
+        arrived = np.array([d.timestamp() for d in ata], dtype=np.float64)
+        hours = (arrived - created) / 3600.0
+        valid = (hours > 0) & (hours <= MAX_TRANSIT_HOURS)
+
+        keys = [lane_key(o, d, m) for o, d, m in zip(origins, destinations, modes)]
+        keys = [k for k, ok in zip(keys, valid) if ok]
+        hours = hours[valid]
+
+        lanes = {}
+        if keys:
+            for key, (count, p10, p50, p90) in grouped_quantiles(keys, hours).items():
+                if count >= MIN_LANE_SAMPLES:
+                    lanes[key] = TransitStats(count, p10, p50, p90)
+
+        mode_stats = {}
+        if keys:
+            distances = np.array([lane_distance_km(o, d, m) for o, d, m in keys])
+            per_km = hours / np.maximum(distances, 1.0)
+            mode_keys = [m for _, _, m in keys]
+            for mode, (count, p10, p50, p90) in grouped_quantiles(mode_keys, per_km).items():
+                mode_stats[mode] = TransitStats(count, p10, p50, p90)
+
+        # Swap in whole tables so readers never see a half-built model
+        self.lanes, self.modes = lanes, mode_stats
+        self.samples = len(keys)
+        self.fitted_at = datetime.now(timezone.utc)
+
+    def refit(self) -> None:
+        lookback = datetime.now(timezone.utc) - timedelta(days=settings.ETA_LOOKBACK_DAYS)
+        db = SessionLocal()
+        try:
+            rows = db.execute(
+                select(
+                    models.Shipment.origin,
+                    models.Shipment.destination,
+                    models.Shipment.transport_mode,
+                    models.Shipment.created_at,
+                    models.Shipment.ata,
+                ).where(
+                    models.Shipment.ata.isnot(None),
+                    models.Shipment.created_at.isnot(None),
+                    models.Shipment.ata >= lookback,
+                )
+            ).all()
+        finally:
+            db.close()
+
+        columns = list(zip(*rows)) if rows else [()] * 5
+        self.fit(*columns)
+        logger.info(f"ETA model fitted: {len(self.lanes)} lanes from {self.samples} deliveries")
+
+    async def start(self):
+        """Refit periodically for the lifetime of the worker."""
+        while True:
+            try:
+                await asyncio.to_thread(self.refit)
+            except Exception as e:
+                logger.error(f"ETA model refit failed: {e}")
+            await asyncio.sleep(settings.ETA_REFIT_INTERVAL_SECONDS)
+
+    # ──── Prediction ────
+
+    def transit(self, origin: Optional[str], destination: Optional[str], mode: Optional[str]) -> Optional[TransitStats]:
+        """Transit-time distribution in hours for a lane, or None without history."""
+        key = lane_key(origin, destination, mode)
+        stats = self.lanes.get(key)
+        if stats is not None:
+            return stats
+        per_km = self.modes.get(key[2])
+        if per_km is None:
+            return None
+        distance = lane_distance_km(origin, destination, key[2])
+        return TransitStats(0, per_km.p10 * distance, per_km.p50 * distance, per_km.p90 * distance)
+
+    def predict(self, origin, destination, mode, departure: datetime) -> Optional[datetime]:
+        stats = self.transit(origin, destination, mode)
+        if stats is None:
+            return None
+        return departure + timedelta(hours=stats.p50)
+
+    def resolve_eta(self, origin, destination, mode, departure: datetime, supplied: Optional[datetime]) -> Optional[datetime]:
+        """ETA to store: the supplied one if plausible, else the model's median.
+
+        A supplied ETA outside the lane's p10-p90 band is treated as wrong and
+        replaced; with no model for the lane it is kept as given.
+        """
+        stats = self.transit(origin, destination, mode)
+        if stats is None:
+            return supplied
+        return self._resolve(stats, departure, supplied)
+
+    @staticmethod
+    def _resolve(stats: TransitStats, departure: datetime, supplied: Optional[datetime]) -> datetime:
+        if supplied is not None:
+            if supplied.tzinfo is None:
+                supplied = supplied.replace(tzinfo=timezone.utc)
+            earliest = departure + timedelta(hours=stats.p10)
+            latest = departure + timedelta(hours=stats.p90)
+            if earliest <= supplied <= latest:
+                return supplied
+        return departure + timedelta(hours=stats.p50)
+
+    # ──── Bulk re-prediction ────
+
+    def repredict(self, tenant_id: Optional[str] = None, only_missing: bool = False,
+                  batch_size: int = REPREDICT_BATCH_SIZE) -> tuple[int, int]:
+        """Fill in or correct ETAs of undelivered shipments; returns (scanned, updated).
+
+        Each stored ETA goes through resolve_eta, so plausible ones are kept and
+        only missing or out-of-band ETAs change. Lane distributions are looked
+        up once per distinct lane in each batch and the changed rows written
+        back with one UPDATE per batch.
+        """
+        scanned = updated = 0
+        last_id = None
+        while True:
+            with engine.begin() as conn:
+                rows = conn.execute(_SELECT_UNDELIVERED, {
+                    "last_id": last_id,
+                    "tenant_id": tenant_id,
+                    "only_missing": only_missing,
+                    "limit": batch_size,
+                }).all()
+                if not rows:
+                    break
+
+                transit = {}
+                ids, etas = [], []
+                for row in rows:
+                    lane = (row.origin, row.destination, row.transport_mode)
+                    if lane not in transit:
+                        transit[lane] = self.transit(*lane)
+                    stats = transit[lane]
+                    if stats is None or row.created_at is None:
+                        continue
+                    eta = self._resolve(stats, row.created_at, row.eta)
+                    if eta != row.eta:
+                        ids.append(str(row.id))
+                        etas.append(eta)
+                if ids:
+                    updated += conn.execute(_UPDATE_ETAS, {"ids": ids, "etas": etas}).rowcount
+            scanned += len(rows)
+            last_id = str(rows[-1].id)
+        return scanned, updated
+
+
+_SELECT_UNDELIVERED = text("""
+    SELECT id, origin, destination, transport_mode, created_at, eta
+    FROM shipments
+    WHERE ata IS NULL
+      AND current_status IS DISTINCT FROM 'Delivered'
+      AND pod_status IS NULL
+      AND (CAST(:last_id AS uuid) IS NULL OR id > CAST(:last_id AS uuid))
+      AND (CAST(:tenant_id AS uuid) IS NULL OR tenant_id = CAST(:tenant_id AS uuid))
+      AND (NOT :only_missing OR eta IS NULL)
+    ORDER BY id
+    LIMIT :limit
+""")
+
+_UPDATE_ETAS = text("""
+    UPDATE shipments AS s
+    SET eta = v.eta
+    FROM unnest(CAST(:ids AS uuid[]), CAST(:etas AS timestamptz[])) AS v(id, eta)
+    WHERE s.id = v.id AND s.eta IS DISTINCT FROM v.eta
+""")
+
+
+eta_model = EtaModel()
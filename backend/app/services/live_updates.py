@@ -0,0 +1,107 @@
+"""
+Live shipment updates: one Postgres LISTEN connection per worker, fanned out
+to in-process subscribers (Server-Sent Events clients).
+
+Writers never talk to this module. shipment_events.write_events issues
+`pg_notify` inside the writing transaction, so every worker's listener sees
+the event once it commits, whichever worker or background service made it.
+"""
+import asyncio
+import json
+import logging
+from dataclasses import dataclass, field
+from typing import Optional
+
+import psycopg2
+import psycopg2.extensions
+
+from ..database import engine
+from .shipment_events import EVENTS_CHANNEL
+
+logger = logging.getLogger(__name__)
+
+RECONNECT_DELAY_SECONDS = 5
+SUBSCRIBER_QUEUE_SIZE = 100
+
+
+@dataclass(eq=False)
+class Subscription:
+    tenant_id: Optional[str]
+    tracking_numbers: frozenset
+    queue: asyncio.Queue = field(default_factory=lambda: asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE))
+
+    def matches(self, evt: dict) -> bool:
+        if self.tenant_id and evt.get("tenant_id") != self.tenant_id:
+            return False
+        if self.tracking_numbers and evt.get("tracking_number") not in self.tracking_numbers:
+            return False
+        return True
+
+
+class ShipmentEventBroker:
+    def __init__(self):
+        self._subscribers: set[Subscription] = set()
+
+    def subscribe(self, tenant_id: Optional[str] = None, tracking_numbers=()) -> Subscription:
+        sub = Subscription(tenant_id=tenant_id, tracking_numbers=frozenset(tracking_numbers))
+        self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        self._subscribers.discard(sub)
+
+    def publish(self, evt: dict):
+        for sub in list(self._subscribers):
+            if not sub.matches(evt):
+                continue
+            if sub.queue.full():
+                # Slow consumer: drop its oldest event rather than block the listener
+                sub.queue.get_nowait()
+            sub.queue.put_nowait(evt)
+
+    async def start(self):
+        """Keep a LISTEN connection open for the lifetime of the worker."""
+        logger.info("Shipment event listener started (channel=%s)", EVENTS_CHANNEL)
+        while True:
+            try:
+                await self._listen()
+            except Exception:
+                logger.exception("Shipment event listener error; reconnecting")
+            await asyncio.sleep(RECONNECT_DELAY_SECONDS)
+
+    async def _listen(self):
+        loop = asyncio.get_running_loop()
+        dsn = engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+        conn = await loop.run_in_executor(
+            None,
+            lambda: psycopg2.connect(dsn, keepalives=1, keepalives_idle=30, keepalives_interval=10),
+        )
+        conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        with conn.cursor() as cur:
+            cur.execute(f"LISTEN {EVENTS_CHANNEL}")
+
+        lost = loop.create_future()
+
+        def on_readable():
+            try:
+                conn.poll()
+            except Exception as exc:
+                if not lost.done():
+                    lost.set_exception(exc)
+                return
+            while conn.notifies:
+                notify = conn.notifies.pop(0)
+                try:
+                    self.publish(json.loads(notify.payload))
+                except ValueError:
+                    logger.warning("Dropping malformed notification: %r", notify.payload)
+
+        loop.add_reader(conn.fileno(), on_readable)
+        try:
+            await lost
+        finally:
+            loop.remove_reader(conn.fileno())
+            conn.close()
+
+
+broker = ShipmentEventBroker()
@@ -0,0 +1,116 @@
+"""
+Adaptive block-range scanning for eth_getLogs.
+
+Providers cap eth_getLogs by block range, result count or response time, and
+the limits differ per provider and per contract. `LogBackfill.scan` walks a
+range in chunks whose size adapts to the answers it gets: a chunk the
+provider rejects is split in half (or to the range the error suggests) and
+the smaller size is kept, and an empty chunk doubles the size, up to
+BACKFILL_MAX_RANGE. Up to `concurrency` chunks are in flight at once. Results
+are yielded in block order as soon as a contiguous prefix of the range is
+complete, so callers can apply and checkpoint while a long backfill runs and
+resume from the checkpoint if it fails.
+
+The learned chunk size lives on the instance, so a long-lived instance
+starts each scan at the size that worked last.
+"""
+import asyncio
+import logging
+import re
+from typing import AsyncIterator
+
+from web3 import AsyncWeb3
+from web3.exceptions import Web3RPCError
+
+from ..core import chain
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_INITIAL_RANGE = 2000
+BACKFILL_MAX_RANGE = 100_000
+
+# Provider errors that mean "ask for less" rather than "something is broken"
+_TOO_LARGE_RE = re.compile(
+    r"too many|more than \d+ results|limit exceeded|response size|block range|range is too|query timeout|timed out",
+    re.IGNORECASE,
+)
+# Some providers suggest a range that will work, e.g. "try with this block range [0x1, 0x2f]"
+_SUGGESTED_RANGE_RE = re.compile(r"\[(0x[0-9a-fA-F]+),\s*(0x[0-9a-fA-F]+)\]")
+
+
+class RangeTooLarge(Exception):
+    def __init__(self, suggested_size: int = 0):
+        super().__init__(suggested_size)
+        self.suggested_size = suggested_size
+
+
+class LogBackfill:
+    def __init__(self, concurrency: int = 4, initial_range: int = BACKFILL_INITIAL_RANGE,
+                 max_range: int = BACKFILL_MAX_RANGE):
+        self.concurrency = concurrency
+        self.max_range = max_range
+        self.range_size = min(initial_range, max_range)
+
+    async def scan(self, w3: AsyncWeb3, log_filter: dict, from_block: int,
+                   to_block: int) -> AsyncIterator[tuple[int, list]]:
+        """Yield (last block covered, logs) for `log_filter` over [from_block, to_block], in order."""
+        retry: list[tuple[int, int]] = []  # split chunks, fetched before new ones
+        next_block = from_block
+        in_flight: dict[asyncio.Task, tuple[int, int]] = {}
+        done: dict[int, tuple[int, list]] = {}  # chunk start -> (chunk end, logs)
+        emitted = from_block
+        try:
+            while emitted <= to_block:
+                while len(in_flight) < self.concurrency and (retry or next_block <= to_block):
+                    if retry:
+                        start, end = retry.pop(0)
+                    else:
+                        start, end = next_block, min(next_block + self.range_size - 1, to_block)
+                        next_block = end + 1
+                    task = asyncio.create_task(self._fetch(w3, log_filter, start, end))
+                    in_flight[task] = (start, end)
+
+                finished, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for task in finished:
+                    start, end = in_flight.pop(task)
+                    try:
+                        logs = task.result()
+                    except RangeTooLarge as e:
+                        if start == end:
+                            raise RuntimeError(f"eth_getLogs rejects even a single block ({start})") from e
+                        half = e.suggested_size if 0 < e.suggested_size <= end - start else (end - start + 1) // 2
+                        self.range_size = max(1, min(self.range_size, half))
+                        retry += [(start, start + half - 1), (start + half, end)]
+                        retry.sort()
+                        logger.info("eth_getLogs range %d-%d too large; chunk size now %d", start, end, self.range_size)
+                        continue
+                    if not logs and end - start + 1 >= self.range_size:
+                        self.range_size = min(self.range_size * 2, self.max_range)
+                    done[start] = (end, logs)
+
+                # Hand out everything that is contiguous from the last emitted block
+                covered, logs = None, []
+                while emitted in done:
+                    end, chunk_logs = done.pop(emitted)
+                    covered, emitted = end, end + 1
+                    logs += chunk_logs
+                if covered is not None:
+                    yield covered, logs
+        finally:
+            for task in in_flight:
+                task.cancel()
+
+    @staticmethod
+    async def _fetch(w3: AsyncWeb3, log_filter: dict, start: int, end: int) -> list:
+        try:
+            return await chain.bounded(w3.eth.get_logs({**log_filter, "fromBlock": start, "toBlock": end}))
+        except asyncio.TimeoutError:
+            raise RangeTooLarge()
+        except Web3RPCError as e:
+            message = str(e)
+            if not _TOO_LARGE_RE.search(message):
+                raise
+            suggested = _SUGGESTED_RANGE_RE.search(message)
+            raise RangeTooLarge(
+                int(suggested.group(2), 16) - int(suggested.group(1), 16) + 1 if suggested else 0
+            )
@@ -1,100 +1,163 @@
 import asyncio
 import logging
-import time
+from typing import Optional
+
+from eth_account import Account
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from web3 import Web3
+from web3 import AsyncWeb3, Web3
 from .. import models, database
+from ..core import chain
 from ..core.config import settings
 
 logger = logging.getLogger(__name__)
 
 class OracleService:
     def __init__(self):
-        if not settings.ORACLE_PRIVATE_KEY or not settings.ESCROW_CONTRACT_ADDRESS:
+        self.w3: Optional[AsyncWeb3] = None
+        self.enabled = bool(settings.ORACLE_PRIVATE_KEY and settings.ESCROW_CONTRACT_ADDRESS)
+        if not self.enabled:
             logger.warning("Oracle Service disabled: Missing Private Key or Contract Address")
-            self.w3 = None
             return
 
-        self.w3 = Web3(Web3.HTTPProvider(settings.BLOCKCHAIN_RPC_URL))
-        self.account = self.w3.eth.account.from_key(settings.ORACLE_PRIVATE_KEY)
-        self.contract = self.w3.eth.contract(
-            address=self.w3.to_checksum_address(settings.ESCROW_CONTRACT_ADDRESS), 
-            abi=settings.ESCROW_ABI
-        )
+        self.account = Account.from_key(settings.ORACLE_PRIVATE_KEY)
+        self.contract_address = Web3.to_checksum_address(settings.ESCROW_CONTRACT_ADDRESS)
+        self.contract = None
+        self.nonces: Optional[chain.NonceManager] = None
+        self.gas_price: Optional[chain.GasPriceCache] = None
+        # Escrows with a confirmArrival tx being built or broadcast; the poll loop
+        # and POD-triggered releases must not both send one
+        self._releasing: set = set()
         self.poll_interval = 60 # Check every minute
 
+    async def connect(self):
+        """Attach to the shared async web3 client (see core/chain.py)."""
+        if self.w3 is None:
+            self.w3 = await chain.get_web3(settings.BLOCKCHAIN_RPC_URL)
+            self.contract = self.w3.eth.contract(address=self.contract_address, abi=settings.ESCROW_ABI)
+            self.nonces = chain.NonceManager(self.w3, self.account.address)
+            self.gas_price = chain.GasPriceCache(self.w3, settings.ORACLE_GAS_PRICE_TTL_SECONDS)
+
     async def start(self):
-        if not self.w3:
+        if not self.enabled:
             return
-        
+
+        await self.connect()
         logger.info(f"Oracle Service started. Oracle Address: {self.account.address}")
-        
+
         while True:
             try:
-                self.check_and_release_payments()
+                await self.check_and_release_payments()
             except Exception as e:
                 logger.error(f"Oracle Service Loop Error: {str(e)}")
-            
+
             await asyncio.sleep(self.poll_interval)
 
-    def check_and_release_payments(self):
+    async def check_and_release_payments(self):
         """
         Main logic to check for delivered shipments and release escrow funds.
         """
+        # Find locked escrows that need validation
+        # (In a real app, we might check 'AWAITING_DELIVERY' status from DB or Chain)
+        # Here we query DB for locked payments
+        locked_escrows = await run_in_threadpool(self._locked_escrows)
+
+        delivered = []
+        for escrow_id, tracking_number in locked_escrows:
+            # A. Simulation Check (Replace with real Carrier API)
+            is_delivered = self.call_carrier_api_for_status(tracking_number)
+
+            if is_delivered:
+                logger.info(f"Shipment {tracking_number} confirmed delivered. Releasing payment...")
+                delivered.append((escrow_id, tracking_number))
+
+        if delivered:
+            await self.process_releases(delivered)
+
+    @staticmethod
+    def _locked_escrows(tracking_number: Optional[str] = None) -> list:
+        """(escrow id, tracking number) of funded, locked escrows."""
         db: Session = database.SessionLocal()
         try:
-            # Find locked escrows that need validation
-            # (In a real app, we might check 'AWAITING_DELIVERY' status from DB or Chain)
-            # Here we query DB for locked payments
-            locked_escrows = db.query(models.PaymentEscrow).join(models.Shipment).filter(
+            query = db.query(models.PaymentEscrow.id, models.Shipment.tracking_number).join(models.Shipment).filter(
                 models.PaymentEscrow.is_locked == True,
                 models.PaymentEscrow.status == "funded" # Only verify funded escrows
-            ).all()
-
-            for escrow in locked_escrows:
-                tracking_number = escrow.shipment.tracking_number
-                
-                # A. Simulation Check (Replace with real Carrier API)
-                is_delivered = self.call_carrier_api_for_status(tracking_number)
-
-                if is_delivered:
-                    logger.info(f"Shipment {tracking_number} confirmed delivered. Releasing payment...")
-                    self.process_release(db, escrow, tracking_number)
-
+            )
+            if tracking_number is not None:
+                query = query.filter(models.Shipment.tracking_number == tracking_number)
+            return [tuple(row) for row in query.all()]
         finally:
             db.close()
 
-    def process_release(self, db: Session, escrow: models.PaymentEscrow, tracking_number: str):
+    async def process_releases(self, releases: list):
+        """Sign and broadcast confirmArrival for many (escrow id, tracking number) pairs at once.
+
+        Nonces come from the local NonceManager and the gas price from a
+        short-lived cache, so the whole batch costs one RPC call per
+        transaction; broadcasts go out concurrently.
+        """
+        releases = [(escrow_id, tn) for escrow_id, tn in releases if escrow_id not in self._releasing]
+        if not releases:
+            return
+        self._releasing.update(escrow_id for escrow_id, _ in releases)
         try:
-            # B. Build & Sign Transaction
-            nonce = self.w3.eth.get_transaction_count(self.account.address)
-            
-            txn = self.contract.functions.confirmArrival(
-                tracking_number
-            ).build_transaction({
-                'chainId': settings.CHAIN_ID,
-                'gas': 200000,
-                'gasPrice': self.w3.eth.gas_price,
-                'nonce': nonce,
-            })
-
-            signed_txn = self.w3.eth.account.sign_transaction(txn, settings.ORACLE_PRIVATE_KEY)
-            
-            # C. Send Transaction
-            tx_hash = self.w3.eth.send_raw_transaction(signed_txn.rawTransaction)
-            tx_hash_hex = tx_hash.hex()
-            logger.info(f"Confirmed Arrival! TX Hash: {tx_hash_hex}")
+            # B. Build & Sign Transactions
+            gas_price = await self.gas_price.get()
+            nonces = await self.nonces.allocate(len(releases))
+            signed = []
+            for (escrow_id, tracking_number), nonce in zip(releases, nonces):
+                txn = await self.contract.functions.confirmArrival(
+                    tracking_number
+                ).build_transaction({
+                    'chainId': settings.CHAIN_ID,
+                    'gas': 200000,
+                    'gasPrice': gas_price,
+                    'nonce': nonce,
+                })
+                signed.append(self.account.sign_transaction(txn))
 
-            # D. Update DB Status
-            # Note: Status becomes 'arrived_at_destination' in DB or similar, 
-            # Smart Contract status becomes ARRIVED. 
-            # Final release requires Buyer to have the NFT.
-            escrow.status = "arrived" 
-            escrow.tx_hash_release = tx_hash_hex # Re-using field for the oracle tx
-            db.commit()
+            # C. Send Transactions
+            results = await chain.gather_rpc(
+                *(self.w3.eth.send_raw_transaction(tx.raw_transaction) for tx in signed),
+                return_exceptions=True,
+            )
 
+            sent = []
+            for (escrow_id, tracking_number), result in zip(releases, results):
+                if isinstance(result, Exception):
+                    logger.error(f"Failed to confirm arrival for {tracking_number}: {str(result)}")
+                    continue
+                tx_hash_hex = result.hex()
+                logger.info(f"Confirmed Arrival! TX Hash: {tx_hash_hex}")
+                sent.append((escrow_id, tx_hash_hex))
+            if len(sent) < len(releases):
+                # A nonce that never reached the node would block every later one;
+                # resync so the next release reuses it
+                await self.nonces.resync()
+
+            # D. Update DB Status
+            if sent:
+                await run_in_threadpool(self._mark_arrived, sent)
         except Exception as e:
-            logger.error(f"Failed to confirm arrival for {tracking_number}: {str(e)}")
+            await self.nonces.resync()
+            logger.error(f"Failed to confirm arrival for {len(releases)} shipment(s): {str(e)}")
+        finally:
+            self._releasing.difference_update(escrow_id for escrow_id, _ in releases)
+
+    @staticmethod
+    def _mark_arrived(sent: list):
+        # Note: Status becomes 'arrived_at_destination' in DB or similar,
+        # Smart Contract status becomes ARRIVED.
+        # Final release requires Buyer to have the NFT.
+        db: Session = database.SessionLocal()
+        try:
+            for escrow_id, tx_hash_hex in sent:
+                escrow = db.get(models.PaymentEscrow, escrow_id)
+                escrow.status = "arrived"
+                escrow.tx_hash_release = tx_hash_hex # Re-using field for the oracle tx
+            db.commit()
+        finally:
+            db.close()
 
     def call_carrier_api_for_status(self, tracking_number: str) -> bool:
         """
@@ -106,27 +169,25 @@ class OracleService:
             return True
         return False
 
-    def confirm_delivery(self, tracking_number: str):
+    async def confirm_delivery(self, tracking_number: str):
         """
         Public method to be called by API when POD is uploaded.
         Triggers immediate blockchain settlement.
         """
         logger.info(f"Manual/API trigger for delivery confirmation: {tracking_number}")
-        
-        db: Session = database.SessionLocal()
+
         try:
-            escrow = db.query(models.PaymentEscrow).join(models.Shipment).filter(
-                models.Shipment.tracking_number == tracking_number,
-                models.PaymentEscrow.is_locked == True,
-                models.PaymentEscrow.status == "funded"
-            ).first()
+            await self.connect()
+            escrows = await run_in_threadpool(self._locked_escrows, tracking_number)
 
-            if escrow:
+            if escrows:
                 logger.info(f"Found funded escrow for {tracking_number}. Processing release...")
-                self.process_release(db, escrow, tracking_number)
+                await self.process_releases(escrows[:1])
             else:
                 logger.warning(f"No funded/locked escrow found for {tracking_number} to release.")
         except Exception as e:
             logger.error(f"Error in confirm_delivery for {tracking_number}: {e}")
-        finally:
-            db.close()
+
+
+# Shared by the poll loop and the POD endpoints so they draw nonces from one manager
+oracle = OracleService()
@@ -0,0 +1,104 @@
+"""
+Cached POD status counts for the review queue.
+
+`pod_status_counts` holds one row per (tenant, pod_status). A session
+`after_flush` hook applies the +1/-1 deltas of every ORM write that sets,
+changes or removes a shipment's pod_status, in the same transaction as the
+change, so the badge counts and list totals never have to count shipments.
+Paths that bypass the ORM call `apply_deltas` directly; `rebuild` recounts
+from scratch (used by the migration and to repair drift, e.g. after tenant
+cascade deletes).
+"""
+import uuid
+from collections import Counter
+
+from sqlalchemy import event, func, inspect, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from .. import models
+
+# Key for shipments without a tenant (primary key columns cannot be NULL)
+NO_TENANT = uuid.UUID(int=0)
+
+POD_STATUSES = ("submitted", "verified", "disputed")
+
+_APPLY_DELTAS = text("""
+    INSERT INTO pod_status_counts (tenant_id, pod_status, count)
+    SELECT * FROM unnest(CAST(:tenant_ids AS uuid[]), CAST(:statuses AS varchar[]), CAST(:deltas AS bigint[]))
+    ON CONFLICT (tenant_id, pod_status) DO UPDATE SET count = pod_status_counts.count + EXCLUDED.count
+""")
+
+_REBUILD = text(f"""
+    INSERT INTO pod_status_counts (tenant_id, pod_status, count)
+    SELECT COALESCE(tenant_id, '{NO_TENANT}'), pod_status, count(*)
+    FROM shipments
+    WHERE pod_status IS NOT NULL
+    GROUP BY 1, 2
+""")
+
+
+def collect_deltas(session: Session) -> Counter:
+    """Count changes per (tenant_id, pod_status) for shipments in the current flush."""
+    deltas = Counter()
+    for obj in session.new:
+        if isinstance(obj, models.Shipment) and obj.pod_status is not None:
+            deltas[(obj.tenant_id or NO_TENANT, obj.pod_status)] += 1
+
+    for obj in session.dirty:
+        if not isinstance(obj, models.Shipment):
+            continue
+        history = inspect(obj).attrs.pod_status.history
+        if not history.has_changes():
+            continue
+        tenant_id = obj.tenant_id or NO_TENANT
+        for old in history.deleted:
+            if old is not None:
+                deltas[(tenant_id, old)] -= 1
+        for new in history.added:
+            if new is not None:
+                deltas[(tenant_id, new)] += 1
+
+    for obj in session.deleted:
+        if isinstance(obj, models.Shipment) and obj.pod_status is not None:
+            deltas[(obj.tenant_id or NO_TENANT, obj.pod_status)] -= 1
+    return deltas
+
+
+def apply_deltas(conn: Connection, deltas: Counter) -> None:
+    """Add per-(tenant_id, pod_status) deltas to the cached counts in the caller's transaction."""
+    # Sorted so concurrent writers lock the count rows in the same order
+    items = sorted((key, delta) for key, delta in deltas.items() if delta)
+    if not items:
+        return
+    conn.execute(_APPLY_DELTAS, {
+        "tenant_ids": [str(tenant_id) for (tenant_id, _), _ in items],
+        "statuses": [status for (_, status), _ in items],
+        "deltas": [delta for _, delta in items],
+    })
+
+
+@event.listens_for(Session, "after_flush")
+def _record_pod_status_deltas(session: Session, flush_context):
+    deltas = collect_deltas(session)
+    if deltas:
+        apply_deltas(session.connection(), deltas)
+
+
+def status_counts(db: Session) -> dict:
+    """{pod_status: count} for every POD status, summed over visible tenants."""
+    rows = db.query(
+        models.PODStatusCount.pod_status, func.sum(models.PODStatusCount.count)
+    ).group_by(models.PODStatusCount.pod_status).all()
+    counts = dict.fromkeys(POD_STATUSES, 0)
+    counts.update({status: int(count) for status, count in rows})
+    return counts
+
+
+def rebuild(conn: Connection) -> None:
+    """Recount every tenant's PODs from the shipments table."""
+    # Waits for writers that already applied deltas and holds back new ones
+    # until the recount commits, so no change is counted twice or lost
+    conn.execute(text("LOCK TABLE pod_status_counts IN SHARE ROW EXCLUSIVE MODE"))
+    conn.execute(text("DELETE FROM pod_status_counts"))
+    conn.execute(_REBUILD)
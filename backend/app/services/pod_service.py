@@ -1,34 +1,55 @@
+import asyncio
 import logging
+import os
+import re
+from collections import Counter
 from datetime import datetime
 from typing import Optional
-from sqlalchemy.orm import Session
+from sqlalchemy import text
+from sqlalchemy.orm import Session, undefer, undefer_group
 from fastapi import HTTPException
 
 from .. import models
 from ..core.config import settings
-from ..core.storage import storage
+from ..core import receipts
+from ..core.images import render_photo
+from ..core.workers import get_process_pool
+from . import pod_facets, shipment_events
+from ..database import SessionLocal
+from ..core.storage import StagedFile, parse_data_url, storage
 
 logger = logging.getLogger(__name__)
 
 ALLOWED_MIME_TYPES = {"image/jpeg", "image/png", "image/webp"}
 
+_SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+
+BULK_VERIFY_MAX_ITEMS = 1000
+_VERIFY_ACTIONS = {"verify": "verified", "dispute": "disputed"}
+
+# Receipt PDFs being rendered, by cache path, so concurrent downloads share one render
+_receipts_in_flight: dict[str, asyncio.Future] = {}
+
+_BULK_VERIFY = text("""
+    UPDATE shipments AS s
+    SET pod_status = v.pod_status,
+        pod_notes = v.notes,
+        pod_verified_at = :now,
+        pod_verified_by = :verified_by
+    FROM unnest(CAST(:tracking_numbers AS varchar[]), CAST(:statuses AS varchar[]), CAST(:notes AS text[]))
+        AS v(tracking_number, pod_status, notes)
+    WHERE s.tracking_number = v.tracking_number AND s.pod_status = 'submitted'
+    RETURNING s.id, s.tenant_id, s.tracking_number, s.pod_status, s.pod_receiver_name,
+              s.current_status, s.latitude, s.longitude
+""")
+
 
 class PODService:
     """Business logic for POD operations."""
 
     @staticmethod
-    def upload_pod(
-        db: Session,
-        tracking_number: str,
-        signature: str,
-        latitude: float,
-        longitude: float,
-        accuracy: Optional[float],
-        receiver_name: str,
-        receiver_contact: Optional[str],
-        photo_contents: list[tuple[bytes, str]],  # [(content, content_type), ...]
-    ) -> dict:
-        """Process POD upload: validate, store files, update shipment."""
+    def check_submission(db: Session, tracking_number: str, content_types: list[str]) -> models.Shipment:
+        """Validate a POD submission before any file is read; returns the shipment."""
         # 1. Find shipment
         shipment = db.query(models.Shipment).filter(
             models.Shipment.tracking_number == tracking_number
@@ -43,40 +64,122 @@ class PODService:
                 detail="POD already submitted for this shipment"
             )
 
+        PODService.check_photos(content_types)
+        return shipment
+
+    @staticmethod
+    def check_photos(content_types: list[str]) -> None:
+        """Validate photo count and MIME types (also run per part while an upload streams in)."""
         # 3. Validate photo count
         max_photos = settings.POD_MAX_PHOTOS
-        if len(photo_contents) > max_photos:
+        if len(content_types) > max_photos:
             raise HTTPException(
                 status_code=400,
                 detail=f"Maximum {max_photos} photos allowed"
             )
 
         # 4. Validate MIME types
-        for i, (_, content_type) in enumerate(photo_contents):
+        for i, content_type in enumerate(content_types):
             if content_type not in ALLOWED_MIME_TYPES:
                 raise HTTPException(
                     status_code=400,
                     detail=f"Photo {i+1} has invalid type '{content_type}'. Allowed: JPEG, PNG, WebP"
                 )
 
-        # 5. Validate file sizes
+    @staticmethod
+    def create_upload_urls(db: Session, tracking_number: str, photos: list) -> dict:
+        """Presigned PUT URLs for uploading POD photos straight to object storage.
+
+        The driver app uploads each photo to its URL and then submits the POD
+        with the returned keys (photo_keys) instead of the file bytes.
+        """
+        if not storage.direct_uploads:
+            raise HTTPException(
+                status_code=501,
+                detail="Direct uploads are not supported by the configured storage backend"
+            )
+        PODService.check_submission(db, tracking_number, [p.content_type for p in photos])
+
         max_size = settings.POD_MAX_FILE_SIZE_MB * 1024 * 1024
-        for i, (content, _) in enumerate(photo_contents):
-            if len(content) > max_size:
+        for i, photo in enumerate(photos):
+            if not _SHA256_RE.match(photo.sha256):
+                raise HTTPException(status_code=400, detail=f"Photo {i+1} needs a hex SHA-256 digest")
+            if photo.size <= 0 or photo.size > max_size:
                 raise HTTPException(
                     status_code=413,
                     detail=f"Photo {i+1} exceeds {settings.POD_MAX_FILE_SIZE_MB}MB limit"
                 )
 
-        # 5. Save photos via storage
-        photo_urls = []
-        for i, (content, content_type) in enumerate(photo_contents):
-            url = storage.save_file(content, tracking_number, i, content_type)
-            photo_urls.append(url)
+        # Content that is already stored needs no upload
+        stored = dict(db.query(models.StorageObject.sha256, models.StorageObject.url).filter(
+            models.StorageObject.sha256.in_([p.sha256 for p in photos])
+        ).all())
+        uploads = []
+        for photo in photos:
+            if photo.sha256 in stored:
+                uploads.append({"key": storage.key_for(stored[photo.sha256]), "url": None, "headers": {}})
+            else:
+                uploads.append(storage.presign_upload(photo.sha256, photo.content_type, photo.size))
+        return {"uploads": uploads, "expires_in": settings.S3_PRESIGN_EXPIRES_SECONDS}
 
-        # 6. Update shipment
+    @staticmethod
+    def upload_pod(
+        db: Session,
+        tracking_number: str,
+        signature: str,
+        latitude: float,
+        longitude: float,
+        accuracy: Optional[float],
+        receiver_name: str,
+        receiver_contact: Optional[str],
+        photos: list[StagedFile],
+        photo_keys: list[str] = (),
+    ) -> dict:
+        """Process POD upload: validate, publish staged files, update shipment.
+
+        `photo_keys` reference photos the client already uploaded to object
+        storage (see create_upload_urls); they follow the uploaded files.
+        """
+        uploaded = []
+        for i, key in enumerate(photo_keys):
+            obj = storage.stat(key)
+            if obj is None:
+                raise HTTPException(status_code=400, detail=f"Photo {len(photos)+i+1} has not been uploaded")
+            uploaded.append(obj)
+        shipment = PODService.check_submission(
+            db, tracking_number, [p.content_type for p in photos] + [o.content_type for o in uploaded]
+        )
+
+        # 5. Validate file sizes (enforced while staging / by the presigned URL; re-checked here)
+        max_size = settings.POD_MAX_FILE_SIZE_MB * 1024 * 1024
+        for i, photo in enumerate([*photos, *uploaded]):
+            if photo.size > max_size:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"Photo {i+1} exceeds {settings.POD_MAX_FILE_SIZE_MB}MB limit"
+                )
+
+        # 6. Decode the signature once; only its blob reference goes on the row
+        try:
+            signature_content, signature_type = parse_data_url(signature)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid signature: {e}")
+        if signature_type not in ALLOWED_MIME_TYPES:
+            raise HTTPException(status_code=400, detail=f"Signature has invalid type '{signature_type}'")
+        if len(signature_content) > max_size:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Signature exceeds {settings.POD_MAX_FILE_SIZE_MB}MB limit"
+            )
+
+        # 7. Save signature and photos via storage
+        signature_url = storage.save_file(db, signature_content, signature_type)
+        photo_urls = [storage.publish(db, photo) for photo in photos]
+        photo_urls += [storage.attach(db, obj) for obj in uploaded]
+
+        # 8. Update shipment
         now = datetime.utcnow()
-        shipment.pod_signature = signature
+        shipment.pod_signature = signature_url
         shipment.pod_photos = photo_urls
         shipment.pod_location = {
             "lat": latitude,
@@ -92,9 +195,10 @@ class PODService:
         db.commit()
         db.refresh(shipment)
 
-        # 7. Audit log
+        # 9. Audit log
         try:
             log = models.AuditLog(
+                tenant_id=shipment.tenant_id,
                 entity_type="SHIPMENT",
                 entity_id=shipment.id,
                 action="POD_UPLOAD",
@@ -121,10 +225,70 @@ class PODService:
             "photo_count": len(photo_urls),
         }
 
+    @staticmethod
+    async def process_photos(tracking_number: str) -> None:
+        """Render thumbnail and WebP versions of a POD's photos in the process pool.
+
+        Scheduled as a background task after upload; the POD stays valid with
+        original photos only if processing fails.
+        """
+        photo_urls = await asyncio.to_thread(PODService._load_photo_urls, tracking_number)
+        if not photo_urls:
+            return
+
+        loop = asyncio.get_running_loop()
+        pool = get_process_pool()
+
+        async def render(url: str):
+            # Workers read from local disk; remote backends download a temp copy
+            path = await asyncio.to_thread(storage.local_copy, url)
+            try:
+                return await loop.run_in_executor(pool, render_photo, path)
+            finally:
+                storage.release_local_copy(path)
+
+        results = await asyncio.gather(*(render(url) for url in photo_urls), return_exceptions=True)
+        await asyncio.to_thread(PODService._save_renditions, tracking_number, photo_urls, results)
+
+    @staticmethod
+    def _load_photo_urls(tracking_number: str) -> list:
+        db = SessionLocal()
+        try:
+            return db.query(models.Shipment.pod_photos).filter(
+                models.Shipment.tracking_number == tracking_number
+            ).scalar() or []
+        finally:
+            db.close()
+
+    @staticmethod
+    def _save_renditions(tracking_number: str, photo_urls: list, results: list):
+        db = SessionLocal()
+        try:
+            meta = []
+            for url, result in zip(photo_urls, results):
+                if isinstance(result, Exception):
+                    logger.error(f"Failed to process POD photo {url}: {result}")
+                    meta.append({"original": url})
+                    continue
+                meta.append({
+                    "original": url,
+                    "thumbnail": storage.save_file(db, result["thumbnail"], "image/webp"),
+                    "web": storage.save_file(db, result["web"], "image/webp"),
+                    "width": result["width"],
+                    "height": result["height"],
+                })
+
+            db.query(models.Shipment).filter(
+                models.Shipment.tracking_number == tracking_number
+            ).update({models.Shipment.pod_photo_meta: meta}, synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
     @staticmethod
     def get_pod(db: Session, tracking_number: str) -> dict:
         """Retrieve POD details for a shipment."""
-        shipment = db.query(models.Shipment).filter(
+        shipment = db.query(models.Shipment).options(undefer_group("pod_media")).filter(
             models.Shipment.tracking_number == tracking_number
         ).first()
         if not shipment:
@@ -137,6 +301,7 @@ class PODService:
             "pod_status": shipment.pod_status,
             "pod_signature": shipment.pod_signature,
             "pod_photos": shipment.pod_photos or [],
+            "pod_photo_renditions": shipment.pod_photo_meta or [],
             "pod_location": shipment.pod_location,
             "pod_timestamp": shipment.pod_timestamp,
             "pod_receiver_name": shipment.pod_receiver_name,
@@ -183,10 +348,12 @@ class PODService:
 
         db.commit()
         db.refresh(shipment)
+        receipts.invalidate(tracking_number)
 
         # Audit log
         try:
             log = models.AuditLog(
+                tenant_id=shipment.tenant_id,
                 entity_type="SHIPMENT",
                 entity_id=shipment.id,
                 action=f"POD_{action.upper()}",
@@ -211,6 +378,112 @@ class PODService:
             "pod_notes": notes,
         }
 
+    @staticmethod
+    def bulk_verify(db: Session, items: list, verified_by: str = "admin") -> dict:
+        """Verify or dispute many POD submissions in one transaction.
+
+        Only PODs still 'submitted' transition (a single UPDATE ... RETURNING);
+        every other item is reported back with the reason instead of failing
+        the batch. Audit rows, history events and the cached status counts are
+        written in bulk alongside.
+        """
+        if len(items) > BULK_VERIFY_MAX_ITEMS:
+            raise HTTPException(status_code=400, detail=f"Maximum {BULK_VERIFY_MAX_ITEMS} items per request")
+
+        results = {}
+        batch = {}
+        for item in items:
+            if item.tracking_number in results or item.tracking_number in batch:
+                # Report a repeated tracking number once, next to the first occurrence
+                continue
+            if item.action not in _VERIFY_ACTIONS:
+                results[item.tracking_number] = {
+                    "error": "invalid_action", "detail": "Action must be 'verify' or 'dispute'",
+                }
+                continue
+            batch[item.tracking_number] = item
+
+        now = datetime.utcnow()
+        conn = db.connection()
+        updated = conn.execute(_BULK_VERIFY, {
+            "now": now,
+            "verified_by": verified_by,
+            "tracking_numbers": list(batch),
+            "statuses": [_VERIFY_ACTIONS[item.action] for item in batch.values()],
+            "notes": [item.notes for item in batch.values()],
+        }).all() if batch else []
+
+        deltas = Counter()
+        audit_rows, event_rows = [], []
+        for row in updated:
+            item = batch[row.tracking_number]
+            results[row.tracking_number] = {"pod_status": row.pod_status}
+            tenant_id = row.tenant_id or pod_facets.NO_TENANT
+            deltas[(tenant_id, "submitted")] -= 1
+            deltas[(tenant_id, row.pod_status)] += 1
+            audit_rows.append({
+                "tenant_id": row.tenant_id,
+                "entity_type": "SHIPMENT",
+                "entity_id": row.id,
+                "action": f"POD_{item.action.upper()}",
+                "new_value": {
+                    "tracking": row.tracking_number,
+                    "pod_status": row.pod_status,
+                    "notes": item.notes,
+                    "verified_by": verified_by,
+                },
+                "performed_by": verified_by,
+            })
+            event_rows.append(shipment_events.event_row(row, f"POD_{row.pod_status.upper()}", {
+                "from": "submitted",
+                "to": row.pod_status,
+                "receiver": row.pod_receiver_name,
+            }))
+
+        # Explain why the rest did not transition
+        missing = [tn for tn in batch if tn not in results]
+        if missing:
+            current = dict(db.query(models.Shipment.tracking_number, models.Shipment.pod_status).filter(
+                models.Shipment.tracking_number.in_(missing)
+            ).all())
+            for tn in missing:
+                if tn not in current:
+                    results[tn] = {"error": "not_found", "detail": "Shipment not found"}
+                elif current[tn] is None:
+                    results[tn] = {"error": "no_pod", "detail": "No POD submitted for this shipment"}
+                else:
+                    results[tn] = {
+                        "error": "conflict",
+                        "pod_status": current[tn],
+                        "detail": f"POD already {current[tn]}. Cannot modify after verification.",
+                    }
+
+        if audit_rows:
+            conn.execute(models.AuditLog.__table__.insert(), audit_rows)
+        pod_facets.apply_deltas(conn, deltas)
+        shipment_events.write_events(conn, event_rows)
+        db.commit()
+        for row in updated:
+            receipts.invalidate(row.tracking_number)
+
+        report = []
+        seen = set()
+        for item in items:
+            result = results[item.tracking_number]
+            if item.tracking_number in seen:
+                result = {"error": "duplicate", "detail": "Tracking number repeated in this request"}
+            seen.add(item.tracking_number)
+            report.append({"tracking_number": item.tracking_number, "ok": "error" not in result, **result})
+
+        statuses = Counter(row.pod_status for row in updated)
+        return {
+            "results": report,
+            "verified": statuses["verified"],
+            "disputed": statuses["disputed"],
+            "failed": sum(1 for r in report if not r["ok"]),
+            "pod_verified_at": now,
+        }
+
     @staticmethod
     def list_pods(
         db: Session,
@@ -218,15 +491,25 @@ class PODService:
         page: int = 1,
         limit: int = 20,
     ) -> dict:
-        """List shipments with POD data, with filtering and pagination."""
-        query = db.query(models.Shipment).filter(
+        """List shipments with POD data, with filtering and pagination.
+
+        Pages come off the partial POD queue indexes; totals and badge counts
+        come from the cached per-status counts instead of count(*).
+        """
+        query = db.query(models.Shipment).options(
+            undefer(models.Shipment.pod_photos), undefer(models.Shipment.pod_photo_meta)
+        ).filter(
             models.Shipment.pod_status.isnot(None)
         )
 
         if status_filter:
             query = query.filter(models.Shipment.pod_status == status_filter)
 
-        total = query.count()
+        status_counts = pod_facets.status_counts(db)
+        if status_filter:
+            total = status_counts.get(status_filter, 0)
+        else:
+            total = sum(status_counts.values())
         offset = (page - 1) * limit
         shipments = query.order_by(
             models.Shipment.pod_timestamp.desc()
@@ -243,12 +526,14 @@ class PODService:
                 "pod_timestamp": s.pod_timestamp,
                 "pod_receiver_name": s.pod_receiver_name,
                 "photo_count": photo_count,
+                "photo_thumbnails": [m["thumbnail"] for m in s.pod_photo_meta or [] if m.get("thumbnail")],
                 "current_status": s.current_status,
             })
 
         return {
             "items": items,
             "total": total,
+            "status_counts": status_counts,
             "page": page,
             "limit": limit,
         }
@@ -256,7 +541,7 @@ class PODService:
     @staticmethod
     def get_pod_receipt(db: Session, tracking_number: str) -> dict:
         """Public read-only POD receipt data."""
-        shipment = db.query(models.Shipment).filter(
+        shipment = db.query(models.Shipment).options(undefer_group("pod_media")).filter(
             models.Shipment.tracking_number == tracking_number
         ).first()
         if not shipment:
@@ -277,3 +562,67 @@ class PODService:
             "verified": shipment.pod_status == "verified",
             "verified_at": shipment.pod_verified_at,
         }
+
+    @staticmethod
+    def get_receipt_source(db: Session, tracking_number: str) -> dict:
+        """Receipt fields plus the signature and photo URLs to render into the PDF."""
+        receipt = PODService.get_pod_receipt(db, tracking_number)
+        shipment = db.query(models.Shipment).options(undefer_group("pod_media")).filter(
+            models.Shipment.tracking_number == tracking_number
+        ).one()
+        renditions = {m["original"]: m for m in shipment.pod_photo_meta or []}
+        receipt["signature_url"] = shipment.pod_signature
+        # Thumbnails keep the PDF small; originals until they are rendered
+        receipt["photo_urls"] = [
+            renditions.get(url, {}).get("thumbnail") or url for url in shipment.pod_photos or []
+        ]
+        return receipt
+
+    @staticmethod
+    async def render_receipt_pdf(source: dict) -> str:
+        """Path of the cached PDF receipt, rendering it in the process pool on a miss."""
+        path = receipts.cache_path(source["tracking_number"], source["verified_at"])
+        if not os.path.exists(path):
+            future = _receipts_in_flight.get(path)
+            if future is None:
+                future = asyncio.ensure_future(PODService._render_receipt(source))
+                _receipts_in_flight[path] = future
+                future.add_done_callback(lambda _: _receipts_in_flight.pop(path, None))
+            await asyncio.shield(future)
+        return path
+
+    @staticmethod
+    async def _render_receipt(source: dict) -> None:
+        # Signatures saved before object storage are inline data: URLs, not objects
+        signature, inline_signature = source["signature_url"], None
+        if signature and signature.startswith("data:"):
+            try:
+                inline_signature, _ = parse_data_url(signature)
+            except ValueError:
+                pass
+            signature = None
+
+        # Workers read from local disk; remote backends download temp copies.
+        # An image that cannot be fetched is left out rather than failing the receipt.
+        urls = ([signature] if signature else []) + source["photo_urls"]
+        copies = await asyncio.gather(
+            *(asyncio.to_thread(storage.local_copy, url) for url in urls), return_exceptions=True
+        )
+        paths = []
+        for url, copy in zip(urls, copies):
+            if isinstance(copy, BaseException):
+                logger.warning(f"Receipt image {url} unavailable: {copy}")
+                copy = None
+            paths.append(copy)
+        try:
+            data = {k: v for k, v in source.items() if k not in ("signature_url", "photo_urls")}
+            signature_image = paths[0] if signature else inline_signature
+            photo_paths = [path for path in (paths[1:] if signature else paths) if path]
+            content = await asyncio.get_running_loop().run_in_executor(
+                get_process_pool(), receipts.render_receipt, data, signature_image, photo_paths
+            )
+            await asyncio.to_thread(receipts.store, source["tracking_number"], source["verified_at"], content)
+        finally:
+            for path in paths:
+                if path:
+                    storage.release_local_copy(path)
@@ -0,0 +1,308 @@
+"""
+Batch POD sync for offline-first driver apps.
+
+A driver app queues PODs while offline and syncs them in one multipart
+request: a JSON `manifest` of items, each with a client-generated
+idempotency key, plus the photo file parts the items refer to by name. The
+manifest comes first, so the batch is prepared as soon as it is read.
+
+Keys are scoped to the tenant of the item's shipment and claimed in
+`pod_sync_keys` with a single statement before any file part is read; only
+the parts of newly claimed items are staged, the rest are skipped unread.
+A key that already completed for the same shipment is answered from its
+stored result (`replayed`), so a retry after a lost response never saves
+photos again or trips the 409 "already submitted" path; a key reused for a
+different shipment is rejected with 422. New items are then processed
+concurrently, each in its own thread and DB session, and their outcome
+stored under the key. Server errors release the claim so the item can be
+retried. Completed keys are kept for POD_SYNC_KEY_TTL_HOURS, after which they
+are purged and may be claimed again.
+"""
+import asyncio
+import json
+import logging
+from dataclasses import dataclass, field
+from typing import Optional
+
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import text, tuple_
+
+from .. import models, schemas
+from ..core.config import settings
+from ..core.storage import StagedFile
+from ..database import SessionLocal, engine
+from .pod_facets import NO_TENANT
+from .pod_service import PODService
+
+logger = logging.getLogger(__name__)
+
+# A claim older than this is taken to belong to a crashed request
+STALE_CLAIM_MINUTES = 15
+PURGE_INTERVAL_SECONDS = 3600
+
+_SHIPMENT_TENANTS = text("""
+    SELECT tracking_number, tenant_id FROM shipments
+    WHERE tracking_number = ANY(CAST(:tracking_numbers AS varchar[]))
+""")
+
+# A stale claim is only retaken for the shipment it was made for; an expired
+# result frees the key for any shipment
+_CLAIM_KEYS = text(f"""
+    INSERT INTO pod_sync_keys (tenant_id, idempotency_key, tracking_number, status)
+    SELECT v.tenant_id, v.idempotency_key, v.tracking_number, 'processing'
+    FROM unnest(
+        CAST(:tenant_ids AS uuid[]), CAST(:keys AS varchar[]), CAST(:tracking_numbers AS varchar[])
+    ) AS v(tenant_id, idempotency_key, tracking_number)
+    ON CONFLICT (tenant_id, idempotency_key) DO UPDATE
+        SET tracking_number = EXCLUDED.tracking_number, status = 'processing', status_code = NULL,
+            response = NULL, created_at = NOW(), completed_at = NULL
+        WHERE (pod_sync_keys.status = 'processing'
+               AND pod_sync_keys.tracking_number = EXCLUDED.tracking_number
+               AND pod_sync_keys.created_at < NOW() - INTERVAL '{STALE_CLAIM_MINUTES} minutes')
+           OR (pod_sync_keys.status = 'done'
+               AND pod_sync_keys.completed_at < NOW() - make_interval(hours => :ttl_hours))
+    RETURNING idempotency_key
+""")
+
+_FINISH_KEY = text("""
+    UPDATE pod_sync_keys
+    SET status = 'done', status_code = :status_code, response = CAST(:response AS jsonb), completed_at = NOW()
+    WHERE tenant_id = :tenant_id AND idempotency_key = :key
+""")
+
+_RELEASE_KEY = text("""
+    DELETE FROM pod_sync_keys WHERE tenant_id = :tenant_id AND idempotency_key = :key AND status = 'processing'
+""")
+
+_PURGE_KEYS = text("""
+    DELETE FROM pod_sync_keys
+    WHERE status = 'done' AND completed_at < NOW() - make_interval(hours => :ttl_hours)
+""")
+
+
+@dataclass
+class SyncBatch:
+    """A manifest whose new keys are claimed, waiting for their photo parts."""
+    items: list
+    results: dict = field(default_factory=dict)  # idempotency key -> result
+    tenants: dict = field(default_factory=dict)  # tracking number -> tenant id
+    pending: list = field(default_factory=list)  # claimed items, to be processed
+
+    @property
+    def parts(self) -> set[str]:
+        """Names of the file parts the pending items need."""
+        return {name for item in self.pending for name in item.photos}
+
+
+class PODSyncService:
+    """Idempotent, concurrent processing of a batch of queued PODs."""
+
+    @staticmethod
+    def claim(items: list) -> tuple[dict, set, dict]:
+        """Claim new keys under their shipment's tenant.
+
+        Returns ({tracking number: tenant id} for the shipments that exist,
+        claimed keys, {key: PODSyncKey} for the other items' existing keys).
+        """
+        with engine.begin() as conn:
+            tenants = {
+                row.tracking_number: row.tenant_id or NO_TENANT
+                for row in conn.execute(_SHIPMENT_TENANTS, {
+                    "tracking_numbers": list({item.tracking_number for item in items}),
+                })
+            }
+            items = [item for item in items if item.tracking_number in tenants]
+            claimed = set(conn.execute(_CLAIM_KEYS, {
+                "tenant_ids": [str(tenants[item.tracking_number]) for item in items],
+                "keys": [item.idempotency_key for item in items],
+                "tracking_numbers": [item.tracking_number for item in items],
+                "ttl_hours": settings.POD_SYNC_KEY_TTL_HOURS,
+            }).scalars()) if items else set()
+        others = [
+            (tenants[item.tracking_number], item.idempotency_key)
+            for item in items if item.idempotency_key not in claimed
+        ]
+        existing = {}
+        if others:
+            db = SessionLocal()
+            try:
+                existing = {
+                    row.idempotency_key: row
+                    for row in db.query(models.PODSyncKey).filter(
+                        tuple_(models.PODSyncKey.tenant_id, models.PODSyncKey.idempotency_key).in_(others)
+                    )
+                }
+            finally:
+                db.close()
+        return tenants, claimed, existing
+
+    @staticmethod
+    def finish(tenant_id, key: str, status_code: int, body: dict) -> None:
+        if status_code >= 500:
+            return PODSyncService.release(tenant_id, key)
+        with engine.begin() as conn:
+            conn.execute(_FINISH_KEY, {
+                "tenant_id": tenant_id, "key": key, "status_code": status_code, "response": json.dumps(body),
+            })
+
+    @staticmethod
+    def release(tenant_id, key: str) -> None:
+        """Drop an unfinished claim so the item can be sent again."""
+        with engine.begin() as conn:
+            conn.execute(_RELEASE_KEY, {"tenant_id": tenant_id, "key": key})
+
+    @staticmethod
+    def purge_expired() -> int:
+        """Delete completed keys older than POD_SYNC_KEY_TTL_HOURS."""
+        with engine.begin() as conn:
+            return conn.execute(_PURGE_KEYS, {"ttl_hours": settings.POD_SYNC_KEY_TTL_HOURS}).rowcount
+
+    @staticmethod
+    async def start():
+        """Purge expired keys periodically for the lifetime of the worker."""
+        while True:
+            try:
+                purged = await asyncio.to_thread(PODSyncService.purge_expired)
+                if purged:
+                    logger.info(f"Purged {purged} expired POD sync keys")
+            except Exception as e:
+                logger.error(f"POD sync key purge failed: {e}")
+            await asyncio.sleep(PURGE_INTERVAL_SECONDS)
+
+    @staticmethod
+    def submit(item: schemas.PODSyncItem, photos: list[StagedFile]) -> tuple[int, dict]:
+        """Run one POD through the regular upload path (blocking; run in a thread)."""
+        db = SessionLocal()
+        try:
+            PODService.check_submission(db, item.tracking_number, [photo.content_type for photo in photos])
+            result = PODService.upload_pod(
+                db=db,
+                tracking_number=item.tracking_number,
+                signature=item.signature,
+                latitude=item.latitude,
+                longitude=item.longitude,
+                accuracy=item.accuracy,
+                receiver_name=item.receiver_name,
+                receiver_contact=item.receiver_contact,
+                photos=photos,
+                photo_keys=item.photo_keys,
+            )
+            return 200, jsonable_encoder(result)
+        except HTTPException as e:
+            return e.status_code, {"detail": e.detail}
+        except Exception:
+            logger.exception(f"POD sync failed for {item.tracking_number}")
+            return 500, {"detail": "Internal error"}
+        finally:
+            db.close()
+
+    @staticmethod
+    async def prepare(items: list) -> SyncBatch:
+        """Claim the manifest's new keys and answer every other item.
+
+        Replays, keys reused for another shipment and unknown shipments are
+        settled here, before any photo part is read.
+        """
+        batch = SyncBatch(items)
+        unique, seen, used_parts = [], set(), set()
+        for item in items:
+            if item.idempotency_key in seen:
+                continue
+            seen.add(item.idempotency_key)
+            # A file part is read once, so each may belong to one photo of one item
+            shared = sorted({name for name in item.photos if name in used_parts or item.photos.count(name) > 1})
+            if shared:
+                batch.results[item.idempotency_key] = PODSyncService._result(
+                    item, 400, {"detail": f"Photo parts referenced more than once: {', '.join(shared)}"}
+                )
+                continue
+            used_parts.update(item.photos)
+            unique.append(item)
+
+        tenants, claimed, existing = (
+            await run_in_threadpool(PODSyncService.claim, unique) if unique else ({}, set(), {})
+        )
+        batch.tenants = tenants
+        for item in unique:
+            if item.idempotency_key in claimed:
+                batch.pending.append(item)
+                continue
+            row: Optional[models.PODSyncKey] = existing.get(item.idempotency_key)
+            if item.tracking_number not in tenants:
+                result = PODSyncService._result(item, 404, {"detail": "Shipment not found"})
+            elif row is not None and row.tracking_number != item.tracking_number:
+                result = PODSyncService._result(
+                    item, 422, {"detail": "Idempotency key was already used for a different shipment"}
+                )
+            elif row is not None and row.status == "done":
+                result = PODSyncService._result(item, row.status_code, row.response, replayed=True)
+            else:
+                result = PODSyncService._result(
+                    item, 409, {"detail": "This POD is being processed by another request"}
+                )
+            batch.results[item.idempotency_key] = result
+        return batch
+
+    @staticmethod
+    async def abandon(batch: SyncBatch) -> None:
+        """Release the batch's claims when the request fails before they are processed."""
+        await asyncio.gather(*(
+            run_in_threadpool(PODSyncService.release, batch.tenants[item.tracking_number], item.idempotency_key)
+            for item in batch.pending
+        ))
+
+    @staticmethod
+    async def run(batch: SyncBatch, files: dict[str, StagedFile]) -> list[dict]:
+        """Process the claimed items; returns one result per manifest item, in order."""
+        results = batch.results
+        ready = []
+        for item in batch.pending:
+            missing = [name for name in item.photos if name not in files]
+            if not missing:
+                ready.append(item)
+                continue
+            # Not a result of the POD itself: the key stays free for a complete retry
+            await run_in_threadpool(
+                PODSyncService.release, batch.tenants[item.tracking_number], item.idempotency_key
+            )
+            results[item.idempotency_key] = PODSyncService._result(
+                item, 400, {"detail": f"Missing photo parts: {', '.join(missing)}"}
+            )
+
+        semaphore = asyncio.Semaphore(settings.POD_SYNC_CONCURRENCY)
+
+        async def process(item):
+            async with semaphore:
+                status_code, body = await run_in_threadpool(
+                    PODSyncService.submit, item, [files[name] for name in item.photos]
+                )
+                await run_in_threadpool(
+                    PODSyncService.finish, batch.tenants[item.tracking_number], item.idempotency_key,
+                    status_code, body,
+                )
+            results[item.idempotency_key] = PODSyncService._result(item, status_code, body)
+
+        await asyncio.gather(*(process(item) for item in ready))
+
+        report, reported = [], set()
+        for item in batch.items:
+            if item.idempotency_key in reported:
+                report.append(PODSyncService._result(
+                    item, 400, {"detail": "Idempotency key repeated in this request"}
+                ))
+                continue
+            reported.add(item.idempotency_key)
+            report.append(results[item.idempotency_key])
+        return report
+
+    @staticmethod
+    def _result(item, status_code: int, body: dict, replayed: bool = False) -> dict:
+        return {
+            "idempotency_key": item.idempotency_key,
+            "tracking_number": item.tracking_number,
+            "status_code": status_code,
+            "replayed": replayed,
+            "body": body,
+        }
@@ -0,0 +1,225 @@
+"""
+Append-only shipment history.
+
+A session `after_flush` hook turns every ORM write that creates a shipment or
+changes its status, position or POD state into rows in the month-partitioned
+`shipment_events` table, inside the same transaction as the change itself.
+Paths that bypass the ORM (bulk Core updates) call `write_events` directly.
+
+Every written event is also published with `pg_notify` on EVENTS_CHANNEL, so
+the notification is delivered to listeners exactly when the change commits
+(see services/live_updates.py).
+"""
+import asyncio
+import json
+import logging
+from datetime import date, datetime, timezone
+from typing import Iterator, Optional
+
+from sqlalchemy import event, inspect, select, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from .. import models
+from ..database import SessionLocal, engine
+
+logger = logging.getLogger(__name__)
+
+# How many future monthly partitions to keep created ahead of time
+PARTITION_MONTHS_AHEAD = 3
+PARTITION_CHECK_INTERVAL_SECONDS = 6 * 3600
+TIMELINE_BATCH_SIZE = 500
+
+EVENTS_CHANNEL = "shipment_events"
+# Columns of a shipment row needed to build an event without loading the ORM object
+_SHIPMENT_EVENT_COLUMNS = (
+    models.Shipment.id,
+    models.Shipment.tracking_number,
+    models.Shipment.tenant_id,
+    models.Shipment.current_status,
+    models.Shipment.latitude,
+    models.Shipment.longitude,
+)
+
+
+def event_row(shipment, event_type: str, payload: Optional[dict] = None) -> dict:
+    """Build an event row from a Shipment (or a row of _SHIPMENT_EVENT_COLUMNS)."""
+    return {
+        "tracking_number": shipment.tracking_number,
+        "occurred_at": datetime.now(timezone.utc),
+        "shipment_id": shipment.id,
+        "tenant_id": shipment.tenant_id,
+        "event_type": event_type,
+        "status": shipment.current_status,
+        "latitude": shipment.latitude,
+        "longitude": shipment.longitude,
+        "payload": payload,
+    }
+
+
+def _changes(state, attr: str):
+    history = state.attrs[attr].history
+    if not history.has_changes():
+        return None
+    old = history.deleted[0] if history.deleted else None
+    new = history.added[0] if history.added else None
+    if old == new:
+        return None
+    return old, new
+
+
+def collect_events(session: Session) -> list[dict]:
+    """Build event rows for shipments created or changed in the current flush."""
+    rows = []
+    for obj in session.new:
+        if isinstance(obj, models.Shipment):
+            rows.append(event_row(obj, "CREATED", {"tracking": obj.tracking_number}))
+
+    for obj in session.dirty:
+        if not isinstance(obj, models.Shipment):
+            continue
+        state = inspect(obj)
+
+        status = _changes(state, "current_status")
+        if status:
+            rows.append(event_row(obj, "STATUS_CHANGED", {"from": status[0], "to": status[1]}))
+
+        if _changes(state, "latitude") or _changes(state, "longitude"):
+            rows.append(event_row(obj, "POSITION_UPDATED"))
+
+        pod = _changes(state, "pod_status")
+        if pod and pod[1]:
+            rows.append(event_row(obj, f"POD_{pod[1].upper()}", {
+                "from": pod[0],
+                "to": pod[1],
+                "receiver": obj.pod_receiver_name,
+            }))
+
+    # Escrow transitions (funding, release, dispute, refund) land on the shipment timeline too
+    escrow_changes = {}
+    for obj in session.dirty:
+        if isinstance(obj, models.PaymentEscrow):
+            status = _changes(inspect(obj), "status")
+            if status and status[1]:
+                escrow_changes[obj.shipment_id] = (obj, status)
+    if escrow_changes:
+        shipments = session.connection().execute(
+            select(*_SHIPMENT_EVENT_COLUMNS).where(models.Shipment.id.in_(list(escrow_changes)))
+        ).all()
+        for shipment in shipments:
+            escrow, (old, new) = escrow_changes[shipment.id]
+            rows.append(event_row(shipment, f"ESCROW_{new.upper()}", {
+                "from": old,
+                "to": new,
+                "escrow_id": str(escrow.id),
+            }))
+    return rows
+
+
+def _notification(row: dict) -> str:
+    # NOTIFY payloads are capped at 8000 bytes, so only routing fields are sent
+    return json.dumps({
+        "shipment_id": str(row["shipment_id"]),
+        "tracking_number": row["tracking_number"],
+        "tenant_id": str(row["tenant_id"]) if row["tenant_id"] else None,
+        "event_type": row["event_type"],
+        "status": row["status"],
+        "occurred_at": row["occurred_at"].isoformat(),
+    })
+
+
+def write_events(conn: Connection, rows: list[dict]) -> None:
+    """Insert event rows and queue their notifications in the caller's transaction."""
+    if not rows:
+        return
+    conn.execute(
+        models.ShipmentEvent.__table__.insert(),
+        [{k: v for k, v in row.items() if k != "tracking_number"} for row in rows],
+    )
+    conn.execute(
+        text("SELECT pg_notify(:channel, payload) FROM unnest(CAST(:payloads AS text[])) AS payload"),
+        {"channel": EVENTS_CHANNEL, "payloads": [_notification(row) for row in rows]},
+    )
+
+
+@event.listens_for(Session, "after_flush")
+def _record_shipment_events(session: Session, flush_context):
+    rows = collect_events(session)
+    if rows:
+        write_events(session.connection(), rows)
+
+
+def _add_months(d: date, months: int) -> date:
+    month = d.month - 1 + months
+    return date(d.year + month // 12, month % 12 + 1, 1)
+
+
+def ensure_partitions(months_ahead: int = PARTITION_MONTHS_AHEAD) -> None:
+    """Create monthly shipment_events partitions for this month and the next few.
+
+    Rows that landed in the default partition for a month (before its
+    partition existed) are moved into the new partition; Postgres refuses to
+    create a partition whose range the default partition already holds rows for.
+    """
+    start = date.today().replace(day=1)
+    with engine.begin() as conn:
+        # Workers run this concurrently; one creates, the others find it done
+        conn.execute(text("SELECT pg_advisory_xact_lock(hashtext('shipment_events_partitions'))"))
+        has_default = conn.execute(text("SELECT to_regclass('shipment_events_default')")).scalar()
+        for i in range(months_ahead + 1):
+            lo = _add_months(start, i)
+            hi = _add_months(start, i + 1)
+            name = f"shipment_events_y{lo.year}m{lo.month:02d}"
+            exists = conn.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar()
+            if exists:
+                continue
+            bounds = {"lo": lo, "hi": hi}
+            moved = 0
+            if has_default:
+                conn.execute(text("LOCK TABLE shipment_events_default IN ACCESS EXCLUSIVE MODE"))
+                conn.execute(text("""
+                    CREATE TEMP TABLE shipment_events_moved ON COMMIT DROP AS
+                    SELECT * FROM shipment_events_default WHERE occurred_at >= :lo AND occurred_at < :hi
+                """), bounds)
+                moved = conn.execute(text(
+                    "DELETE FROM shipment_events_default WHERE occurred_at >= :lo AND occurred_at < :hi"
+                ), bounds).rowcount
+            conn.execute(text(
+                f"CREATE TABLE {name} PARTITION OF shipment_events "
+                f"FOR VALUES FROM ('{lo.isoformat()}') TO ('{hi.isoformat()}')"
+            ))
+            if has_default:
+                conn.execute(text("INSERT INTO shipment_events SELECT * FROM shipment_events_moved"))
+                conn.execute(text("DROP TABLE shipment_events_moved"))
+            logger.info("Created partition %s (%d rows moved from the default partition)", name, moved)
+
+
+async def maintain_partitions() -> None:
+    """Keep upcoming partitions created for the lifetime of the worker."""
+    while True:
+        try:
+            await asyncio.to_thread(ensure_partitions)
+        except Exception:
+            logger.exception("Failed to create shipment_events partitions")
+        await asyncio.sleep(PARTITION_CHECK_INTERVAL_SECONDS)
+
+
+def iter_timeline(shipment_id, since: Optional[datetime] = None) -> Iterator[models.ShipmentEvent]:
+    """Stream a shipment's events oldest-first with a server-side cursor.
+
+    Opens its own session because the response body is produced after the
+    request-scoped session has been closed.
+    """
+    db = SessionLocal()
+    try:
+        query = (
+            db.query(models.ShipmentEvent)
+            .filter(models.ShipmentEvent.shipment_id == shipment_id)
+            .order_by(models.ShipmentEvent.occurred_at, models.ShipmentEvent.id)
+            .execution_options(stream_results=True)
+        )
+        if since is not None:
+            query = query.filter(models.ShipmentEvent.occurred_at > since)
+        yield from query.yield_per(TIMELINE_BATCH_SIZE)
+    finally:
+        db.close()
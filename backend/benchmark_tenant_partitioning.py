@@ -0,0 +1,137 @@
+"""
+Per-tenant query latency with skewed (Zipf-distributed) tenant sizes.
+
+Run once on the regular layout, then switch layouts and run again against the
+same data to compare:
+    python benchmark_tenant_partitioning.py --seed
+    alembic downgrade 5a8c2e7f1d39
+    alembic -x tenant_partitioning=on upgrade head
+    python benchmark_tenant_partitioning.py
+    python benchmark_tenant_partitioning.py --cleanup
+"""
+import argparse
+import time
+
+import numpy as np
+from sqlalchemy import text
+
+from app.database import engine
+
+TENANT_PREFIX = "bench-"
+
+QUERIES = {
+    "recent": text("""
+        SELECT id, tracking_number, current_status
+        FROM shipments WHERE tenant_id = :tenant_id
+        ORDER BY created_at DESC LIMIT 50
+    """),
+    "status_counts": text("""
+        SELECT current_status, count(*)
+        FROM shipments WHERE tenant_id = :tenant_id
+        GROUP BY current_status
+    """),
+    "in_transit": text("""
+        SELECT count(*)
+        FROM shipments WHERE tenant_id = :tenant_id AND current_status = 'IN_TRANSIT'
+    """),
+}
+
+SEED_SHIPMENTS = text("""
+    INSERT INTO shipments (tenant_id, tracking_number, origin, destination, current_status, created_at)
+    SELECT :tenant_id,
+           :prefix || g,
+           (ARRAY['KRPUS', 'CNSHA', 'SGSIN', 'NLRTM'])[1 + (g % 4)],
+           (ARRAY['USLAX', 'DEHAM', 'USNYC'])[1 + (g % 3)],
+           (ARRAY['BOOKED', 'IN_TRANSIT', 'IN_TRANSIT', 'ARRIVED', 'Delivered'])[1 + (g % 5)],
+           NOW() - (g % 365) * INTERVAL '1 day'
+    FROM generate_series(1, :count) AS g
+""")
+
+
+def tenant_sizes(tenants: int, shipments: int, skew: float) -> list[int]:
+    """Split `shipments` across tenants with Zipf weights 1/rank^skew."""
+    weights = 1.0 / np.arange(1, tenants + 1) ** skew
+    sizes = np.floor(weights / weights.sum() * shipments).astype(int)
+    return np.maximum(sizes, 1).tolist()
+
+
+def seed(tenants: int, shipments: int, skew: float) -> None:
+    sizes = tenant_sizes(tenants, shipments, skew)
+    for rank, size in enumerate(sizes):
+        with engine.begin() as conn:
+            tenant_id = conn.execute(
+                text("INSERT INTO tenants (name, subdomain) VALUES (:name, :sub) RETURNING id"),
+                {"name": f"Benchmark tenant {rank}", "sub": f"{TENANT_PREFIX}{rank:03d}"},
+            ).scalar()
+            conn.execute(SEED_SHIPMENTS, {
+                "tenant_id": tenant_id,
+                "prefix": f"BENCH{rank:03d}-",
+                "count": size,
+            })
+        print(f"  ...tenant {rank}: {size} shipments")
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE shipments"))
+
+
+def cleanup() -> None:
+    with engine.begin() as conn:
+        # Shipments go with their tenant (ON DELETE CASCADE)
+        deleted = conn.execute(
+            text("DELETE FROM tenants WHERE subdomain LIKE :p"), {"p": f"{TENANT_PREFIX}%"}
+        ).rowcount
+    print(f"Removed {deleted} benchmark tenants")
+
+
+def layout() -> str:
+    with engine.connect() as conn:
+        kind = conn.execute(text("SELECT relkind FROM pg_class WHERE oid = 'shipments'::regclass")).scalar()
+    return "hash-partitioned by tenant_id" if kind == "p" else "single heap"
+
+
+def run(repeat: int) -> None:
+    with engine.connect() as conn:
+        tenants = conn.execute(text("""
+            SELECT t.id, count(s.id) AS shipments
+            FROM tenants t JOIN shipments s ON s.tenant_id = t.id
+            WHERE t.subdomain LIKE :p
+            GROUP BY t.id ORDER BY shipments DESC
+        """), {"p": f"{TENANT_PREFIX}%"}).all()
+        if not tenants:
+            raise SystemExit("No benchmark tenants found; run with --seed first")
+
+        # Largest tenant, a mid-sized one and the smallest
+        picks = {"largest": tenants[0], "median": tenants[len(tenants) // 2], "smallest": tenants[-1]}
+
+        print(f"Layout: {layout()}, {len(tenants)} tenants, {sum(t.shipments for t in tenants)} shipments")
+        print(f"{'tenant':<10}{'rows':>9}  {'query':<15}{'p50 ms':>9}{'p95 ms':>9}")
+        for label, tenant in picks.items():
+            for name, query in QUERIES.items():
+                params = {"tenant_id": tenant.id}
+                conn.execute(query, params).all()  # warm the cache
+                timings = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    conn.execute(query, params).all()
+                    timings.append((time.perf_counter() - start) * 1000)
+                p50, p95 = np.percentile(timings, [50, 95])
+                print(f"{label:<10}{tenant.shipments:>9}  {name:<15}{p50:>9.2f}{p95:>9.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--seed", action="store_true", help="create benchmark tenants and shipments first")
+    parser.add_argument("--cleanup", action="store_true", help="remove benchmark tenants and exit")
+    parser.add_argument("--tenants", type=int, default=50)
+    parser.add_argument("--shipments", type=int, default=500000)
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent for tenant sizes")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    if args.cleanup:
+        cleanup()
+    else:
+        if args.seed:
+            start = time.perf_counter()
+            seed(args.tenants, args.shipments, args.skew)
+            print(f"Seeded in {time.perf_counter() - start:.1f}s")
+        run(args.repeat)
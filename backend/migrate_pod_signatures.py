@@ -0,0 +1,80 @@
+"""
+Move inline base64 POD signatures out of the shipments table into the blob store.
+
+Rows are read in small keyset batches through a server-side cursor, so only
+one batch of signatures is held in memory at a time. Safe to re-run: rows
+that already hold a blob URL are skipped.
+    python migrate_pod_signatures.py [--batch-size 200]
+"""
+import argparse
+import hashlib
+import time
+
+from sqlalchemy import text
+
+from app.core.storage import parse_data_url, storage
+from app.database import engine
+
+SELECT_BATCH = text("""
+    SELECT id, pod_signature
+    FROM shipments
+    WHERE pod_signature LIKE 'data:%'
+      AND (CAST(:last_id AS uuid) IS NULL OR id > CAST(:last_id AS uuid))
+    ORDER BY id
+    LIMIT :limit
+""")
+
+# Guarded on the old value so a concurrent upload is never overwritten
+UPDATE_BATCH = text("""
+    UPDATE shipments AS s
+    SET pod_signature = v.url
+    FROM unnest(CAST(:ids AS uuid[]), CAST(:urls AS text[]), CAST(:hashes AS text[]))
+        AS v(id, url, old_md5)
+    WHERE s.id = v.id AND md5(s.pod_signature) = v.old_md5
+""")
+
+
+def migrate_all(batch_size: int = 200) -> tuple[int, int, int]:
+    """Returns (scanned, moved, skipped_invalid)."""
+    scanned = moved = invalid = 0
+    last_id = None
+    while True:
+        ids, blobs, hashes = [], [], []
+        count = 0
+        with engine.connect() as conn:
+            result = conn.execution_options(stream_results=True).execute(
+                SELECT_BATCH, {"last_id": last_id, "limit": batch_size}
+            )
+            for row_id, signature in result:
+                count += 1
+                last_id = str(row_id)
+                try:
+                    content, content_type = parse_data_url(signature)
+                except ValueError as e:
+                    invalid += 1
+                    print(f"  skipping {row_id}: {e}")
+                    continue
+                ids.append(last_id)
+                blobs.append((content, content_type))
+                hashes.append(hashlib.md5(signature.encode()).hexdigest())
+        if count == 0:
+            break
+        if ids:
+            with engine.begin() as conn:
+                # References are counted in the same transaction as the update;
+                # a row skipped by the guard only over-counts (never frees) its blob
+                urls = [storage.save_file(conn, content, content_type) for content, content_type in blobs]
+                moved += conn.execute(UPDATE_BATCH, {"ids": ids, "urls": urls, "hashes": hashes}).rowcount
+        scanned += count
+        print(f"  ...{scanned} scanned, {moved} moved")
+    return scanned, moved, invalid
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=200)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    scanned, moved, invalid = migrate_all(args.batch_size)
+    print(f"Moved {moved} of {scanned} signatures ({invalid} invalid) in {time.perf_counter() - start:.1f}s")
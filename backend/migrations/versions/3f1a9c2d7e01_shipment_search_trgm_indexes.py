@@ -0,0 +1,36 @@
+"""shipment search trigram indexes
+
+Revision ID: 3f1a9c2d7e01
+Revises: 
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1a9c2d7e01'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SEARCH_COLUMNS = ("tracking_number", "container_number", "vessel_name", "origin", "destination")
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # CONCURRENTLY keeps the shipments table writable while the indexes build
+    with op.get_context().autocommit_block():
+        for col in SEARCH_COLUMNS:
+            op.execute(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_shipments_{col}_trgm "
+                f"ON shipments USING gin ({col} gin_trgm_ops)"
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for col in SEARCH_COLUMNS:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS ix_shipments_{col}_trgm")
@@ -0,0 +1,290 @@
+"""hash-partition shipments and audit_logs by tenant_id (opt-in)
+
+A no-op unless asked for, so `alembic upgrade head` keeps the plain layout:
+
+    alembic -x tenant_partitioning=on upgrade head
+
+(or TENANT_PARTITIONING=on in the environment). The flag only matters when
+this revision is applied; to switch an existing database, downgrade to
+5a8c2e7f1d39 and upgrade again with the flag. Downgrading this revision
+restores the plain layout if the upgrade partitioned the tables.
+
+The layout is recorded in `schema_settings` under 'tenant_partitioning'
+('hash' or 'off'). Revisions after this one must work on both layouts or
+check it: no CREATE INDEX CONCURRENTLY on a partitioned parent and no new
+foreign keys to shipments(id).
+
+Partitioned tables need every primary key / unique constraint to include the
+partition key, so in this layout:
+
+- shipments: PRIMARY KEY (id, tenant_id), tenant_id NOT NULL. Global
+  uniqueness of id and tracking_number moves to the small `shipment_keys`
+  table, kept in sync by trigger. Foreign keys that pointed at shipments(id)
+  (payment_escrows, shipment_events) point at shipment_keys(id) instead, so
+  ON DELETE CASCADE still works.
+- audit_logs: PRIMARY KEY (id, tenant_id). Existing entries that belong to
+  no tenant are kept under NO_TENANT; like NULL, it matches no tenant's RLS
+  policy. New entries must name their tenant (there is no default).
+
+Row level security and its policies are carried over to the new parent
+tables (see rls_policies.sql).
+
+Revision ID: 4c7e9a2b5d18
+Revises: 5a8c2e7f1d39
+Create Date: 2026-10-21 12:00:00.000000
+
+"""
+import os
+import re
+from typing import Sequence, Union
+
+from alembic import context, op
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4c7e9a2b5d18'
+down_revision: Union[str, None] = '5a8c2e7f1d39'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PARTITIONS = 16
+NO_TENANT = '00000000-0000-0000-0000-000000000000'
+
+
+def _opted_in() -> bool:
+    value = context.get_x_argument(as_dictionary=True).get("tenant_partitioning")
+    if value is None:
+        value = os.getenv("TENANT_PARTITIONING", "")
+    return value.lower() in ("1", "on", "true", "yes")
+
+
+def _execute(conn: Connection, sql: str) -> None:
+    # DDL built from catalog text (index and policy definitions); no bind parameters
+    conn.exec_driver_sql(sql)
+
+
+# ──── Catalog snapshots ────
+
+def _index_defs(conn: Connection, table: str) -> list[str]:
+    """CREATE INDEX statements for indexes that do not back a constraint."""
+    rows = conn.execute(text("""
+        SELECT i.indexdef
+        FROM pg_indexes i
+        JOIN pg_class c ON c.relname = i.indexname
+        JOIN pg_namespace n ON n.oid = c.relnamespace AND n.nspname = i.schemaname
+        WHERE i.schemaname = current_schema() AND i.tablename = :t
+          AND NOT EXISTS (SELECT 1 FROM pg_constraint k WHERE k.conindid = c.oid)
+    """), {"t": table}).scalars().all()
+    return [re.sub(r" ON (ONLY )?(\S+\.)?%s " % re.escape(table), f" ON {table} ", d) for d in rows]
+
+
+def _foreign_keys(conn: Connection, table: str) -> list[tuple]:
+    return conn.execute(text("""
+        SELECT conname, pg_get_constraintdef(oid)
+        FROM pg_constraint
+        WHERE conrelid = CAST(:t AS regclass) AND contype = 'f' AND conparentid = 0
+    """), {"t": table}).all()
+
+
+def _referencing_foreign_keys(conn: Connection, table: str) -> list[tuple]:
+    return conn.execute(text("""
+        SELECT CAST(CAST(conrelid AS regclass) AS text), conname, pg_get_constraintdef(oid)
+        FROM pg_constraint
+        WHERE confrelid = CAST(:t AS regclass) AND contype = 'f' AND conparentid = 0
+    """), {"t": table}).all()
+
+
+def _policies(conn: Connection, table: str) -> list[str]:
+    rows = conn.execute(text("""
+        SELECT policyname, permissive, array_to_string(roles, ', '), cmd, qual, with_check
+        FROM pg_policies
+        WHERE schemaname = current_schema() AND tablename = :t
+    """), {"t": table}).all()
+    statements = []
+    for name, permissive, roles, cmd, qual, with_check in rows:
+        stmt = f"CREATE POLICY {name} ON {table} AS {permissive} FOR {cmd} TO {roles}"
+        if qual:
+            stmt += f" USING ({qual})"
+        if with_check:
+            stmt += f" WITH CHECK ({with_check})"
+        statements.append(stmt)
+    return statements
+
+
+def _row_security(conn: Connection, table: str) -> tuple:
+    return conn.execute(text(
+        "SELECT relrowsecurity, relforcerowsecurity FROM pg_class WHERE oid = CAST(:t AS regclass)"
+    ), {"t": table}).one()
+
+
+def _owned_sequences(conn: Connection, table: str) -> list[tuple]:
+    return conn.execute(text("""
+        SELECT a.attname, pg_get_serial_sequence(:t, a.attname)
+        FROM pg_attribute a
+        WHERE a.attrelid = CAST(:t AS regclass) AND a.attnum > 0 AND NOT a.attisdropped
+          AND pg_get_serial_sequence(:t, a.attname) IS NOT NULL
+    """), {"t": table}).all()
+
+
+# ──── Table rebuild ────
+
+def _rebuild(conn: Connection, table: str, primary_key: Sequence[str], partitioned: bool) -> None:
+    """Recreate `table` as hash-partitioned by tenant_id (or back to a plain heap).
+
+    Rows are copied into the new table before its indexes are built; indexes,
+    foreign keys, sequences and RLS policies of the old table are carried over.
+    """
+    old = f"{table}_old"
+
+    indexes = _index_defs(conn, table)
+    foreign_keys = _foreign_keys(conn, table)
+    policies = _policies(conn, table)
+    rls_enabled, rls_forced = _row_security(conn, table)
+    sequences = _owned_sequences(conn, table)
+
+    _execute(conn, f"ALTER TABLE {table} RENAME TO {old}")
+    _execute(conn, f"ALTER TABLE {old} RENAME CONSTRAINT {table}_pkey TO {old}_pkey")
+
+    layout = " PARTITION BY HASH (tenant_id)" if partitioned else ""
+    _execute(
+        conn,
+        f"CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS INCLUDING CONSTRAINTS "
+        f"INCLUDING STORAGE INCLUDING COMMENTS){layout}"
+    )
+    _execute(conn, f"ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY ({', '.join(primary_key)})")
+    if partitioned:
+        for i in range(PARTITIONS):
+            _execute(
+                conn,
+                f"CREATE TABLE {table}_p{i:02d} PARTITION OF {table} "
+                f"FOR VALUES WITH (MODULUS {PARTITIONS}, REMAINDER {i})"
+            )
+
+    _execute(conn, f"INSERT INTO {table} SELECT * FROM {old}")
+    for column, sequence in sequences:
+        _execute(conn, f"ALTER SEQUENCE {sequence} OWNED BY {table}.{column}")
+    _execute(conn, f"DROP TABLE {old}")
+
+    for index in indexes:
+        _execute(conn, index)
+    for name, definition in foreign_keys:
+        _execute(conn, f"ALTER TABLE {table} ADD CONSTRAINT {name} {definition}")
+    if rls_enabled:
+        _execute(conn, f"ALTER TABLE {table} ENABLE ROW LEVEL SECURITY")
+    if rls_forced:
+        _execute(conn, f"ALTER TABLE {table} FORCE ROW LEVEL SECURITY")
+    for policy in policies:
+        _execute(conn, policy)
+    _execute(conn, f"ANALYZE {table}")
+
+
+def _repoint_foreign_keys(conn: Connection, source: str, target: str) -> None:
+    """Move foreign keys that reference source(id) to reference target(id)."""
+    for table, name, definition in _referencing_foreign_keys(conn, source):
+        new_definition = re.sub(
+            r"REFERENCES (\S+\.)?%s\(" % re.escape(source), f"REFERENCES {target}(", definition
+        )
+        _execute(conn, f"ALTER TABLE {table} DROP CONSTRAINT {name}")
+        _execute(conn, f"ALTER TABLE {table} ADD CONSTRAINT {name} {new_definition}")
+
+
+SHIPMENT_KEYS_SYNC = """
+CREATE OR REPLACE FUNCTION shipment_keys_sync() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        -- A cross-partition UPDATE runs as DELETE + INSERT; keep the key (and
+        -- the rows referencing it) when the shipment still exists.
+        DELETE FROM shipment_keys k
+        WHERE k.id = OLD.id AND NOT EXISTS (SELECT 1 FROM shipments s WHERE s.id = OLD.id);
+        RETURN OLD;
+    END IF;
+    INSERT INTO shipment_keys (id, tenant_id, tracking_number)
+    VALUES (NEW.id, NEW.tenant_id, NEW.tracking_number)
+    ON CONFLICT (id) DO UPDATE
+        SET tenant_id = EXCLUDED.tenant_id, tracking_number = EXCLUDED.tracking_number;
+    RETURN NEW;
+END $$
+"""
+
+
+def partition(conn: Connection) -> None:
+    orphans = conn.execute(text("SELECT count(*) FROM shipments WHERE tenant_id IS NULL")).scalar()
+    if orphans:
+        raise RuntimeError(
+            f"{orphans} shipments have no tenant_id; assign them to a tenant before partitioning"
+        )
+
+    # 1. Global keys for shipments, referenced by escrows and events
+    _execute(conn, """
+        CREATE TABLE shipment_keys (
+            id UUID PRIMARY KEY,
+            tenant_id UUID NOT NULL,
+            tracking_number VARCHAR NOT NULL UNIQUE
+        )
+    """)
+    _execute(conn, "INSERT INTO shipment_keys (id, tenant_id, tracking_number) SELECT id, tenant_id, tracking_number FROM shipments")
+    _repoint_foreign_keys(conn, "shipments", "shipment_keys")
+
+    # 2. shipments
+    _execute(conn, "ALTER TABLE shipments ALTER COLUMN tenant_id SET NOT NULL")
+    _rebuild(conn, "shipments", ("id", "tenant_id"), partitioned=True)
+    _execute(conn, "CREATE INDEX IF NOT EXISTS ix_shipments_tracking_number ON shipments (tracking_number)")
+    _execute(conn, SHIPMENT_KEYS_SYNC)
+    _execute(conn, """
+        CREATE TRIGGER shipment_keys_sync
+        AFTER INSERT OR DELETE OR UPDATE OF id, tenant_id, tracking_number ON shipments
+        FOR EACH ROW EXECUTE FUNCTION shipment_keys_sync()
+    """)
+
+    # 3. audit_logs
+    _execute(conn, f"UPDATE audit_logs SET tenant_id = '{NO_TENANT}' WHERE tenant_id IS NULL")
+    _execute(conn, "ALTER TABLE audit_logs ALTER COLUMN tenant_id SET NOT NULL")
+    _rebuild(conn, "audit_logs", ("id", "tenant_id"), partitioned=True)
+
+
+def revert(conn: Connection) -> None:
+    # 1. audit_logs
+    _rebuild(conn, "audit_logs", ("id",), partitioned=False)
+    _execute(conn, "ALTER TABLE audit_logs ALTER COLUMN tenant_id DROP NOT NULL")
+    _execute(conn, f"UPDATE audit_logs SET tenant_id = NULL WHERE tenant_id = '{NO_TENANT}'")
+
+    # 2. shipments
+    _execute(conn, "DROP TRIGGER IF EXISTS shipment_keys_sync ON shipments")
+    _execute(conn, "DROP FUNCTION IF EXISTS shipment_keys_sync()")
+    _execute(conn, "DROP INDEX IF EXISTS ix_shipments_tracking_number")
+    _rebuild(conn, "shipments", ("id",), partitioned=False)
+    _execute(conn, "ALTER TABLE shipments ALTER COLUMN tenant_id DROP NOT NULL")
+    _execute(conn, "ALTER TABLE shipments ADD CONSTRAINT shipments_tracking_number_key UNIQUE (tracking_number)")
+
+    _repoint_foreign_keys(conn, "shipment_keys", "shipments")
+    _execute(conn, "DROP TABLE shipment_keys")
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS schema_settings (
+            name VARCHAR PRIMARY KEY,
+            value VARCHAR NOT NULL
+        )
+    """)
+    layout = "hash" if _opted_in() else "off"
+    if layout == "hash":
+        partition(conn)
+    conn.execute(text("""
+        INSERT INTO schema_settings (name, value) VALUES ('tenant_partitioning', :layout)
+        ON CONFLICT (name) DO UPDATE SET value = EXCLUDED.value
+    """), {"layout": layout})
+
+
+def downgrade() -> None:
+    conn = op.get_bind()
+    layout = conn.execute(text(
+        "SELECT value FROM schema_settings WHERE name = 'tenant_partitioning'"
+    )).scalar()
+    if layout == "hash":
+        revert(conn)
+    op.execute("DROP TABLE IF EXISTS schema_settings")
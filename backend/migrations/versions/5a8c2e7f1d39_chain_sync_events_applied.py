@@ -0,0 +1,26 @@
+"""journal the values each escrow transition wrote
+
+Revision ID: 5a8c2e7f1d39
+Revises: 7d4f1b9e3a62
+Create Date: 2026-10-21 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5a8c2e7f1d39'
+down_revision: Union[str, None] = '7d4f1b9e3a62'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # NULL for entries journaled before this revision: a revert restores every field
+    op.execute("ALTER TABLE chain_sync_events ADD COLUMN IF NOT EXISTS applied JSONB")
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE chain_sync_events DROP COLUMN IF EXISTS applied")
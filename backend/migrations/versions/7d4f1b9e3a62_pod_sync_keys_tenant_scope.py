@@ -0,0 +1,54 @@
+"""scope POD sync idempotency keys to the shipment's tenant
+
+Revision ID: 7d4f1b9e3a62
+Revises: b6d2f8a0c3e5
+Create Date: 2026-10-20 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d4f1b9e3a62'
+down_revision: Union[str, None] = 'b6d2f8a0c3e5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# pod_facets.NO_TENANT: keys for shipments without a tenant
+NO_TENANT = "00000000-0000-0000-0000-000000000000"
+
+
+def upgrade() -> None:
+    op.execute("ALTER TABLE pod_sync_keys ADD COLUMN IF NOT EXISTS tenant_id UUID")
+    op.execute(f"""
+        UPDATE pod_sync_keys k
+        SET tenant_id = COALESCE(
+            (SELECT s.tenant_id FROM shipments s WHERE s.tracking_number = k.tracking_number),
+            '{NO_TENANT}'
+        )
+        WHERE k.tenant_id IS NULL
+    """)
+    op.execute("ALTER TABLE pod_sync_keys ALTER COLUMN tenant_id SET NOT NULL")
+    op.execute("ALTER TABLE pod_sync_keys DROP CONSTRAINT IF EXISTS pod_sync_keys_pkey")
+    op.execute("ALTER TABLE pod_sync_keys ADD PRIMARY KEY (tenant_id, idempotency_key)")
+    # For the periodic purge of expired results
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_pod_sync_keys_completed_at ON pod_sync_keys (completed_at)"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_pod_sync_keys_completed_at")
+    op.execute("ALTER TABLE pod_sync_keys DROP CONSTRAINT IF EXISTS pod_sync_keys_pkey")
+    # Keys are global again: keep the most recent row per key
+    op.execute("""
+        DELETE FROM pod_sync_keys a USING pod_sync_keys b
+        WHERE a.idempotency_key = b.idempotency_key
+          AND (a.created_at, a.tenant_id) < (b.created_at, b.tenant_id)
+    """)
+    op.execute("ALTER TABLE pod_sync_keys ADD PRIMARY KEY (idempotency_key)")
+    # The RLS policy (rls_policies.sql) depends on the column
+    op.execute("DROP POLICY IF EXISTS pod_sync_key_tenant_isolation ON pod_sync_keys")
+    op.execute("ALTER TABLE pod_sync_keys DROP COLUMN IF EXISTS tenant_id")
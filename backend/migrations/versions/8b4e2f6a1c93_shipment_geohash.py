@@ -0,0 +1,56 @@
+"""shipment geohash column
+
+Revision ID: 8b4e2f6a1c93
+Revises: 3f1a9c2d7e01
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.core import geo
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b4e2f6a1c93'
+down_revision: Union[str, None] = '3f1a9c2d7e01'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH_SIZE = 5000
+
+
+def upgrade() -> None:
+    op.execute('ALTER TABLE shipments ADD COLUMN IF NOT EXISTS geohash VARCHAR(12) COLLATE "C"')
+
+    # Backfill in keyset-paginated batches so the table is never rewritten in one statement
+    conn = op.get_bind()
+    last_id = None
+    while True:
+        rows = conn.execute(
+            sa.text(
+                "SELECT id, latitude, longitude FROM shipments "
+                "WHERE geohash IS NULL AND latitude IS NOT NULL AND longitude IS NOT NULL "
+                + ("AND id > :last_id " if last_id else "")
+                + "ORDER BY id LIMIT :limit"
+            ),
+            {"last_id": last_id, "limit": BACKFILL_BATCH_SIZE},
+        ).fetchall()
+        if not rows:
+            break
+        conn.execute(
+            sa.text("UPDATE shipments SET geohash = :geohash WHERE id = :id"),
+            [{"id": r.id, "geohash": geo.encode(float(r.latitude), float(r.longitude))} for r in rows],
+        )
+        last_id = rows[-1].id
+
+    with op.get_context().autocommit_block():
+        op.execute("CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_shipments_geohash ON shipments (geohash)")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_shipments_geohash")
+    op.execute("ALTER TABLE shipments DROP COLUMN IF EXISTS geohash")
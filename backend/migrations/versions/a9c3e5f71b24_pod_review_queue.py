@@ -0,0 +1,57 @@
+"""POD review queue partial indexes and cached status counts
+
+Revision ID: a9c3e5f71b24
+Revises: f2b7d9e4a615
+Create Date: 2026-10-19 18:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9c3e5f71b24'
+down_revision: Union[str, None] = 'f2b7d9e4a615'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+NO_TENANT = '00000000-0000-0000-0000-000000000000'
+
+INDEXES = {
+    "ix_shipments_pod_queue": "(pod_status, pod_timestamp DESC) WHERE pod_status IS NOT NULL",
+    "ix_shipments_pod_timestamp": "(pod_timestamp DESC) WHERE pod_status IS NOT NULL",
+}
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS pod_status_counts (
+            tenant_id UUID NOT NULL,
+            pod_status VARCHAR NOT NULL,
+            count BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (tenant_id, pod_status)
+        )
+    """)
+    op.execute("LOCK TABLE pod_status_counts IN SHARE ROW EXCLUSIVE MODE")
+    op.execute("DELETE FROM pod_status_counts")
+    op.execute(f"""
+        INSERT INTO pod_status_counts (tenant_id, pod_status, count)
+        SELECT COALESCE(tenant_id, '{NO_TENANT}'), pod_status, count(*)
+        FROM shipments
+        WHERE pod_status IS NOT NULL
+        GROUP BY 1, 2
+    """)
+
+    # shipments is a plain table here: the tenant-partitioned layout
+    # (4c7e9a2b5d18) comes later and is reverted before this is downgraded
+    with op.get_context().autocommit_block():
+        for name, definition in INDEXES.items():
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON shipments {definition}")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name in INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+    op.execute("DROP TABLE IF EXISTS pod_status_counts")
@@ -0,0 +1,51 @@
+"""persisted, reorg-aware cursors for escrow event sync
+
+Revision ID: b6d2f8a0c3e5
+Revises: c3e7a1d9f482
+Create Date: 2026-10-19 19:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b6d2f8a0c3e5'
+down_revision: Union[str, None] = 'c3e7a1d9f482'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS chain_sync_cursors (
+            chain_id INTEGER NOT NULL,
+            contract_address VARCHAR NOT NULL,
+            block_number BIGINT NOT NULL,
+            block_hash VARCHAR NOT NULL,
+            updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+            PRIMARY KEY (chain_id, contract_address)
+        )
+    """)
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS chain_sync_events (
+            id BIGSERIAL PRIMARY KEY,
+            chain_id INTEGER NOT NULL,
+            block_number BIGINT NOT NULL,
+            block_hash VARCHAR NOT NULL,
+            log_index INTEGER NOT NULL,
+            event VARCHAR NOT NULL,
+            escrow_id UUID NOT NULL REFERENCES payment_escrows(id) ON DELETE CASCADE,
+            previous JSONB NOT NULL,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+        )
+    """)
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_chain_sync_events_chain_block ON chain_sync_events (chain_id, block_number)"
+    )
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS chain_sync_events")
+    op.execute("DROP TABLE IF EXISTS chain_sync_cursors")
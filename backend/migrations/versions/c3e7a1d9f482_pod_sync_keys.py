@@ -0,0 +1,35 @@
+"""idempotency keys for driver-app POD batch sync
+
+Revision ID: c3e7a1d9f482
+Revises: a9c3e5f71b24
+Create Date: 2026-10-19 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3e7a1d9f482'
+down_revision: Union[str, None] = 'a9c3e5f71b24'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS pod_sync_keys (
+            idempotency_key VARCHAR(128) PRIMARY KEY,
+            tracking_number VARCHAR NOT NULL,
+            status VARCHAR NOT NULL,
+            status_code INTEGER,
+            response JSONB,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+            completed_at TIMESTAMP WITH TIME ZONE
+        )
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS pod_sync_keys")
@@ -0,0 +1,60 @@
+"""shipment events history table
+
+Revision ID: c7d15e0b4a28
+Revises: 8b4e2f6a1c93
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+from datetime import date
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7d15e0b4a28'
+down_revision: Union[str, None] = '8b4e2f6a1c93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MONTHS_AHEAD = 3
+
+
+def _add_months(d: date, months: int) -> date:
+    month = d.month - 1 + months
+    return date(d.year + month // 12, month % 12 + 1, 1)
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS shipment_events (
+            id BIGINT GENERATED BY DEFAULT AS IDENTITY,
+            occurred_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+            shipment_id UUID NOT NULL REFERENCES shipments(id) ON DELETE CASCADE,
+            tenant_id UUID,
+            event_type VARCHAR NOT NULL,
+            status VARCHAR,
+            latitude NUMERIC(10, 6),
+            longitude NUMERIC(10, 6),
+            payload JSONB,
+            PRIMARY KEY (id, occurred_at)
+        ) PARTITION BY RANGE (occurred_at)
+    """)
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_shipment_events_shipment_occurred "
+        "ON shipment_events (shipment_id, occurred_at)"
+    )
+    op.execute("CREATE TABLE IF NOT EXISTS shipment_events_default PARTITION OF shipment_events DEFAULT")
+
+    start = date.today().replace(day=1)
+    for i in range(MONTHS_AHEAD + 1):
+        lo = _add_months(start, i)
+        hi = _add_months(start, i + 1)
+        op.execute(
+            f"CREATE TABLE IF NOT EXISTS shipment_events_y{lo.year}m{lo.month:02d} "
+            f"PARTITION OF shipment_events FOR VALUES FROM ('{lo.isoformat()}') TO ('{hi.isoformat()}')"
+        )
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS shipment_events CASCADE")
@@ -0,0 +1,43 @@
+"""audit_logs tenant_id
+
+Revision ID: d41a7b9e2c56
+Revises: c7d15e0b4a28
+Create Date: 2026-10-19 13:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd41a7b9e2c56'
+down_revision: Union[str, None] = 'c7d15e0b4a28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("ALTER TABLE audit_logs ADD COLUMN IF NOT EXISTS tenant_id UUID")
+
+    # Backfill from the audited entity
+    op.execute("""
+        UPDATE audit_logs AS a SET tenant_id = s.tenant_id
+        FROM shipments AS s
+        WHERE a.entity_type = 'SHIPMENT' AND a.entity_id = s.id AND a.tenant_id IS NULL
+    """)
+    op.execute("""
+        UPDATE audit_logs AS a SET tenant_id = s.tenant_id
+        FROM payment_escrows AS e JOIN shipments AS s ON s.id = e.shipment_id
+        WHERE a.entity_type = 'ESCROW' AND a.entity_id = e.id AND a.tenant_id IS NULL
+    """)
+
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_audit_logs_tenant_id ON audit_logs (tenant_id)"
+        )
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_audit_logs_tenant_id")
+    op.execute("ALTER TABLE audit_logs DROP COLUMN IF EXISTS tenant_id")
@@ -0,0 +1,25 @@
+"""pod photo renditions metadata
+
+Revision ID: e8f3a5c1d702
+Revises: d41a7b9e2c56
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e8f3a5c1d702'
+down_revision: Union[str, None] = 'd41a7b9e2c56'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("ALTER TABLE shipments ADD COLUMN IF NOT EXISTS pod_photo_meta JSONB")
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE shipments DROP COLUMN IF EXISTS pod_photo_meta")
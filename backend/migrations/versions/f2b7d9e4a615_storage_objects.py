@@ -0,0 +1,35 @@
+"""content-addressed storage reference counts
+
+Revision ID: f2b7d9e4a615
+Revises: e8f3a5c1d702
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2b7d9e4a615'
+down_revision: Union[str, None] = 'e8f3a5c1d702'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE TABLE IF NOT EXISTS storage_objects (
+            sha256 VARCHAR(64) PRIMARY KEY,
+            url VARCHAR NOT NULL,
+            content_type VARCHAR,
+            size BIGINT,
+            refcount INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+        )
+    """)
+    op.execute("CREATE INDEX IF NOT EXISTS ix_storage_objects_url ON storage_objects (url)")
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS storage_objects")
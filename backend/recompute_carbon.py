@@ -0,0 +1,68 @@
+"""
+Recompute carbon_emission and is_green_certified for every shipment.
+
+Run after changing emission factors, routing factors or the port table:
+    python recompute_carbon.py [--batch-size 20000]
+"""
+import argparse
+import math
+import time
+
+from sqlalchemy import text
+
+from app.carbon.engine import compute_batch
+from app.database import engine
+
+SELECT_BATCH = text("""
+    SELECT id, weight_kg, transport_mode, origin, destination
+    FROM shipments
+    WHERE (CAST(:last_id AS uuid) IS NULL OR id > CAST(:last_id AS uuid))
+    ORDER BY id
+    LIMIT :limit
+""")
+
+# One statement per batch; rows whose values do not change are not rewritten
+UPDATE_BATCH = text("""
+    UPDATE shipments AS s
+    SET carbon_emission = v.carbon_emission,
+        is_green_certified = v.is_green_certified
+    FROM unnest(CAST(:ids AS uuid[]), CAST(:emissions AS float8[]), CAST(:green AS boolean[]))
+        AS v(id, carbon_emission, is_green_certified)
+    WHERE s.id = v.id
+      AND (s.carbon_emission IS DISTINCT FROM v.carbon_emission
+           OR s.is_green_certified IS DISTINCT FROM v.is_green_certified)
+""")
+
+
+def recompute_all(batch_size: int = 20000) -> tuple[int, int]:
+    """Walk the shipments table in id order; returns (scanned, updated)."""
+    scanned = updated = 0
+    last_id = None
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(SELECT_BATCH, {"last_id": last_id, "limit": batch_size}).all()
+            if not rows:
+                break
+            ids, weights, modes, origins, destinations = zip(*rows)
+            emissions, green = compute_batch(weights, modes, origins, destinations)
+            result = conn.execute(UPDATE_BATCH, {
+                "ids": [str(i) for i in ids],
+                # NaN marks shipments without a weight: no figure
+                "emissions": [None if math.isnan(e) else e for e in emissions.tolist()],
+                "green": green.tolist(),
+            })
+        scanned += len(rows)
+        updated += result.rowcount
+        last_id = str(ids[-1])
+        print(f"  ...{scanned} scanned, {updated} updated")
+    return scanned, updated
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=20000)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    scanned, updated = recompute_all(args.batch_size)
+    print(f"Recomputed carbon for {scanned} shipments ({updated} changed) in {time.perf_counter() - start:.1f}s")
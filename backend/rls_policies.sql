@@ -10,10 +10,36 @@ CREATE POLICY tenant_isolation_policy ON tenants
     WITH CHECK (false); -- No one can modify via API directly (admin only)
 
 -- Create Policy for Shipments
--- Users can only see shipments belonging to the current tenant context
+-- Users can only see shipments belonging to the current tenant context.
+-- The setting is cast to uuid (rather than tenant_id to text) so that, with the
+-- tenant-partitioned layout (migration 4c7e9a2b5d18), the policy
+-- predicate also prunes the scan down to the tenant's hash partition.
 CREATE POLICY shipment_tenant_isolation ON shipments
-    USING (tenant_id::text = current_setting('app.current_tenant', true))
-    WITH CHECK (tenant_id::text = current_setting('app.current_tenant', true));
+    USING (tenant_id = NULLIF(current_setting('app.current_tenant', true), '')::uuid)
+    WITH CHECK (tenant_id = NULLIF(current_setting('app.current_tenant', true), '')::uuid);
+
+-- Create Policy for Audit Logs
+ALTER TABLE audit_logs ENABLE ROW LEVEL SECURITY;
+CREATE POLICY audit_log_tenant_isolation ON audit_logs
+    USING (tenant_id = NULLIF(current_setting('app.current_tenant', true), '')::uuid)
+    WITH CHECK (tenant_id = NULLIF(current_setting('app.current_tenant', true), '')::uuid);
+
+-- Create Policy for cached POD status counts
+ALTER TABLE pod_status_counts ENABLE ROW LEVEL SECURITY;
+CREATE POLICY pod_status_count_tenant_isolation ON pod_status_counts
+    USING (tenant_id = NULLIF(current_setting('app.current_tenant', true), '')::uuid)
+    WITH CHECK (tenant_id = NULLIF(current_setting('app.current_tenant', true), '')::uuid);
+
+-- Create Policy for driver-app POD sync idempotency keys
+ALTER TABLE pod_sync_keys ENABLE ROW LEVEL SECURITY;
+CREATE POLICY pod_sync_key_tenant_isolation ON pod_sync_keys
+    USING (tenant_id = NULLIF(current_setting('app.current_tenant', true), '')::uuid)
+    WITH CHECK (tenant_id = NULLIF(current_setting('app.current_tenant', true), '')::uuid);
+
+-- Policies are defined on the parent table and apply to every partition when
+-- queried through it; migration 4c7e9a2b5d18 recreates them on the partitioned
+-- parent. In that layout audit entries without a tenant are stored under the
+-- nil UUID, which (like NULL in the plain layout) matches no tenant's policy.
 
 -- Note: To test this, you must run:
 -- SET app.current_tenant = 'UUID_OF_TENANT';
@@ -1,6 +1,7 @@
 -- Extensions
 CREATE EXTENSION IF NOT EXISTS "uuid-ossp";
 CREATE EXTENSION IF NOT EXISTS "postgis";
+CREATE EXTENSION IF NOT EXISTS "pg_trgm";
 
 -- 1. Tenants
 CREATE TABLE IF NOT EXISTS tenants (
@@ -47,6 +48,7 @@ CREATE TABLE IF NOT EXISTS payment_escrows (
 -- 4. Audit Logs
 CREATE TABLE IF NOT EXISTS audit_logs (
     id SERIAL PRIMARY KEY,
+    tenant_id UUID,
     entity_type TEXT NOT NULL,
     entity_id UUID NOT NULL,
     action TEXT NOT NULL,
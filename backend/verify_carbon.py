@@ -1,6 +1,8 @@
 import requests
 import json
 
+from app.carbon.engine import calculate_carbon_footprint, compute_batch, lane_distance_km
+
 API_URL = "http://127.0.0.1:8000/api/v1"
 
 def test_carbon_calculation():
@@ -28,31 +30,32 @@ def test_carbon_calculation():
         pass
 
     print("Verifying Carbon Calculation Logic locally...")
-    
-    # EMISSION_FACTORS (same as backend)
-    EMISSION_FACTORS = {
-        "SEA": 0.010,
-        "RAIL": 0.025,
-        "TRUCK": 0.060,
-        "AIR": 0.600
-    }
-    
-    def calculate(weight_kg, mode, distance_km=8000.0):
-        factor = EMISSION_FACTORS.get(mode, 0.010)
-        weight_tons = weight_kg / 1000.0
-        return round(weight_tons * distance_km * factor, 2)
 
-    # Test Case 1: Sea, 20 Tons
-    calc_sea = calculate(20000, "SEA")
+    # Test Case 1: Sea, 20 Tons, fixed 8000km lane
+    calc_sea = calculate_carbon_footprint(20000, "SEA", distance_km=8000.0)
     expected_sea = 20 * 8000 * 0.010 # 1600.0
     print(f"SEA (20T): Calculated {calc_sea}, Expected {expected_sea}. Match? {calc_sea == expected_sea}")
 
-    # Test Case 2: Air, 1 Ton
-    calc_air = calculate(1000, "AIR")
+    # Test Case 2: Air, 1 Ton, fixed 8000km lane
+    calc_air = calculate_carbon_footprint(1000, "AIR", distance_km=8000.0)
     expected_air = 1 * 8000 * 0.600 # 4800.0
     print(f"AIR (1T): Calculated {calc_air}, Expected {expected_air}. Match? {calc_air == expected_air}")
 
-    if calc_sea == expected_sea and calc_air == expected_air:
+    # Test Case 3: Sea, 20 Tons, Busan -> Los Angeles sea lane
+    distance = lane_distance_km(payload["origin"], payload["destination"], "SEA")
+    calc_lane = calculate_carbon_footprint(20000, "SEA", payload["origin"], payload["destination"])
+    expected_lane = round(20 * distance * 0.010, 2)
+    print(f"SEA (20T, {distance}km): Calculated {calc_lane}, Expected {expected_lane}. Match? {calc_lane == expected_lane}")
+
+    # Test Case 4: Batch API agrees with the scalar path
+    emissions, _ = compute_batch([20000, 1000], ["SEA", "AIR"], [payload["origin"]] * 2, [payload["destination"]] * 2)
+    scalar = [
+        calculate_carbon_footprint(20000, "SEA", payload["origin"], payload["destination"]),
+        calculate_carbon_footprint(1000, "AIR", payload["origin"], payload["destination"]),
+    ]
+    print(f"Batch: {emissions.tolist()}, Scalar: {scalar}. Match? {emissions.tolist() == scalar}")
+
+    if calc_sea == expected_sea and calc_air == expected_air and calc_lane == expected_lane and emissions.tolist() == scalar:
         print("SUCCESS: Carbon Calculation Logic Verified.")
     else:
         print("FAILURE: Calculation Mismatch.")
@@ -3,7 +3,7 @@
 import React, { useRef, useState, useCallback } from 'react';
 import SignatureCanvas from 'react-signature-canvas';
 import { Camera, MapPin, CheckCircle, Upload, AlertCircle, RotateCcw } from 'lucide-react';
-import { uploadPOD } from '@/lib/api';
+import { uploadPOD, uploadPODPhotosDirect } from '@/lib/api';
 import { useTranslations } from 'next-intl';
 
 interface ElectronicPODProps {
@@ -162,9 +162,17 @@ export default function ElectronicPOD({ trackingNumber, onComplete }: Electronic
                 formData.append('receiver_contact', receiverContact.trim());
             }
 
-            imageFiles.forEach((file) => {
-                formData.append('photos', file);
-            });
+            // Prefer direct-to-storage uploads; fall back to sending the files
+            const photoKeys = imageFiles.length
+                ? await uploadPODPhotosDirect(trackingNumber, imageFiles)
+                : [];
+            if (photoKeys) {
+                photoKeys.forEach((key) => formData.append('photo_keys', key));
+            } else {
+                imageFiles.forEach((file) => {
+                    formData.append('photos', file);
+                });
+            }
 
             await uploadPOD(trackingNumber, formData);
 
@@ -120,11 +120,14 @@ export default function PODDetail({ trackingNumber, onBack }: PODDetailProps) {
                     {photoUrls.length > 0 ? (
                         <div className="grid grid-cols-3 md:grid-cols-5 gap-3">
                             {photoUrls.map((url, idx) => {
-                                const src = url.startsWith('data:') ? url : `${API_URL}${url}`;
+                                // Prefer the small WebP rendition; link to the original upload
+                                const preview = pod.pod_photo_renditions?.[idx]?.thumbnail || url;
+                                const src = preview.startsWith('data:') ? preview : `${API_URL}${preview}`;
+                                const href = url.startsWith('data:') ? url : `${API_URL}${url}`;
                                 return (
-                                    <div key={idx} className="aspect-square rounded-lg overflow-hidden border border-slate-200 bg-slate-100">
-                                        <img src={src} alt={`Photo ${idx + 1}`} className="w-full h-full object-cover" />
-                                    </div>
+                                    <a key={idx} href={href} target="_blank" rel="noopener noreferrer" className="block aspect-square rounded-lg overflow-hidden border border-slate-200 bg-slate-100">
+                                        <img src={src} alt={`Photo ${idx + 1}`} loading="lazy" className="w-full h-full object-cover" />
+                                    </a>
                                 );
                             })}
                         </div>
@@ -139,7 +142,7 @@ export default function PODDetail({ trackingNumber, onBack }: PODDetailProps) {
                         <h3 className="text-sm font-semibold text-slate-600 mb-3">{t('signature')}</h3>
                         <div className="inline-block border border-slate-200 rounded-lg p-2 bg-white">
                             <img
-                                src={pod.pod_signature}
+                                src={pod.pod_signature.startsWith('data:') ? pod.pod_signature : `${API_URL}${pod.pod_signature}`}
                                 alt="Signature"
                                 className="max-h-32"
                             />
@@ -19,6 +19,7 @@ export default function PODList({ onSelect }: PODListProps) {
     const t = useTranslations('pod');
     const [items, setItems] = useState<PODListItem[]>([]);
     const [total, setTotal] = useState(0);
+    const [statusCounts, setStatusCounts] = useState<Record<string, number>>({});
     const [page, setPage] = useState(1);
     const [statusFilter, setStatusFilter] = useState<string | undefined>();
     const [loading, setLoading] = useState(true);
@@ -30,6 +31,7 @@ export default function PODList({ onSelect }: PODListProps) {
             const data = await fetchPODList({ status: statusFilter, page, limit });
             setItems(data.items);
             setTotal(data.total);
+            setStatusCounts(data.status_counts);
         } catch {
             setItems([]);
         } finally {
@@ -65,6 +67,9 @@ export default function PODList({ onSelect }: PODListProps) {
                         }`}
                     >
                         {f.label}
+                        <span className="ml-1.5 opacity-70">
+                            {f.key ? statusCounts[f.key] ?? 0 : Object.values(statusCounts).reduce((a, b) => a + b, 0)}
+                        </span>
                     </button>
                 ))}
             </div>
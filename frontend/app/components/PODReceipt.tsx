@@ -1,8 +1,8 @@
 'use client';
 
 import React, { useState, useEffect } from 'react';
-import { fetchPODReceipt, PODReceipt as PODReceiptType } from '@/lib/api';
-import { MapPin, CheckCircle, Package } from 'lucide-react';
+import { fetchPODReceipt, podReceiptPdfUrl, PODReceipt as PODReceiptType } from '@/lib/api';
+import { MapPin, CheckCircle, Package, Download } from 'lucide-react';
 import { useTranslations } from 'next-intl';
 
 interface PODReceiptProps {
@@ -104,6 +104,16 @@ export default function PODReceipt({ trackingNumber }: PODReceiptProps) {
                 }`}>
                     {t('status')}: {receipt.pod_status}
                 </div>
+
+                <a
+                    href={podReceiptPdfUrl(receipt.tracking_number)}
+                    target="_blank"
+                    rel="noopener noreferrer"
+                    className="flex items-center justify-center gap-2 p-3 rounded-lg text-sm font-medium bg-slate-900 text-white hover:bg-slate-700"
+                >
+                    <Download size={16} />
+                    {t('downloadPdf')}
+                </a>
             </div>
         </div>
     );
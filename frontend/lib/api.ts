@@ -581,11 +581,20 @@ export interface PODUploadResponse {
     photo_count: number;
 }
 
+export interface PODPhotoRendition {
+    original: string;
+    thumbnail: string | null;
+    web: string | null;
+    width: number | null;
+    height: number | null;
+}
+
 export interface PODDetail {
     tracking_number: string;
     pod_status: string | null;
     pod_signature: string | null;
     pod_photos: string[] | null;
+    pod_photo_renditions: PODPhotoRendition[];
     pod_location: { lat: number; lng: number; accuracy?: number } | null;
     pod_timestamp: string | null;
     pod_receiver_name: string | null;
@@ -606,6 +615,7 @@ export interface PODListItem {
     pod_timestamp: string | null;
     pod_receiver_name: string | null;
     photo_count: number;
+    photo_thumbnails: string[];
     current_status: string;
 }
 
@@ -626,6 +636,92 @@ export const uploadPOD = async (
     return response.data;
 };
 
+export interface PODUploadUrl {
+    key: string;
+    url: string | null;
+    headers: Record<string, string>;
+}
+
+const sha256Hex = async (file: File): Promise<string> => {
+    const digest = await crypto.subtle.digest('SHA-256', await file.arrayBuffer());
+    return Array.from(new Uint8Array(digest), (b) => b.toString(16).padStart(2, '0')).join('');
+};
+
+/**
+ * Upload POD photos straight to object storage via presigned URLs.
+ * Resolves to the keys to submit as `photo_keys`, or null when the backend
+ * stores files locally and photos must be sent with the form instead.
+ */
+export const uploadPODPhotosDirect = async (
+    trackingNumber: string,
+    files: File[]
+): Promise<string[] | null> => {
+    const photos = await Promise.all(
+        files.map(async (file) => ({
+            content_type: file.type || 'image/jpeg',
+            size: file.size,
+            sha256: await sha256Hex(file),
+        }))
+    );
+    let uploads: PODUploadUrl[];
+    try {
+        const response = await api.post<{ uploads: PODUploadUrl[] }>(
+            `/v1/shipments/${trackingNumber}/pod/upload-urls`,
+            { photos }
+        );
+        uploads = response.data.uploads;
+    } catch (err: unknown) {
+        if ((err as { response?: { status?: number } }).response?.status === 501) return null;
+        throw err;
+    }
+    await Promise.all(
+        uploads.map(async (upload, i) => {
+            if (!upload.url) return; // already stored
+            const res = await fetch(upload.url, { method: 'PUT', headers: upload.headers, body: files[i] });
+            if (!res.ok) throw new Error(`Photo upload failed (${res.status})`);
+        })
+    );
+    return uploads.map((upload) => upload.key);
+};
+
+export interface PODSyncItem {
+    idempotency_key: string;
+    tracking_number: string;
+    signature: string;
+    latitude: number;
+    longitude: number;
+    accuracy?: number | null;
+    receiver_name: string;
+    receiver_contact?: string | null;
+    photos?: string[];
+    photo_keys?: string[];
+}
+
+export interface PODSyncResult {
+    idempotency_key: string;
+    tracking_number: string;
+    status_code: number;
+    replayed: boolean;
+    body: Record<string, unknown>;
+}
+
+/**
+ * Submit PODs queued while offline. `photos` maps the part names used in
+ * each item's `photos` to their files; safe to retry with the same keys.
+ */
+export const syncPODs = async (
+    items: PODSyncItem[],
+    photos: Record<string, File>
+): Promise<{ results: PODSyncResult[]; succeeded: number; failed: number }> => {
+    const formData = new FormData();
+    formData.append('manifest', JSON.stringify(items));
+    Object.entries(photos).forEach(([name, file]) => formData.append(name, file));
+    const response = await api.post('/v1/shipments/pods/sync', formData, {
+        headers: { 'Content-Type': 'multipart/form-data' },
+    });
+    return response.data;
+};
+
 export const fetchPOD = async (trackingNumber: string): Promise<PODDetail> => {
     const response = await api.get<PODDetail>(`/v1/shipments/${trackingNumber}/pod`);
     return response.data;
@@ -639,9 +735,30 @@ export const verifyPOD = async (
     return response.data;
 };
 
+export interface PODBulkVerifyResult {
+    tracking_number: string;
+    ok: boolean;
+    pod_status: string | null;
+    error: 'invalid_action' | 'duplicate' | 'not_found' | 'no_pod' | 'conflict' | null;
+    detail: string | null;
+}
+
+export const bulkVerifyPODs = async (
+    items: (PODVerifyRequest & { tracking_number: string })[]
+): Promise<{ results: PODBulkVerifyResult[]; verified: number; disputed: number; failed: number }> => {
+    const response = await api.post('/v1/shipments/pods/verify', { items });
+    return response.data;
+};
+
 export const fetchPODList = async (
     params?: { status?: string; page?: number; limit?: number }
-): Promise<{ items: PODListItem[]; total: number; page: number; limit: number }> => {
+): Promise<{
+    items: PODListItem[];
+    total: number;
+    page: number;
+    limit: number;
+    status_counts: Record<string, number>;
+}> => {
     const response = await api.get('/v1/shipments/pods/list', { params });
     return response.data;
 };
@@ -664,4 +781,7 @@ export const fetchPODReceipt = async (trackingNumber: string): Promise<PODReceip
     return response.data;
 };
 
+export const podReceiptPdfUrl = (trackingNumber: string): string =>
+    `${API_URL}/v1/shipments/${trackingNumber}/pod/receipt.pdf`;
+
 export default api;